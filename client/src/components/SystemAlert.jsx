@@ -1,31 +1,26 @@
 import React, { useEffect, useState } from 'react';
 import api from '../services/api';
+import { useEventos } from '../services/eventos';
 import { X, AlertTriangle, Info, Megaphone, BellRing, Check } from 'lucide-react';
 
 export default function SystemAlert() {
   const [activeAlert, setActiveAlert] = useState(null);
   const [isVisible, setIsVisible] = useState(false); 
 
-  const userRole = localStorage.getItem('user_role'); 
-
   useEffect(() => {
     checkNotifications();
   }, []);
 
+  // Avisos publicados depois do login aparecem sem recarregar a página
+  useEventos(['notificacao'], () => {
+    if (!activeAlert) checkNotifications();
+  }, 500);
+
   const checkNotifications = async () => {
     try {
-      const response = await api.get('/notificacoes/');
-      const allNotifs = response.data;
-
-      const relevant = allNotifs.filter(n => {
-        if (!n.ativo) return false;
-
-        const isTarget = n.alvo === 'todos' || n.alvo === userRole;
-        if (!isTarget) return false;
-
-        const hasRead = localStorage.getItem(`read_notif_${n.id}`);
-        return !hasRead;
-      });
+      // O servidor já filtra por papel, ativo e leitura; só precisamos da mais recente
+      const response = await api.get('/notificacoes/nao_lidas/', { params: { limite: 1 } });
+      const relevant = response.data;
 
       if (relevant.length > 0) {
         setActiveAlert(relevant[0]);
@@ -41,7 +36,8 @@ export default function SystemAlert() {
     
     setTimeout(() => {
         if (activeAlert) {
-            localStorage.setItem(`read_notif_${activeAlert.id}`, 'true');
+            api.post('/notificacoes/marcar_lidas/', { ids: [activeAlert.id] })
+              .catch(error => console.error("Erro ao marcar alerta como lido", error));
             setActiveAlert(null);
         }
     }, 300);
@@ -1,36 +1,58 @@
 import React, { useState, useEffect } from 'react';
 import api from '../services/api';
-import { Scale, Building2, Printer, Calendar, Loader2, TrendingDown, TrendingUp, Wallet } from 'lucide-react';
+import { sincronizar } from '../services/sincronizacao';
+import { Scale, Building2, Printer, Calendar, Loader2, TrendingDown, TrendingUp, Wallet, Layers } from 'lucide-react';
 import { Chart as ChartJS, ArcElement, Tooltip, Legend } from 'chart.js';
 import { Doughnut } from 'react-chartjs-2';
 
 ChartJS.register(ArcElement, Tooltip, Legend);
 
+// Rótulo do período no formato da API: '2024-03' (mês) ou '2024-T1' (trimestre)
+const rotuloPeriodo = (agrupamento, ano, mes) => (
+  agrupamento === 'mes' ? `${ano}-${String(mes).padStart(2, '0')}` : `${ano}-T${Math.floor((mes - 1) / 3) + 1}`
+);
+
 export default function Comparativo() {
   const [companies, setCompanies] = useState([]);
-  const [allTransactions, setAllTransactions] = useState([]);
   const [loading, setLoading] = useState(true);
 
   const [selectedCompanyId, setSelectedCompanyId] = useState('all');
   const [filterDate, setFilterDate] = useState('');
-  const [filterType, setFilterType] = useState('all');
+  const [agrupamento, setAgrupamento] = useState('mes');
 
-  const [stats, setStats] = useState({ totalIn: 0, totalOut: 0, balance: 0 });
-  const [filteredTransactions, setFilteredTransactions] = useState([]);
+  const [comparativo, setComparativo] = useState(null);
 
   useEffect(() => {
-    fetchInitialData();
+    sincronizar('empresas').then(setCompanies).catch(error => console.error("Erro ao carregar empresas", error));
   }, []);
 
-  const fetchInitialData = async () => {
+  useEffect(() => {
+    fetchComparativo();
+  }, [selectedCompanyId, filterDate, agrupamento]);
+
+  // Os totais são agrupados no servidor (/transacoes/comparativo/): o período
+  // escolhido contra o anterior, por fornecedor (ou por classificação, com um
+  // fornecedor selecionado). Sem período, o servidor usa o atual.
+  const buildParams = () => {
+    const params = { agrupamento, dimensoes: selectedCompanyId === 'all' ? 'empresa' : 'tipo_material' };
+    if (selectedCompanyId !== 'all') params.empresa = selectedCompanyId;
+    if (filterDate) {
+      const [ano, mes] = filterDate.split('-').map(Number);
+      const meses = agrupamento === 'mes' ? 1 : 3;
+      const anterior = new Date(Date.UTC(ano, mes - 1 - meses, 1));
+      params.periodos = [
+        rotuloPeriodo(agrupamento, anterior.getUTCFullYear(), anterior.getUTCMonth() + 1),
+        rotuloPeriodo(agrupamento, ano, mes),
+      ].join(',');
+    }
+    return params;
+  };
+
+  const fetchComparativo = async () => {
     setLoading(true);
     try {
-      const [resComp, resTrans] = await Promise.all([
-        api.get('/empresas/'),
-        api.get('/transacoes/')
-      ]);
-      setCompanies(resComp.data);
-      setAllTransactions(resTrans.data);
+      const response = await api.get('/transacoes/comparativo/', { params: buildParams() });
+      setComparativo(response.data);
     } catch (error) {
       console.error("Erro ao carregar dados", error);
     } finally {
@@ -38,61 +60,29 @@ export default function Comparativo() {
     }
   };
 
-  useEffect(() => {
-    if (!loading) {
-      applyFilters();
-    }
-  }, [selectedCompanyId, filterDate, filterType, allTransactions, loading]);
-
-  const applyFilters = () => {
-    let result = [...allTransactions];
+  const periodos = comparativo?.periodos ?? [];
+  const [periodoAnterior, periodoAtual] = periodos.slice(-2);
+  const totalPeriodo = (periodo) => comparativo?.totais.periodos[periodo] ?? { entradas: 0, saidas: 0, quantidade: 0 };
+  const atual = totalPeriodo(periodoAtual);
+  const variacao = comparativo?.totais.variacoes.at(-1);
 
-    if (selectedCompanyId !== 'all') {
-      result = result.filter(t => t.empresa === parseInt(selectedCompanyId));
-    }
-    if (filterDate) {
-      result = result.filter(t => t.data.startsWith(filterDate));
-    }
-    if (filterType !== 'all') {
-      result = result.filter(t => t.tipo === filterType);
-    }
-
-    result.sort((a, b) => {
-        const dateA = new Date(a.data_entrada || a.data_saida || a.data);
-        const dateB = new Date(b.data_entrada || b.data_saida || b.data);
-        return dateA - dateB;
-    });
-
-    setFilteredTransactions(result);
-    calculateStats(result);
+  const stats = {
+    totalIn: parseFloat(atual.entradas),
+    totalOut: parseFloat(atual.saidas),
+    balance: parseFloat(atual.entradas) - parseFloat(atual.saidas),
   };
 
-  const calculateStats = (data) => {
-    let tIn = 0;
-    let tOut = 0;
-    data.forEach(t => {
-      if (t.tipo === 'entrada') tIn += parseFloat(t.valor);
-      else tOut += parseFloat(t.valor);
-    });
-    setStats({ totalIn: tIn, totalOut: tOut, balance: tIn - tOut });
-  };
+  const grupos = [...(comparativo?.grupos ?? [])].sort((a, b) => (
+    parseFloat(b.periodos[periodoAtual].entradas) - parseFloat(a.periodos[periodoAtual].entradas)
+  ));
 
   const formatMoney = (v) => v.toLocaleString('pt-BR', { style: 'currency', currency: 'BRL' });
   
-  const formatDate = (dateString) => {
-    if (!dateString) return '-';
-    return new Date(dateString).toLocaleDateString('pt-BR', { timeZone: 'UTC' });
-  };
+  const formatPct = (pct) => (pct === null || pct === undefined ? '—' : `${pct > 0 ? '+' : ''}${pct.toLocaleString('pt-BR')}%`);
 
-  const getClassificacao = (t) => {
-    if (t.tipo === 'entrada') {
-      if (!t.tipo_material) return 'Geral';
-      return t.tipo_material.charAt(0).toUpperCase() + t.tipo_material.slice(1);
-    } else {
-      const match = t.descricao ? t.descricao.match(/^\[(.*?)\]/) : null;
-      return match ? match[1] : 'Saída Diversa';
-    }
-  };
+  const nomeGrupo = (g) => (
+    selectedCompanyId === 'all' ? g.nome_empresa : (g.tipo_material ? g.tipo_material.charAt(0).toUpperCase() + g.tipo_material.slice(1) : 'Geral')
+  );
 
   const chartData = {
     labels: ['Total Comprado (Dívida)', 'Total Pago'],
@@ -116,7 +106,7 @@ export default function Comparativo() {
             </header>
 
             <div className="bg-slate-900 border border-slate-800 p-6 rounded-2xl shadow-lg mb-8">
-              <div className="grid grid-cols-1 md:grid-cols-4 gap-4 items-end">
+              <div className="grid grid-cols-1 md:grid-cols-5 gap-4 items-end">
                 <div className="md:col-span-2">
                   <label className="text-xs text-slate-400 font-bold uppercase mb-2 flex items-center gap-2"><Building2 size={14} /> Fornecedor</label>
                   <select value={selectedCompanyId} onChange={(e) => setSelectedCompanyId(e.target.value)} disabled={loading} className="w-full bg-slate-950 border border-slate-700 rounded-xl p-3 text-white focus:border-cyan-400 outline-none cursor-pointer disabled:opacity-50">
@@ -128,6 +118,13 @@ export default function Comparativo() {
                   <label className="text-xs text-slate-400 font-bold uppercase mb-2 flex items-center gap-2"><Calendar size={14} /> Período</label>
                   <input type="month" value={filterDate} onChange={(e) => setFilterDate(e.target.value)} disabled={loading} className="w-full bg-slate-950 border border-slate-700 rounded-xl p-3 text-white focus:border-cyan-400 outline-none disabled:opacity-50"/>
                 </div>
+                <div>
+                  <label className="text-xs text-slate-400 font-bold uppercase mb-2 flex items-center gap-2"><Layers size={14} /> Comparar</label>
+                  <select value={agrupamento} onChange={(e) => setAgrupamento(e.target.value)} disabled={loading} className="w-full bg-slate-950 border border-slate-700 rounded-xl p-3 text-white focus:border-cyan-400 outline-none cursor-pointer disabled:opacity-50">
+                    <option value="mes">Mês anterior</option>
+                    <option value="trimestre">Trimestre anterior</option>
+                  </select>
+                </div>
                 <div>
                   <button onClick={() => window.print()} disabled={loading} className="w-full bg-white text-slate-900 font-bold p-3 rounded-xl hover:bg-slate-200 transition-colors flex justify-center items-center gap-2 disabled:opacity-50">
                     <Printer size={18} /> Imprimir
@@ -156,69 +153,68 @@ export default function Comparativo() {
                 <p className="text-sm">Relatório Financeiro Analítico</p>
                 <p className="text-xs mt-2 text-gray-500">
                   <strong>Filtro:</strong> {selectedCompanyId === 'all' ? 'Todos os Fornecedores' : companies.find(c => c.id == selectedCompanyId)?.nome} | 
-                  {filterDate ? ` Período: ${filterDate}` : ' Todo o Período'}
+                  {` Período: ${periodoAtual ?? '-'} (comparado a ${periodoAnterior ?? '-'})`}
                 </p>
               </div>
 
               <div className="grid grid-cols-1 md:grid-cols-2 xl:grid-cols-3 gap-6 mb-8 print:grid-cols-3 print:gap-4">
                 <div className="p-6 bg-slate-900 print:bg-white border border-red-500/20 print:border-black rounded-2xl shadow-lg flex items-center justify-between">
-                  <div><p className="text-slate-400 print:text-black text-sm mb-1 font-bold">Total Compras (Dívida)</p><h3 className="text-2xl font-bold text-red-400 print:text-black font-mono">{formatMoney(stats.totalIn)}</h3></div>
+                  <div><p className="text-slate-400 print:text-black text-sm mb-1 font-bold">Total Compras (Dívida)</p><h3 className="text-2xl font-bold text-red-400 print:text-black font-mono">{formatMoney(stats.totalIn)}</h3><p className="text-xs text-slate-500 print:text-black mt-1">{formatPct(variacao?.entradas_pct)} vs {periodoAnterior}</p></div>
                   <div className="p-3 bg-red-500/10 rounded-full text-red-400 print:hidden"><TrendingDown size={24} /></div>
                 </div>
                 <div className="p-6 bg-slate-900 print:bg-white border border-green-500/20 print:border-black rounded-2xl shadow-lg flex items-center justify-between">
-                  <div><p className="text-slate-400 print:text-black text-sm mb-1 font-bold">Total Pagos (Baixas)</p><h3 className="text-2xl font-bold text-green-400 print:text-black font-mono">{formatMoney(stats.totalOut)}</h3></div>
+                  <div><p className="text-slate-400 print:text-black text-sm mb-1 font-bold">Total Pagos (Baixas)</p><h3 className="text-2xl font-bold text-green-400 print:text-black font-mono">{formatMoney(stats.totalOut)}</h3><p className="text-xs text-slate-500 print:text-black mt-1">{formatPct(variacao?.saidas_pct)} vs {periodoAnterior}</p></div>
                   <div className="p-3 bg-green-500/10 rounded-full text-green-400 print:hidden"><TrendingUp size={24} /></div>
                 </div>
                 {/* O terceiro card ocupará 2 colunas no tablet se precisar, ou ficará sozinho */}
                 <div className="p-6 bg-slate-900 print:bg-white border border-slate-700 print:border-black rounded-2xl shadow-lg flex items-center justify-between md:col-span-2 xl:col-span-1">
-                  <div><p className="text-slate-400 print:text-black text-sm mb-1 font-bold">Saldo Devedor Atual</p><h3 className={`text-2xl font-bold font-mono ${stats.balance > 0 ? 'text-red-500 print:text-black' : 'text-green-500 print:text-black'}`}>{formatMoney(stats.balance)}</h3></div>
+                  <div><p className="text-slate-400 print:text-black text-sm mb-1 font-bold">Saldo do Período</p><h3 className={`text-2xl font-bold font-mono ${stats.balance > 0 ? 'text-red-500 print:text-black' : 'text-green-500 print:text-black'}`}>{formatMoney(stats.balance)}</h3></div>
                   <div className="p-3 bg-slate-800 rounded-full text-slate-300 print:hidden"><Wallet size={24} /></div>
                 </div>
               </div>
 
               <div className="bg-slate-900 print:bg-white border border-slate-800 print:border-none rounded-2xl overflow-hidden shadow-xl print:shadow-none print:w-full">
                 <div className="p-4 border-b border-slate-800 print:border-black bg-slate-900/50 print:bg-white">
-                  <h3 className="font-bold text-white print:text-black">Detalhamento das Movimentações</h3>
+                  <h3 className="font-bold text-white print:text-black">
+                    {selectedCompanyId === 'all' ? 'Comparativo por Fornecedor' : 'Comparativo por Classificação'}
+                  </h3>
                 </div>
 
                 <div className="overflow-x-auto w-full print:overflow-visible custom-scrollbar">
                   <table className="w-full text-left text-sm print:text-xs border-collapse">
                     <thead className="bg-slate-950 print:bg-white text-slate-400 print:text-black uppercase text-xs sticky top-0 print:static border-b print:border-black z-10">
                       <tr>
-                        <th className="p-4 print:p-2 border-b print:border-black min-w-[100px]">Data</th>
-                        <th className="p-4 print:p-2 border-b print:border-black min-w-[150px]">Empresa</th>
-                        <th className="p-4 print:p-2 border-b print:border-black">Tipo</th>
-                        <th className="p-4 print:p-2 border-b print:border-black">Classificação</th>
-                        <th className="p-4 print:p-2 border-b print:border-black">NF</th>
-                        <th className="p-4 text-right print:p-2 border-b print:border-black min-w-[120px]">Valor</th>
+                        <th className="p-4 print:p-2 border-b print:border-black min-w-[150px]">{selectedCompanyId === 'all' ? 'Empresa' : 'Classificação'}</th>
+                        <th className="p-4 text-right print:p-2 border-b print:border-black min-w-[120px]">Compras {periodoAnterior}</th>
+                        <th className="p-4 text-right print:p-2 border-b print:border-black min-w-[120px]">Compras {periodoAtual}</th>
+                        <th className="p-4 text-right print:p-2 border-b print:border-black">Var.</th>
+                        <th className="p-4 text-right print:p-2 border-b print:border-black min-w-[120px]">Pagos {periodoAtual}</th>
+                        <th className="p-4 text-right print:p-2 border-b print:border-black">Var.</th>
                       </tr>
                     </thead>
                     <tbody className="divide-y divide-slate-800 print:divide-gray-300 text-slate-300 print:text-black">
-                      {filteredTransactions.map((t) => (
-                        <tr key={t.id} className="hover:bg-slate-800/50 print:hover:bg-transparent break-inside-avoid">
-                          <td className="p-4 print:p-2 text-slate-400 print:text-black whitespace-nowrap">
-                            {formatDate(t.data_entrada || t.data)}
-                          </td>
-                          <td className="p-4 print:p-2 font-bold truncate max-w-[150px] print:max-w-none print:whitespace-normal">
-                            {t.nome_empresa}
-                          </td>
-                          <td className="p-4 print:p-2 font-bold">
-                            <span className={`print-font-bold ${t.tipo === 'entrada' ? 'text-red-400 print:text-black' : 'text-green-400 print:text-black'}`}>
-                              {t.tipo === 'entrada' ? 'COMPRA' : 'PAGO'}
-                            </span>
-                          </td>
-                          
-                          <td className="p-4 print:p-2 font-medium text-cyan-300 print:text-black">
-                            {getClassificacao(t)}
-                          </td>
-
-                          <td className="p-4 print:p-2 text-slate-300 print:text-black">{t.nf || '-'}</td>
-                          <td className="p-4 text-right font-mono font-medium print:p-2">
-                            {formatMoney(parseFloat(t.valor))}
-                          </td>
-                        </tr>
-                      ))}
-                      {filteredTransactions.length === 0 && (
+                      {grupos.map((g) => {
+                        const delta = g.variacoes.at(-1);
+                        return (
+                          <tr key={selectedCompanyId === 'all' ? g.empresa : g.tipo_material ?? ''} className="hover:bg-slate-800/50 print:hover:bg-transparent break-inside-avoid">
+                            <td className="p-4 print:p-2 font-bold truncate max-w-[200px] print:max-w-none print:whitespace-normal">
+                              {nomeGrupo(g)}
+                            </td>
+                            <td className="p-4 text-right font-mono text-slate-400 print:text-black print:p-2">
+                              {formatMoney(parseFloat(g.periodos[periodoAnterior].entradas))}
+                            </td>
+                            <td className="p-4 text-right font-mono font-medium text-red-400 print:text-black print:p-2">
+                              {formatMoney(parseFloat(g.periodos[periodoAtual].entradas))}
+                            </td>
+                            <td className="p-4 text-right font-mono text-xs print:p-2">{formatPct(delta.entradas_pct)}</td>
+                            <td className="p-4 text-right font-mono font-medium text-green-400 print:text-black print:p-2">
+                              {formatMoney(parseFloat(g.periodos[periodoAtual].saidas))}
+                            </td>
+                            <td className="p-4 text-right font-mono text-xs print:p-2">{formatPct(delta.saidas_pct)}</td>
+                          </tr>
+                        );
+                      })}
+                      {grupos.length === 0 && (
                         <tr><td colSpan="6" className="p-8 text-center italic text-slate-500 print:text-black">Nenhum dado para este filtro.</td></tr>
                       )}
                     </tbody>
@@ -1,5 +1,6 @@
 import React, { useEffect, useState } from 'react';
 import api from '../services/api';
+import { useEventos } from '../services/eventos';
 import { 
   BarChart, Wallet, AlertCircle, CheckCircle2, 
   RefreshCw, TrendingUp, TrendingDown, Code, Briefcase, Eye 
@@ -11,6 +12,11 @@ import { Bar } from 'react-chartjs-2';
 
 ChartJS.register(CategoryScale, LinearScale, BarElement, Title, Tooltip, Legend);
 
+const CAMPOS_RESUMO = ['tipo', 'status', 'valor'];
+const afetaResumo = (tabela, evento) => (
+  evento.acao !== 'alterado' || !evento.campos || CAMPOS_RESUMO.some((campo) => campo in evento.campos)
+);
+
 export default function Dashboard() {
   const [loading, setLoading] = useState(true);
   
@@ -33,9 +39,8 @@ export default function Dashboard() {
   const fetchData = async () => {
     setLoading(true);
     try {
-      const response = await api.get('/transacoes/');
-      const data = response.data || []; // Garante que é array
-      calculateKPIs(data);
+      const response = await api.get('/transacoes/resumo/');
+      calculateKPIs(response.data);
     } catch (error) { 
         console.error("Erro ao buscar dados", error); 
     } finally { 
@@ -44,33 +49,21 @@ export default function Dashboard() {
   };
 
   useEffect(() => { fetchData(); }, []);
+  // Notas lançadas, baixadas ou excluídas em outra tela (ou por outro usuário) atualizam
+  // os KPIs. O evento de alteração só traz os campos que mudaram (não os valores
+  // anteriores), então o resumo é relido; edições que não mexem nos totais são ignoradas
+  useEventos(['transacao'], fetchData, 1000, afetaResumo);
 
-  const calculateKPIs = (data) => {
-    // Proteção: Garante que valor seja tratado como número, mesmo se vier null ou string
+  const calculateKPIs = (resumo) => {
+    // Totais já vêm agregados do servidor; garante que sejam tratados como número
     const safeValue = (v) => parseFloat(v || 0);
 
-    const tIn = data
-        .filter(t => t.tipo === 'entrada')
-        .reduce((acc, curr) => acc + safeValue(curr.valor), 0);
-    
-    const tOut = data
-        .filter(t => t.tipo === 'saida')
-        .reduce((acc, curr) => acc + safeValue(curr.valor), 0);
-    
-    const pendente = data.filter(t => t.tipo === 'entrada' && t.status === 'pendente').length;
-    const pagos = data.filter(t => t.tipo === 'saida').length;
-    
-    // Cálculo seguro do saldo
-    const saldoDevedorReal = data
-      .filter(t => t.tipo === 'entrada' && t.status === 'pendente')
-      .reduce((acc, curr) => acc + safeValue(curr.valor), 0);
-
     setKpiData({ 
-        totalIn: tIn, 
-        totalOut: tOut, 
-        balance: saldoDevedorReal, 
-        pendingCount: pendente, 
-        paidCount: pagos 
+        totalIn: safeValue(resumo.total_entradas), 
+        totalOut: safeValue(resumo.total_saidas), 
+        balance: safeValue(resumo.saldo_devedor), 
+        pendingCount: resumo.qtd_pendentes || 0, 
+        paidCount: resumo.qtd_saidas || 0 
     });
   };
 
@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import api from '../services/api';
+import { sincronizar } from '../services/sincronizacao';
 import * as XLSX from 'xlsx';
 import { 
   Building2, Plus, Trash2, Loader2, FileText, CheckCircle2, 
@@ -9,7 +10,7 @@ import {
 
 export default function Empresas() {
   const [companies, setCompanies] = useState([]);
-  const [allTransactions, setAllTransactions] = useState([]); 
+  const [companyTransactions, setCompanyTransactions] = useState([]); 
   const [loading, setLoading] = useState(true);
   
   const [searchTerm, setSearchTerm] = useState('');
@@ -45,12 +46,9 @@ export default function Empresas() {
 
   const fetchInitialData = async () => {
     try {
-      const [resComp, resTrans] = await Promise.all([
-        api.get('/empresas/'),
-        api.get('/transacoes/')
-      ]);
-      setCompanies(resComp.data);
-      setAllTransactions(resTrans.data);
+      // O saldo de cada empresa já vem consolidado no próprio cadastro;
+      // depois da primeira carga só chega o que mudou
+      setCompanies(await sincronizar('empresas'));
     } catch (error) { 
       console.error("Erro ao carregar dados", error);
     } finally { 
@@ -58,9 +56,13 @@ export default function Empresas() {
     }
   };
 
-  const exportToExcel = (company) => {
-    const companyTrans = allTransactions
-      .filter(t => t.empresa === company.id)
+  const fetchCompanyTransactions = async (companyId) => {
+    const response = await api.get('/transacoes/', { params: { empresa: companyId } });
+    return response.data;
+  };
+
+  const exportToExcel = async (company) => {
+    const companyTrans = (await fetchCompanyTransactions(company.id))
       .sort((a, b) => new Date(a.data_entrada || a.data) - new Date(b.data_entrada || b.data));
 
     const totalSaldo = companyTrans.reduce((acc, t) => t.tipo === 'entrada' ? acc - parseFloat(t.valor) : acc + parseFloat(t.valor), 0);
@@ -155,9 +157,15 @@ export default function Empresas() {
     setShowModal(true);
   };
 
-  const openDetailsModal = (company) => {
+  const openDetailsModal = async (company) => {
     setSelectedCompany(company);
+    setCompanyTransactions([]);
     setShowDetails(true);
+    try {
+      setCompanyTransactions(await fetchCompanyTransactions(company.id));
+    } catch (error) {
+      console.error("Erro ao carregar extrato", error);
+    }
   };
 
   const handleSave = async (e) => {
@@ -181,9 +189,8 @@ export default function Empresas() {
   };
 
   const handleDeleteClick = (id) => {
-    const temDivida = allTransactions.some(t => 
-      t.empresa === id && t.tipo === 'entrada' && t.status === 'pendente'
-    );
+    const company = companies.find(c => c.id === id);
+    const temDivida = (company?.saldo?.qtd_pendentes || 0) > 0;
     if (temDivida) {
       showToast("Ação Bloqueada: Empresa possui pendências financeiras.", "error");
       return; 
@@ -212,7 +219,7 @@ export default function Empresas() {
 
   const getDetailsTransactions = () => {
     if (!selectedCompany) return [];
-    return allTransactions.filter(t => t.empresa === selectedCompany.id)
+    return [...companyTransactions]
       .sort((a, b) => new Date(a.data_entrada || a.data_saida || a.data) - new Date(b.data_entrada || b.data_saida || b.data));
   };
   const detailsTransactions = getDetailsTransactions();
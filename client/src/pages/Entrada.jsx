@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import api from '../services/api';
+import { sincronizar } from '../services/sincronizacao';
 import { Download, Building2, FileText, DollarSign, CheckCircle2, AlertTriangle, X, Loader2, Package, MapPin, Calendar } from 'lucide-react';
 
 export default function Entrada() {
@@ -25,8 +26,7 @@ export default function Entrada() {
 
   const fetchCompanies = async () => {
     try {
-      const response = await api.get('/empresas/');
-      setCompanies(response.data);
+      setCompanies(await sincronizar('empresas'));
     } catch (error) { console.error("Erro ao carregar empresas"); }
   };
 
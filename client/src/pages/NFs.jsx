@@ -1,5 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import api from '../services/api';
+import { sincronizar } from '../services/sincronizacao';
+import { useBuscaTransacoes } from '../services/busca';
 import { 
   FileText, Search, Filter, Calendar, DollarSign, 
   Building2, Edit2, CheckCircle2, AlertCircle, X, 
@@ -30,15 +32,13 @@ export default function NFs() {
     setLoading(true);
     try {
       const [transResponse, compResponse] = await Promise.all([
-        api.get('/transacoes/'),
-        api.get('/empresas/')
+        // Apenas entradas, para evitar duplicidade com as saídas
+        api.get('/transacoes/', { params: { tipo: 'entrada' } }),
+        sincronizar('empresas')
       ]);
 
-      // Filtra apenas entradas para evitar duplicidade com as saídas
-      const onlyInvoices = transResponse.data.filter(t => t.tipo === 'entrada');
-      
-      setTransactions(onlyInvoices);
-      setCompanies(compResponse.data);
+      setTransactions(transResponse.data);
+      setCompanies(compResponse);
     } catch (error) {
       console.error("Erro ao buscar dados", error);
     } finally {
@@ -51,21 +51,15 @@ export default function NFs() {
     return comp ? { cnpj: comp.cnpj, nome: comp.nome } : { cnpj: '---', nome: 'Desconhecida' };
   };
 
-  const filteredTransactions = transactions
-    .filter(t => {
-      const comp = getCompanyDetails(t.empresa);
-      const searchLower = searchTerm.toLowerCase();
-      
-      const nf = t.nf ? t.nf.toLowerCase() : '';
-      const nome = comp.nome ? comp.nome.toLowerCase() : '';
-      const status = t.status ? t.status.toLowerCase() : '';
+  // Termos de status ("pago", "pend...") filtram a lista já carregada;
+  // o resto (NF, descrição, empresa, CNPJ) vai para a busca do servidor
+  const termoStatus = searchTerm.trim().toLowerCase();
+  const buscaPorStatus = termoStatus.length >= 3 && ['pago', 'pendente'].some(s => s.startsWith(termoStatus));
+  const { resultados, buscando } = useBuscaTransacoes(buscaPorStatus ? '' : searchTerm, { tipo: 'entrada' }, transactions);
 
-      return (
-        nf.includes(searchLower) ||
-        nome.includes(searchLower) ||
-        status.includes(searchLower)
-      );
-    })
+  const filteredTransactions = (buscaPorStatus
+    ? transactions.filter(t => t.status && t.status.startsWith(termoStatus))
+    : [...(resultados ?? transactions)])
     .sort((a, b) => {
       if (sortBy === 'valor') return parseFloat(b.valor) - parseFloat(a.valor); 
       
@@ -258,10 +252,12 @@ export default function NFs() {
           
           <div className="flex flex-col sm:flex-row gap-3 w-full sm:w-auto">
             <div className="relative group">
-              <Search className="absolute left-3 top-1/2 -translate-y-1/2 text-slate-500 group-focus-within:text-cyan-400 transition-colors" size={18} />
+              {buscando
+                ? <Loader2 className="absolute left-3 top-1/2 -translate-y-1/2 text-cyan-400 animate-spin" size={18} />
+                : <Search className="absolute left-3 top-1/2 -translate-y-1/2 text-slate-500 group-focus-within:text-cyan-400 transition-colors" size={18} />}
               <input 
                 type="text" 
-                placeholder="Buscar por NF ou Empresa..." 
+                placeholder="Buscar por NF, Empresa ou CNPJ..." 
                 value={searchTerm}
                 onChange={e => setSearchTerm(e.target.value)}
                 className="w-full sm:w-64 bg-slate-900 border border-slate-700 rounded-xl pl-10 pr-4 py-2.5 text-sm text-white focus:border-cyan-400 outline-none transition-all"
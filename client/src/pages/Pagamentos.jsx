@@ -1,7 +1,11 @@
 import React, { useState, useEffect } from 'react';
 import api from '../services/api';
+import { useBuscaTransacoes } from '../services/busca';
+import { useListaAoVivo } from '../services/eventos';
 import { FileText, Loader2, Wallet, Search, ArrowUpDown } from 'lucide-react';
 
+const FILTROS = { tipo: 'saida' };
+
 export default function Pagamentos() {
   const [pagamentos, setPagamentos] = useState([]);
   const [loading, setLoading] = useState(true);
@@ -14,9 +18,8 @@ export default function Pagamentos() {
 
   const fetchPagamentos = async () => {
     try {
-      const response = await api.get('/transacoes/');
-      const filtered = response.data.filter(t => t.tipo === 'saida');
-      setPagamentos(filtered);
+      const response = await api.get('/transacoes/', { params: FILTROS });
+      setPagamentos(response.data);
     } catch (error) {
       console.error("Erro ao buscar dados");
     } finally {
@@ -24,6 +27,9 @@ export default function Pagamentos() {
     }
   };
 
+  // Notas lançadas, baixadas ou excluídas em outra tela (ou por outro usuário)
+  useListaAoVivo('transacao', FILTROS, pagamentos, setPagamentos, fetchPagamentos);
+
   const formatMoney = (val) => val.toLocaleString('pt-BR', { style: 'currency', currency: 'BRL' });
 
   const formatDate = (dateString) => {
@@ -31,13 +37,10 @@ export default function Pagamentos() {
     return new Date(dateString).toLocaleDateString('pt-BR', { timeZone: 'UTC' });
   };
 
-  const filteredList = pagamentos
-    .filter(item => {
-      const searchLower = searchTerm.toLowerCase();
-      const nomeEmpresa = item.nome_empresa ? item.nome_empresa.toLowerCase() : '';
-      const numeroNF = item.nf ? item.nf.toLowerCase() : '';
-      return nomeEmpresa.includes(searchLower) || numeroNF.includes(searchLower);
-    })
+  // A busca é feita no servidor; sem termo, a lista completa já carregada
+  const { resultados } = useBuscaTransacoes(searchTerm, FILTROS, pagamentos);
+
+  const filteredList = [...(resultados ?? pagamentos)]
     .sort((a, b) => {
       // Ordenação por Valor
       if (sortBy === 'valor') {
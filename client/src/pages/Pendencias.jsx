@@ -1,8 +1,12 @@
 import React, { useState, useEffect } from 'react';
 import api from '../services/api';
+import { useBuscaTransacoes } from '../services/busca';
+import { useListaAoVivo } from '../services/eventos';
 import { Clock, AlertCircle, Loader2, ArrowRight, CheckCircle2, Search, ArrowUpDown } from 'lucide-react';
 import { useNavigate } from 'react-router-dom';
 
+const FILTROS = { tipo: 'entrada', status: 'pendente' };
+
 export default function Pendencias() {
   const [pendencias, setPendencias] = useState([]);
   const [loading, setLoading] = useState(true);
@@ -17,9 +21,8 @@ export default function Pendencias() {
 
   const fetchPendencias = async () => {
     try {
-      const response = await api.get('/transacoes/');
-      const filtered = response.data.filter(t => t.tipo === 'entrada' && t.status === 'pendente');
-      setPendencias(filtered);
+      const response = await api.get('/transacoes/', { params: FILTROS });
+      setPendencias(response.data);
     } catch (error) {
       console.error("Erro ao buscar dados");
     } finally {
@@ -27,6 +30,9 @@ export default function Pendencias() {
     }
   };
 
+  // Notas lançadas, baixadas ou excluídas em outra tela (ou por outro usuário)
+  useListaAoVivo('transacao', FILTROS, pendencias, setPendencias, fetchPendencias);
+
   const formatMoney = (val) => val.toLocaleString('pt-BR', { style: 'currency', currency: 'BRL' });
 
   const formatDate = (dateString) => {
@@ -34,14 +40,10 @@ export default function Pendencias() {
     return new Date(dateString).toLocaleDateString('pt-BR', { timeZone: 'UTC' });
   };
 
-  const filteredList = pendencias
-    .filter(item => {
-      const searchLower = searchTerm.toLowerCase();
-      const nomeEmpresa = item.nome_empresa ? item.nome_empresa.toLowerCase() : '';
-      const numeroNF = item.nf ? item.nf.toLowerCase() : '';
-      
-      return nomeEmpresa.includes(searchLower) || numeroNF.includes(searchLower);
-    })
+  // A busca é feita no servidor; sem termo, a lista completa já carregada
+  const { resultados } = useBuscaTransacoes(searchTerm, FILTROS, pendencias);
+
+  const filteredList = [...(resultados ?? pendencias)]
     .sort((a, b) => {
       // Ordenação por Valor (Maior para Menor)
       if (sortBy === 'valor') {
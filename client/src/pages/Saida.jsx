@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import api from '../services/api';
+import { sincronizar } from '../services/sincronizacao';
 import { Upload, Building2, DollarSign, CheckCircle2, AlertTriangle, X, Loader2, ArrowRight, Wallet, Calendar, Ban } from 'lucide-react';
 
 export default function Saida() {
@@ -29,14 +30,13 @@ export default function Saida() {
   const isFutureDate = dataSaidaLimpa > hoje;
   const hasDateError = isDateBeforeEntry || isFutureDate;
 
-  useEffect(() => { api.get('/empresas/').then(res => setCompanies(res.data)); }, []);
+  useEffect(() => { sincronizar('empresas').then(setCompanies); }, []);
 
   useEffect(() => {
     setPendingNotes([]); setSelectedNoteId(''); setValor(''); setEmendaSelecionada(''); setCompanyEmendas([]); setDataEntradaRef('');
     if (companyId) {
-      api.get('/transacoes/').then(res => {
-        const pendentes = res.data.filter(t => t.empresa === parseInt(companyId) && t.tipo === 'entrada' && t.status === 'pendente');
-        setPendingNotes(pendentes);
+      api.get('/transacoes/', { params: { empresa: companyId, tipo: 'entrada', status: 'pendente' } }).then(res => {
+        setPendingNotes(res.data);
       });
       const selectedComp = companies.find(c => c.id === parseInt(companyId));
       if (selectedComp && selectedComp.emendas) { setCompanyEmendas(selectedComp.emendas); }
@@ -70,20 +70,18 @@ export default function Saida() {
     setLoading(true);
     try {
       const valorFloat = parseCurrency(valor);
-      const noteOriginal = pendingNotes.find(n => n.id === parseInt(selectedNoteId));
 
-      const payloadSaida = {
-        empresa: companyId, tipo: 'saida', status: 'pago', nf: noteOriginal.nf,
-        descricao: `[${setor}] ${motivo}`, valor: valorFloat, emenda_origem: emendaSelecionada || "Recurso Próprio", data_saida: dataSaida 
-      };
-      await api.post('/transacoes/', payloadSaida);
-
-      const payloadUpdate = { ...noteOriginal, empresa: noteOriginal.empresa, status: 'pago', data_saida: dataSaida };
-      await api.put(`/transacoes/${selectedNoteId}/`, payloadUpdate);
+      // Cria a saída e marca a nota como paga em uma única operação no servidor
+      await api.post(`/transacoes/${selectedNoteId}/baixa/`, {
+        descricao: `[${setor}] ${motivo}`, valor: valorFloat, emenda_origem: emendaSelecionada || "Recurso Próprio", data_saida: dataSaida
+      });
 
       showToast("Baixa realizada com sucesso!", "success");
       setCompanyId(''); setMotivo(''); setValor(''); setDataSaida(hoje); setDataEntradaRef('');
-    } catch (error) { showToast("Erro ao processar baixa.", "error"); } finally { setLoading(false); }
+    } catch (error) {
+      if (error.response?.status === 409) showToast(error.response.data.detail, "error");
+      else showToast("Erro ao processar baixa.", "error");
+    } finally { setLoading(false); }
   };
 
   return (
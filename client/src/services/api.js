@@ -10,13 +10,24 @@ api.interceptors.request.use((config) => {
   if (token) {
     config.headers.Authorization = `Bearer ${token}`;
   }
+
+  // Depois de uma escrita o servidor lê do banco principal por alguns segundos,
+  // em qualquer worker, enquanto receber de volta a marca que ele mesmo assinou
+  const escritaRecente = localStorage.getItem('escrita_recente');
+  if (escritaRecente) {
+    config.headers['X-Escrita-Recente'] = escritaRecente;
+  }
   
   return config;
 });
 
 
 api.interceptors.response.use(
-  (response) => response,
+  (response) => {
+    const escritaRecente = response.headers['x-escrita-recente'];
+    if (escritaRecente) localStorage.setItem('escrita_recente', escritaRecente);
+    return response;
+  },
   (error) => {
     if (error.response && error.response.status === 401) {
       if (window.location.pathname !== '/') {
@@ -0,0 +1,43 @@
+import { useEffect, useState } from 'react';
+import api from './api';
+
+// Busca de notas no servidor (/transacoes/busca/): NF, descrição e nome/CNPJ da empresa.
+// Espera o usuário parar de digitar antes de consultar. Com menos de 2 caracteres
+// retorna null (a tela mostra a lista completa).
+export function useBuscaTransacoes(termo, filtros = {}, recarga = null) {
+  const [resultados, setResultados] = useState(null);
+  const [buscando, setBuscando] = useState(false);
+  const chaveFiltros = JSON.stringify(filtros);
+
+  useEffect(() => {
+    const q = termo.trim();
+    if (q.length < 2) {
+      setResultados(null);
+      setBuscando(false);
+      return;
+    }
+
+    let cancelada = false;
+    setBuscando(true);
+    const timer = setTimeout(async () => {
+      try {
+        const response = await api.get('/transacoes/busca/', {
+          params: { ...JSON.parse(chaveFiltros), q, page_size: 100 },
+        });
+        if (!cancelada) setResultados(response.data.results);
+      } catch (error) {
+        console.error("Erro na busca", error);
+        if (!cancelada) setResultados([]);
+      } finally {
+        if (!cancelada) setBuscando(false);
+      }
+    }, 300);
+
+    return () => {
+      cancelada = true;
+      clearTimeout(timer);
+    };
+  }, [termo, chaveFiltros, recarga]);
+
+  return { resultados, buscando };
+}
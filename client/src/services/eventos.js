@@ -0,0 +1,173 @@
+import { useEffect, useRef } from 'react';
+import api from './api';
+
+// Fluxo de alterações do servidor (/eventos/, text/event-stream).
+// Lido com fetch (e não EventSource) para enviar o token no cabeçalho Authorization.
+// Uma única conexão por aba, compartilhada por todos os componentes inscritos;
+// reconecta sozinha quando o servidor encerra o fluxo ou a rede cai, esperando
+// o dobro a cada falha seguida. Um 503 (servidor sem ASGI) não muda até o próximo
+// deploy: a aba desiste e as telas ficam só com os próprios carregamentos.
+
+const ESPERA_MAXIMA = 60000;
+
+const ouvintes = new Set();
+let controle = null;
+let indisponivel = false;
+
+function distribuir(tabela, dados) {
+  // 'pronto' só confirma a conexão; não há o que atualizar
+  if (tabela === 'conexao' && dados.acao === 'pronto') return;
+  ouvintes.forEach((ouvinte) => {
+    // 'recarregar' (eventos descartados no servidor) interessa a todos
+    if (tabela === 'conexao' || ouvinte.tabelas.includes(tabela)) ouvinte.callback(tabela, dados);
+  });
+}
+
+async function conectar(sinal) {
+  let espera = 3000;
+  let falhas = 0;
+  while (!sinal.aborted) {
+    try {
+      const token = localStorage.getItem('token');
+      const resposta = await fetch(`${import.meta.env.VITE_API_URL}/eventos/`, {
+        headers: { Accept: 'text/event-stream', ...(token ? { Authorization: `Bearer ${token}` } : {}) },
+        signal: sinal,
+      });
+      if (resposta.status === 503) {
+        console.warn("Fluxo de eventos indisponível neste servidor (HTTP 503)");
+        indisponivel = true;
+        return;
+      }
+      if (!resposta.ok) throw new Error(`Fluxo de eventos: HTTP ${resposta.status}`);
+      falhas = 0;
+
+      const leitor = resposta.body.pipeThrough(new TextDecoderStream()).getReader();
+      let pendente = '';
+      for (;;) {
+        const { value, done } = await leitor.read();
+        if (done) break;
+        pendente += value;
+        const blocos = pendente.split('\n\n');
+        pendente = blocos.pop();
+        for (const bloco of blocos) {
+          let nome = 'message';
+          let dados = '';
+          for (const linha of bloco.split('\n')) {
+            if (linha.startsWith('event: ')) nome = linha.slice(7);
+            else if (linha.startsWith('data: ')) dados += linha.slice(6);
+            else if (linha.startsWith('retry: ')) espera = Number(linha.slice(7)) || espera;
+          }
+          if (dados) distribuir(nome, JSON.parse(dados));
+        }
+      }
+    } catch (error) {
+      if (sinal.aborted) return;
+      console.error("Erro no fluxo de eventos", error);
+      falhas += 1;
+    }
+    const atraso = Math.min(espera * 2 ** falhas, ESPERA_MAXIMA);
+    await new Promise((resolve) => setTimeout(resolve, atraso));
+  }
+}
+
+function inscrever(ouvinte) {
+  ouvintes.add(ouvinte);
+  if (!controle && !indisponivel) {
+    controle = new AbortController();
+    conectar(controle.signal);
+  }
+  return () => {
+    ouvintes.delete(ouvinte);
+    if (ouvintes.size === 0 && controle) {
+      controle.abort();
+      controle = null;
+    }
+  };
+}
+
+// Chama `callback(tabela, evento)` a cada alteração em uma das tabelas
+// ('transacao', 'empresa', 'notificacao') e quando o servidor pede para recarregar
+// (tabela 'conexao'). Com `atraso`, rajadas de eventos viram uma única chamada,
+// sem argumentos. Com `filtro(tabela, evento)`, só os eventos aceitos contam.
+export function useEventos(tabelas, callback, atraso = 0, filtro = null) {
+  const ref = useRef({ callback, filtro });
+  ref.current = { callback, filtro };
+  const chave = tabelas.join(',');
+
+  useEffect(() => {
+    let timer = null;
+    const ouvinte = {
+      tabelas: chave.split(','),
+      callback: (tabela, evento) => {
+        const { callback, filtro } = ref.current;
+        if (filtro && tabela !== 'conexao' && !filtro(tabela, evento)) return;
+        if (!atraso) return callback(tabela, evento);
+        clearTimeout(timer);
+        timer = setTimeout(() => ref.current.callback(), atraso);
+      },
+    };
+    const cancelar = inscrever(ouvinte);
+    return () => {
+      clearTimeout(timer);
+      cancelar();
+    };
+  }, [chave, atraso]);
+}
+
+// Endpoint de cada tabela dos eventos
+const RECURSOS = { transacao: 'transacoes', empresa: 'empresas', notificacao: 'notificacoes' };
+// Colunas do evento que têm outro nome na API, e o campo de leitura que dependem delas
+const CAMPOS_API = { empresa_id: 'empresa', emenda_id: 'emenda' };
+const CAMPOS_DERIVADOS = { empresa_id: 'nome_empresa', emenda_id: 'emenda_origem' };
+
+// Mantém `lista` (linhas da API de `tabela` com os `filtros` da consulta) em dia com os
+// eventos, sem recarregá-la: exclusões saem, alterações são mescladas na linha e
+// só as linhas novas (ou que passaram a atender os filtros) são buscadas, uma a uma.
+// Eventos sem os campos (importação em lote) e 'recarregar' chamam `recarregar()`.
+export function useListaAoVivo(tabela, filtros, lista, setLista, recarregar) {
+  const atual = useRef(lista);
+  atual.current = lista;
+
+  const atende = (linha) => Object.entries(filtros).every(([campo, valor]) => linha[campo] === valor);
+
+  const buscar = async (id) => {
+    try {
+      const { data } = await api.get(`/${RECURSOS[tabela]}/${id}/`);
+      setLista((linhas) => {
+        const outras = linhas.filter((linha) => linha.id !== id);
+        return atende(data) ? [...outras, data] : outras;
+      });
+    } catch (error) {
+      // Excluída nesse meio tempo: o evento de exclusão cuida dela
+      if (error.response?.status !== 404) console.error("Erro ao atualizar a lista", error);
+    }
+  };
+
+  useEventos([tabela], (nome, evento) => {
+    if (nome === 'conexao') return recarregar();
+    if (evento.acao === 'excluido') {
+      return setLista((linhas) => linhas.filter((linha) => linha.id !== evento.id));
+    }
+    if (!evento.campos) return recarregar();
+
+    const campos = Object.fromEntries(
+      Object.entries(evento.campos).map(([campo, valor]) => [CAMPOS_API[campo] ?? campo, valor]),
+    );
+    // Um campo dos filtros em conflito: a linha não está (mais) na lista
+    const pode = Object.entries(filtros).every(([campo, valor]) => !(campo in campos) || campos[campo] === valor);
+    const presente = atual.current.some((linha) => linha.id === evento.id);
+
+    if (!pode) {
+      if (presente) setLista((linhas) => linhas.filter((linha) => linha.id !== evento.id));
+      return;
+    }
+    const derivados = Object.keys(CAMPOS_DERIVADOS).some((campo) => campo in evento.campos);
+    if (evento.acao === 'criado' || derivados) return buscar(evento.id);
+    if (presente) {
+      setLista((linhas) => linhas.map((linha) => (linha.id === evento.id ? { ...linha, ...campos } : linha)));
+    } else if (Object.keys(filtros).some((campo) => campo in campos)) {
+      // Passou a atender os filtros (ex.: voltou a pendente): o evento só traz o que mudou
+      buscar(evento.id);
+    }
+  });
+}
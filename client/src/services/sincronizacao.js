@@ -0,0 +1,28 @@
+import api from './api';
+
+// Cache local das listagens, atualizado pelo endpoint /<recurso>/sincronizar/:
+// a primeira chamada traz tudo e as seguintes só o que mudou (e os ids excluídos)
+// desde o token anterior. Vale para a aba; some ao recarregar a página.
+
+const caches = new Map();
+
+export async function sincronizar(recurso) {
+  const dono = localStorage.getItem('token');
+  let cache = caches.get(recurso);
+  // Outro login na mesma aba pode ver outro banco (.dev): começa do zero
+  if (!cache || cache.dono !== dono) {
+    cache = { dono, token: null, linhas: new Map() };
+    caches.set(recurso, cache);
+  }
+
+  let mais = true;
+  while (mais) {
+    const { data } = await api.get(`/${recurso}/sincronizar/`, { params: cache.token ? { since: cache.token } : {} });
+    if (data.completo) cache.linhas.clear();
+    data.alterados.forEach((linha) => cache.linhas.set(linha.id, linha));
+    data.excluidos.forEach((id) => cache.linhas.delete(id));
+    cache.token = data.token;
+    mais = data.mais;
+  }
+  return [...cache.linhas.values()].sort((a, b) => a.id - b.id);
+}
@@ -1,19 +1,38 @@
 from django.contrib import admin
-from .models import Empresa, Transacao
+from .busca import buscar_empresas, buscar_transacoes
+from .models import Emenda, Empresa, Transacao
+
+@admin.register(Emenda)
+class EmendaAdmin(admin.ModelAdmin):
+    list_display = ('nome', 'valor_alocado')
+    search_fields = ('nome',)
 
 @admin.register(Empresa)
 class EmpresaAdmin(admin.ModelAdmin):
     list_display = ('nome', 'cnpj', 'licitacao', 'tipo_display')
     search_fields = ('nome', 'cnpj')
     list_filter = ('licitacao',)
+    filter_horizontal = ('emendas',)
 
     def tipo_display(self, obj):
         return ", ".join(obj.tipo)
     tipo_display.short_description = 'Ramos'
 
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return buscar_empresas(queryset, search_term), False
+
 @admin.register(Transacao)
 class TransacaoAdmin(admin.ModelAdmin):
     list_display = ('tipo', 'valor', 'empresa', 'data', 'status', 'nf')
     list_filter = ('tipo', 'status', 'data', 'empresa')
     search_fields = ('descricao', 'nf', 'empresa__nome')
-    ordering = ('-data',)
\ No newline at end of file
+    ordering = ('-data',)
+
+    def get_search_results(self, request, queryset, search_term):
+        # Mesma busca indexada da API, em vez de icontains (varredura da tabela)
+        if not search_term.strip():
+            return queryset, False
+        encontradas, _ = buscar_transacoes(queryset, search_term)
+        return encontradas, False
\ No newline at end of file
@@ -0,0 +1,116 @@
+import time
+from datetime import date
+
+from django.conf import settings
+from django.db import connections, transaction
+
+from . import versoes
+from .models import Transacao, TransacaoArquivo, TransacaoHistorico
+
+# Colunas copiadas entre as tabelas (o vetor de busca é gerado em cada uma)
+COLUNAS = [f.column for f in Transacao._meta.concrete_fields if not f.generated]
+
+
+def corte(hoje=None):
+    """
+    Primeiro dia que fica sempre na tabela ativa: 1º de janeiro do mais antigo
+    dos ARQUIVO_ANOS_ATIVOS exercícios mantidos (2: o atual e o anterior).
+    """
+    hoje = hoje or date.today()
+    return date(hoje.year - settings.ARQUIVO_ANOS_ATIVOS + 1, 1, 1)
+
+
+def somente_ativas(params):
+    """
+    Se os filtros da listagem garantem que nenhuma nota arquivada atende:
+    pendentes (só pagas são arquivadas) ou data_inicio a partir do corte.
+    """
+    if params.get('status') == 'pendente':
+        return True
+    try:
+        return bool(params.get('data_inicio')) and date.fromisoformat(params['data_inicio']) >= corte()
+    except ValueError:
+        # filtrar_transacoes devolve o erro de validação
+        return False
+
+
+def transacoes(params):
+    """
+    Consulta base das leituras de notas: só a tabela ativa quando o período
+    pedido é recente, senão a visão com o arquivo (o resultado é o mesmo de
+    antes do arquivamento).
+    """
+    if somente_ativas(params):
+        return Transacao.objects.all()
+    return TransacaoHistorico.objects.all()
+
+
+def _mover(using, origem, destino, condicao, parametros, lote):
+    """Move até `lote` linhas de `origem` para `destino` em um único comando. Retorna quantas."""
+    conexao = connections[using]
+    q = conexao.ops.quote_name
+    colunas = ', '.join(q(c) for c in COLUNAS)
+    # SKIP LOCKED: notas travadas por uma escrita em andamento ficam para a próxima rodada
+    sql = (
+        f"WITH lote AS ("
+        f" SELECT id FROM {q(origem)} WHERE {condicao} ORDER BY id LIMIT %s FOR UPDATE SKIP LOCKED"
+        f"), movidas AS ("
+        f" DELETE FROM {q(origem)} o USING lote WHERE o.id = lote.id RETURNING o.*"
+        f") INSERT INTO {q(destino)} ({colunas}) SELECT {colunas} FROM movidas"
+    )
+    with transaction.atomic(using=using):
+        with conexao.cursor() as cursor:
+            cursor.execute(sql, [*parametros, lote])
+            movidas = cursor.rowcount
+        if movidas:
+            # A listagem passa a marcar essas notas como arquivadas
+            versoes.marcar_alteracao(using, 'transacao')
+    return movidas
+
+
+def _em_lotes(mover, lote, pausa, progresso):
+    total = 0
+    while True:
+        movidas = mover()
+        total += movidas
+        if progresso and movidas:
+            progresso(total)
+        if movidas < lote:
+            return total
+        # Cada lote é uma transação curta; a pausa deixa o banco respirar (réplicas, vacuum)
+        time.sleep(pausa)
+
+
+def arquivar(using='default', antes=None, lote=None, pausa=0, progresso=None):
+    """
+    Move para o arquivo as notas pagas com data_entrada anterior a `antes`
+    (padrão e limite: corte()), em lotes de `lote` linhas, cada um na sua
+    transação. Sem signals: saldo, resumo mensal e atualizado_em não mudam,
+    pois as notas continuam existindo. Retorna quantas moveu.
+    """
+    limite = corte()
+    antes = antes or limite
+    if antes > limite:
+        raise ValueError(
+            f"Só exercícios anteriores a {limite:%d/%m/%Y} podem ser arquivados (ARQUIVO_ANOS_ATIVOS)."
+        )
+    lote = lote or settings.ARQUIVO_TAMANHO_LOTE
+    origem, destino = Transacao._meta.db_table, TransacaoArquivo._meta.db_table
+    return _em_lotes(
+        lambda: _mover(using, origem, destino, "status = 'pago' AND data_entrada < %s", [antes], lote),
+        lote, pausa, progresso,
+    )
+
+
+def restaurar(using='default', lote=None, pausa=0, progresso=None):
+    """
+    Devolve à tabela ativa as notas arquivadas a partir de corte(), depois de
+    aumentar ARQUIVO_ANOS_ATIVOS; sem isso as consultas de período recente
+    (que leem só a tabela ativa) não as encontrariam. Retorna quantas moveu.
+    """
+    lote = lote or settings.ARQUIVO_TAMANHO_LOTE
+    origem, destino = TransacaoArquivo._meta.db_table, Transacao._meta.db_table
+    return _em_lotes(
+        lambda: _mover(using, origem, destino, "data_entrada >= %s", [corte()], lote),
+        lote, pausa, progresso,
+    )
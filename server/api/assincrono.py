@@ -0,0 +1,78 @@
+import functools
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+
+_FIM = object()
+
+
+async def em_partes(iteravel):
+    """
+    Entrega um iterador síncrono (ex.: um gerador que lê o ORM) como iterador
+    assíncrono, pedindo uma parte por vez em thread. Sob ASGI, uma
+    StreamingHttpResponse com iterador síncrono é consumida inteira antes de
+    começar o envio.
+    """
+    iterador = iter(iteravel)
+    proximo = sync_to_async(next)
+    while (parte := await proximo(iterador, _FIM)) is not _FIM:
+        yield parte
+
+
+class ViewSetAssincronoMixin:
+    """
+    Permite ações `async def` em um ViewSet do DRF (que só despacha views síncronas).
+
+    Sob ASGI, as ações assíncronas rodam direto no event loop, com o ORM assíncrono,
+    e um worker atende várias leituras ao mesmo tempo enquanto esperam o banco.
+    A parte síncrona do DRF (autenticação, permissões, GET condicional) roda em
+    thread via sync_to_async; as demais ações do ViewSet continuam síncronas.
+    Sob WSGI o Django executa a view com async_to_sync, então nada muda para o cliente.
+    """
+
+    @classmethod
+    def as_view(cls, actions=None, **initkwargs):
+        view = super().as_view(actions, **initkwargs)
+        assincronas = {
+            metodo for metodo, acao in (actions or {}).items()
+            if iscoroutinefunction(getattr(cls, acao, None))
+        }
+        if 'get' in assincronas and 'head' not in (actions or {}):
+            # O ViewSet responde HEAD com a ação do GET
+            assincronas.add('head')
+        if not assincronas:
+            return view
+
+        sincrona = sync_to_async(view)
+
+        async def view_assincrona(request, *args, **kwargs):
+            if request.method.lower() in assincronas:
+                # dispatch devolve a corrotina de _dispatch_assincrono
+                return await view(request, *args, **kwargs)
+            return await sincrona(request, *args, **kwargs)
+
+        functools.update_wrapper(view_assincrona, view)
+        return view_assincrona
+
+    def dispatch(self, request, *args, **kwargs):
+        handler = getattr(self, request.method.lower(), None)
+        if iscoroutinefunction(handler):
+            return self._dispatch_assincrono(request, *args, **kwargs)
+        return super().dispatch(request, *args, **kwargs)
+
+    async def _dispatch_assincrono(self, request, *args, **kwargs):
+        # Mesmo fluxo de APIView.dispatch, aguardando o handler
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            handler = getattr(self, request.method.lower())
+            response = await handler(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
@@ -0,0 +1,97 @@
+import hashlib
+import time
+import uuid
+
+from django.core.cache import caches
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+# Alias em settings.CACHES: token já verificado -> usuário, com TTL curto.
+# Com vários workers precisa ser compartilhado (CACHE_REDIS_URL), senão a
+# invalidação só vale no processo que a fez.
+CACHE_ALIAS = 'autenticacao'
+
+# Atributo do HttpRequest onde o middleware deixa o resultado para o DRF
+ATRIBUTO_REQUEST = '_autenticacao_jwt'
+
+
+def _cache():
+    return caches[CACHE_ALIAS]
+
+
+def _chave_token(token_bruto):
+    # Guarda só o hash: o token em si é uma credencial
+    return "token:" + hashlib.sha256(token_bruto).hexdigest()
+
+
+def _chave_geracao(user_id):
+    return f"usuario:{user_id}:geracao"
+
+
+def invalidar_usuario(user_id):
+    """
+    Invalida todos os tokens em cache do usuário (troca de senha, exclusão).
+    Cada entrada guarda a geração do usuário de quando foi criada; trocar a
+    geração é uma única escrita, sem ler nem travar uma lista de tokens.
+    """
+    _cache().set(_chave_geracao(user_id), uuid.uuid4().hex, None)
+
+
+class JWTAutenticacaoUnica(JWTAuthentication):
+    """
+    JWTAuthentication que roda uma vez por request: o CurrentUserMiddleware
+    autentica (o roteador de banco precisa do usuário antes da view) e o DRF
+    reaproveita o resultado guardado no HttpRequest, inclusive a falha.
+
+    Tokens já verificados ficam em cache até o menor entre o TTL configurado
+    e a expiração do próprio token, evitando decodificar e buscar o auth_user
+    de novo a cada chamada.
+    """
+
+    def authenticate(self, request):
+        http_request = getattr(request, '_request', request)
+        if hasattr(http_request, ATRIBUTO_REQUEST):
+            resultado = getattr(http_request, ATRIBUTO_REQUEST)
+        else:
+            resultado = self.autenticar_request(http_request)
+        if isinstance(resultado, Exception):
+            raise resultado
+        return resultado
+
+    def autenticar_request(self, http_request):
+        """Autentica e guarda o resultado (ou a exceção) no HttpRequest."""
+        try:
+            resultado = self._autenticar(http_request)
+        except Exception as erro:
+            resultado = erro
+        setattr(http_request, ATRIBUTO_REQUEST, resultado)
+        return resultado
+
+    def _autenticar(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        token_bruto = self.get_raw_token(header)
+        if token_bruto is None:
+            return None
+
+        cache = _cache()
+        chave = _chave_token(token_bruto)
+        em_cache = cache.get(chave)
+        if em_cache is not None:
+            user, token, geracao = em_cache
+            # Geração trocada (ou descartada do cache): autentica de novo
+            if cache.get(_chave_geracao(user.pk)) == geracao:
+                return user, token
+
+        token = self.get_validated_token(token_bruto)
+        user = self.get_user(token)
+
+        restante = int(token.get('exp', 0) - time.time())
+        ttl = min(cache.default_timeout, restante)
+        if ttl > 0:
+            chave_geracao = _chave_geracao(user.pk)
+            cache.add(chave_geracao, uuid.uuid4().hex, None)
+            geracao = cache.get(chave_geracao)
+            if geracao is not None:
+                cache.set(chave, (user, token, geracao), ttl)
+        return user, token
@@ -0,0 +1,101 @@
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from django.db import connections
+from django.db.models import Case, F, FloatField, Func, Q, Value, When
+
+from .models import Empresa
+
+CONFIG = 'portuguese'
+# Termos além disso são ignorados (cada um vira um prefixo na consulta)
+MAX_TERMOS = 8
+# Empresas encontradas por nome/CNPJ cujas notas entram no resultado
+LIMITE_EMPRESAS = 20
+# Peso, no ranking, de uma nota cuja empresa casou com a busca
+PESO_EMPRESA = 0.5
+
+_trigrama = {}
+
+
+def termos(texto):
+    return re.findall(r'\w+', (texto or '').lower())[:MAX_TERMOS]
+
+
+def trigrama_disponivel(alias):
+    """A extensão pg_trgm é opcional (ver migração 0008); sem ela não há busca por trecho."""
+    if alias not in _trigrama:
+        with connections[alias].cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            _trigrama[alias] = cursor.fetchone() is not None
+    return _trigrama[alias]
+
+
+def consulta_textual(tokens):
+    # Cada termo casa como prefixo ("seri" encontra "seringas"). Os tokens só têm
+    # caracteres de palavra, então não carregam operadores do tsquery.
+    return SearchQuery(' & '.join(f"{t}:*" for t in tokens), search_type='raw', config=CONFIG)
+
+
+def buscar_empresas(queryset, texto):
+    """
+    Empresas por nome (similaridade de trigrama, ou trecho sem pg_trgm) ou por CNPJ,
+    com ou sem pontuação. Ordenadas por relevância (anotada em 'relevancia').
+    """
+    texto = texto.strip()
+    digitos = re.sub(r'\D', '', texto)
+    queryset = queryset.annotate(
+        cnpj_digitos=Func(F('cnpj'), Value(r'\D'), Value(''), Value('g'), function='regexp_replace'),
+    )
+
+    por_cnpj = Q(cnpj__icontains=texto)
+    if len(digitos) >= 3:
+        por_cnpj |= Q(cnpj_digitos__contains=digitos)
+    filtro = por_cnpj | Q(nome__icontains=texto)
+    if trigrama_disponivel(queryset.db):
+        filtro |= Q(nome__trigram_word_similar=texto)
+        por_nome = TrigramWordSimilarity(texto, 'nome')
+    else:
+        por_nome = Case(When(nome__istartswith=texto, then=Value(1.0)), default=Value(0.5))
+
+    return (
+        queryset.filter(filtro)
+        .annotate(relevancia=Case(When(por_cnpj, then=Value(1.0)), default=por_nome, output_field=FloatField()))
+        .order_by('-relevancia', 'nome')
+    )
+
+
+def buscar_transacoes(queryset, texto):
+    """
+    Notas cujo NF/descrição casam com o texto (vetor 'busca', índice GIN) ou cuja
+    empresa casa por nome/CNPJ. Retorna (queryset ordenado por relevância, empresas).
+    Com pg_trgm, NF também casa por trecho ("%123%", índice de trigrama).
+    """
+    texto = (texto or '').strip()
+    tokens = termos(texto)
+    if not tokens:
+        return queryset.none(), []
+
+    alias = queryset.db
+    empresas = list(buscar_empresas(Empresa.objects.using(alias), texto)[:LIMITE_EMPRESAS])
+    consulta = consulta_textual(tokens)
+
+    filtro = Q(busca=consulta)
+    if trigrama_disponivel(alias):
+        filtro |= Q(nf__icontains=texto)
+    bonus_empresa = Value(0.0)
+    if empresas:
+        ids = [empresa.pk for empresa in empresas]
+        filtro |= Q(empresa_id__in=ids)
+        bonus_empresa = Case(When(empresa_id__in=ids, then=Value(PESO_EMPRESA)), default=Value(0.0))
+
+    relevancia = (
+        SearchRank(F('busca'), consulta)
+        + Case(When(nf__iexact=texto, then=Value(1.0)), default=Value(0.0))
+        + bonus_empresa
+    )
+    queryset = (
+        queryset.filter(filtro)
+        .annotate(relevancia=relevancia)
+        .order_by('-relevancia', '-data_entrada', '-id')
+    )
+    return queryset, empresas
@@ -0,0 +1,81 @@
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from .db_router import banco_principal
+
+# Alias em settings.CACHES: Redis compartilhado (CACHE_REDIS_URL) ou, num único
+# processo, LocMemCache, que expira por TTL e descarta os itens menos usados
+# (LRU) ao passar de MAX_ENTRIES.
+CACHE_ALIAS = 'empresas'
+
+_AUSENTE = object()
+_lock = threading.Lock()
+_contadores = {'hits': 0, 'misses': 0, 'invalidacoes': 0}
+
+
+def _cache():
+    return caches[CACHE_ALIAS]
+
+
+def _chave(using, nome):
+    # O banco lido faz parte da chave: dados do sandbox ('tests', usuários .dev)
+    # nunca são servidos para produção, e o que veio de uma réplica atrasada
+    # não aparece para quem lê do principal (ex.: logo depois de escrever)
+    return f"empresas:{using}:{nome}"
+
+
+def _bancos(using):
+    # Uma escrita no principal invalida também as entradas das réplicas dele
+    principal = banco_principal(using)
+    if principal != 'default':
+        return [principal]
+    return [principal, *settings.REPLICAS_LEITURA]
+
+
+def _contar(contador, quantidade=1):
+    with _lock:
+        _contadores[contador] += quantidade
+
+
+def obter(using, nome, carregar):
+    """Lê do cache; se não houver, chama carregar() e guarda o resultado."""
+    chave = _chave(using, nome)
+    valor = _cache().get(chave, _AUSENTE)
+    if valor is not _AUSENTE:
+        _contar('hits')
+        return valor
+    _contar('misses')
+    valor = carregar()
+    _cache().set(chave, valor)
+    return valor
+
+
+def invalidar(using, empresa_ids=()):
+    """
+    Descarta a listagem, o mapa de CNPJs e o detalhe das empresas indicadas
+    depois do commit da transação em andamento (na hora, fora de uma): antes
+    disso, uma leitura concorrente ainda veria os dados antigos e os guardaria
+    de novo no cache.
+    """
+    nomes = ['lista', 'cnpjs'] + [f"detalhe:{pk}" for pk in empresa_ids if pk is not None]
+    chaves = [_chave(banco, nome) for banco in _bancos(using) for nome in nomes]
+
+    def descartar():
+        _cache().delete_many(chaves)
+        _contar('invalidacoes')
+
+    transaction.on_commit(descartar, using=banco_principal(using))
+
+
+def estatisticas():
+    with _lock:
+        dados = dict(_contadores)
+    consultas = dados['hits'] + dados['misses']
+    dados['taxa_acerto'] = round(dados['hits'] / consultas, 4) if consultas else None
+    config = _cache()
+    dados['ttl_segundos'] = config.default_timeout
+    dados['max_itens'] = getattr(config, '_max_entries', None)
+    return dados
@@ -0,0 +1,61 @@
+from django.db import router
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+
+from . import versoes
+
+
+class NaoModificado(APIException):
+    status_code = status.HTTP_304_NOT_MODIFIED
+    default_detail = ''
+
+
+class GetCondicionalMixin:
+    """
+    ETag / Last-Modified para as leituras de um ViewSet, calculados a partir dos
+    marcadores de alteração das tabelas (api.versoes) e não do corpo da resposta.
+    Se o cliente já tem a versão atual, a view responde 304 sem consultar nem
+    serializar os dados.
+
+    tabelas_condicionais: {acao: (tabelas das quais a resposta depende)}
+    """
+
+    tabelas_condicionais = {}
+
+    def chave_condicional(self, request):
+        return request.get_full_path()
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.validadores = None
+        tabelas = self.tabelas_condicionais.get(self.action)
+        if request.method not in ('GET', 'HEAD') or not tabelas:
+            return
+
+        using = router.db_for_read(self.queryset.model)
+        self.validadores = versoes.validadores(using, tabelas, self.chave_condicional(request))
+        etag, alterado_em = self.validadores
+        ultima = int(alterado_em.timestamp()) if alterado_em else None
+        resposta = get_conditional_response(request, etag=etag, last_modified=ultima)
+        if resposta is not None and resposta.status_code == status.HTTP_304_NOT_MODIFIED:
+            raise NaoModificado()
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NaoModificado):
+            return Response(status=status.HTTP_304_NOT_MODIFIED)
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        validadores = getattr(self, 'validadores', None)
+        if validadores and response.status_code in (200, 304):
+            etag, alterado_em = validadores
+            response['ETag'] = etag
+            if alterado_em:
+                response['Last-Modified'] = http_date(alterado_em.timestamp())
+            # O navegador guarda a resposta, mas sempre revalida antes de usar
+            response['Cache-Control'] = 'private, no-cache'
+        return response
@@ -0,0 +1,21 @@
+from django.db import connections
+
+
+def estatisticas_conexoes():
+    """
+    Uso das conexões de cada banco do roteador. No modo pool, os contadores do
+    psycopg_pool (tamanho atual, livres, requisições esperando, tempo de espera...);
+    fora dele, a política de conexões persistentes em vigor.
+    """
+    dados = {}
+    for alias in connections:
+        conexao = connections[alias]
+        if conexao.settings_dict.get('OPTIONS', {}).get('pool'):
+            dados[alias] = {'modo': 'pool', **conexao.pool.get_stats()}
+        else:
+            dados[alias] = {
+                'modo': 'persistente',
+                'conn_max_age': conexao.settings_dict['CONN_MAX_AGE'],
+                'health_checks': conexao.settings_dict['CONN_HEALTH_CHECKS'],
+            }
+    return dados
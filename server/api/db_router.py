@@ -1,13 +1,26 @@
-from .middleware import get_current_user
+import random
+
+from django.conf import settings
+from django.core import signing
+
+from .middleware import estado_requisicao, get_current_user
 
 class UserBasedRouter:
     """
-    Roteador: 
+    Roteador:
     - Tabelas do sistema (auth, admin) -> Sempre 'default'
     - Usuário termina em .dev -> Banco 'tests'
-    - Outros -> Banco 'default'
+    - Outros -> Banco 'default' (escritas) e réplicas de leitura, se configuradas
+
+    Réplicas (settings.REPLICAS_LEITURA, {alias: peso}): cada request sorteia
+    uma réplica pelo peso e a usa em todas as leituras, para que ETag e dados
+    venham do mesmo banco. Quem acabou de escrever lê do 'default': a própria
+    request a partir da primeira escrita, e o usuário pelos próximos
+    REPLICA_JANELA_ESCRITA segundos, enquanto a réplica pode estar atrasada.
+    A janela viaja no cabeçalho X-Escrita-Recente (assinado, devolvido pelo
+    frontend), então vale em qualquer worker, não só no que recebeu a escrita.
     """
-    
+
     system_apps = {'auth', 'admin', 'contenttypes', 'sessions', 'messages', 'staticfiles', 'token_blacklist'}
 
     def db_for_read(self, model, **hints):
@@ -20,8 +33,8 @@ class UserBasedRouter:
                 return 'tests'
         except:
             return 'default'
-            
-        return 'default'
+
+        return self.banco_de_leitura(user)
 
     def db_for_write(self, model, **hints):
         if model._meta.app_label in self.system_apps:
@@ -33,11 +46,69 @@ class UserBasedRouter:
                 return 'tests'
         except:
             return 'default'
-            
+
+        self.registrar_escrita(user)
         return 'default'
 
     def allow_relation(self, obj1, obj2, **hints):
         return True
 
     def allow_migrate(self, db, app_label, model_name=None, **hints):
-        return True
\ No newline at end of file
+        # Réplicas recebem o schema pela replicação do próprio Postgres
+        return db not in settings.REPLICAS_LEITURA
+
+    def banco_de_leitura(self, user):
+        replicas = settings.REPLICAS_LEITURA
+        if not replicas:
+            return 'default'
+
+        estado = estado_requisicao.get()
+        if estado is not None and 'leitura' in estado:
+            return estado['leitura']
+
+        if estado is not None and estado.get('escrita_recente'):
+            banco = 'default'
+        else:
+            banco = random.choices(list(replicas), weights=list(replicas.values()))[0]
+        if estado is not None:
+            estado['leitura'] = banco
+        return banco
+
+    def registrar_escrita(self, user):
+        if not settings.REPLICAS_LEITURA:
+            return
+        estado = estado_requisicao.get()
+        if estado is not None and not estado.get('escreveu'):
+            # O middleware devolve a marca da escrita no cabeçalho da resposta
+            estado['escreveu'] = True
+            estado['leitura'] = 'default'
+
+
+CABECALHO_ESCRITA = 'X-Escrita-Recente'
+_SALT_ESCRITA = 'api.db_router.escrita_recente'
+
+
+def marcar_escrita(user):
+    """Valor do cabeçalho X-Escrita-Recente: id do usuário assinado, com o horário."""
+    return signing.TimestampSigner(salt=_SALT_ESCRITA).sign(str(user.pk))
+
+
+def escrita_recente(valor, user):
+    """Se o cabeçalho é do próprio usuário e ainda está dentro de REPLICA_JANELA_ESCRITA."""
+    if not valor or user is None or not user.is_authenticated:
+        return False
+    try:
+        assinado = signing.TimestampSigner(salt=_SALT_ESCRITA).unsign(valor, max_age=settings.REPLICA_JANELA_ESCRITA)
+    except signing.BadSignature:
+        return False
+    return assinado == str(user.pk)
+
+
+def banco_principal(alias):
+    """O banco de escrita correspondente: réplicas respondem pelo 'default'."""
+    return 'default' if alias in settings.REPLICAS_LEITURA else alias
+
+
+def bancos_de_escrita():
+    """Aliases que recebem escrita: todos os bancos, exceto as réplicas de leitura."""
+    return [alias for alias in settings.DATABASES if alias not in settings.REPLICAS_LEITURA]
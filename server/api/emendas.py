@@ -0,0 +1,60 @@
+from decimal import Decimal
+
+from django.db.models import Count, Max, Sum
+
+from .models import Emenda, Transacao
+
+RECURSO_PROPRIO = "Recurso Próprio"
+
+
+def normalizar_nome(nome):
+    return ' '.join(nome.split()) if isinstance(nome, str) else ''
+
+
+def obter_ou_criar(nomes, using):
+    """
+    {nome: Emenda} para os nomes informados, criando as que ainda não existem.
+    Poucas consultas para qualquer quantidade de nomes; seguro com criação
+    simultânea do mesmo nome (o nome é único).
+    """
+    nomes = {normalizar_nome(n) for n in nomes} - {''}
+    if not nomes:
+        return {}
+    emendas = {e.nome: e for e in Emenda.objects.using(using).filter(nome__in=nomes)}
+    faltantes = nomes - set(emendas)
+    if faltantes:
+        Emenda.objects.using(using).bulk_create([Emenda(nome=n) for n in faltantes], ignore_conflicts=True)
+        emendas.update({e.nome: e for e in Emenda.objects.using(using).filter(nome__in=faltantes)})
+    return emendas
+
+
+def execucao(emendas, saidas):
+    """
+    Alocado x gasto por emenda. `saidas` é a consulta de notas já filtrada
+    (período, empresa...); o gasto é somado no banco em uma única consulta
+    agrupada, coberta pelo índice transacao_emenda_gastos_idx.
+    """
+    por_emenda = {
+        linha['emenda']: linha
+        for linha in saidas.filter(tipo='saida', emenda__isnull=False).order_by().values('emenda').annotate(
+            valor_gasto=Sum('valor'), qtd_pagamentos=Count('*'), ultimo_pagamento=Max('data_saida'),
+        )
+    }
+
+    resultado = []
+    for emenda in emendas.order_by('nome'):
+        linha = por_emenda.get(emenda.pk, {})
+        gasto = linha.get('valor_gasto') or Decimal('0.00')
+        resultado.append({
+            'id': emenda.pk,
+            'nome': emenda.nome,
+            'valor_alocado': emenda.valor_alocado,
+            'valor_gasto': gasto,
+            'saldo': emenda.valor_alocado - gasto,
+            'percentual_executado': (
+                round(gasto * 100 / emenda.valor_alocado, 2) if emenda.valor_alocado else None
+            ),
+            'qtd_pagamentos': linha.get('qtd_pagamentos', 0),
+            'ultimo_pagamento': linha.get('ultimo_pagamento'),
+        })
+    return resultado
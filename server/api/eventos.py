@@ -0,0 +1,231 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from functools import partial
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, transaction
+from rest_framework.renderers import BaseRenderer
+
+from .db_router import banco_principal
+
+logger = logging.getLogger(__name__)
+
+# Campos enviados em cada evento (só os alterados, em 'alterado')
+CAMPOS_EVENTO = {
+    'transacao': (
+        'empresa_id', 'tipo', 'status', 'nf', 'descricao', 'valor', 'data_entrada', 'data_saida',
+        'tipo_material', 'destino_entrada', 'emenda_id',
+    ),
+    'empresa': ('nome', 'cnpj', 'tipo', 'licitacao'),
+    'notificacao': ('titulo', 'mensagem', 'tipo', 'alvo', 'ativo'),
+}
+# Canal do LISTEN/NOTIFY (EVENTOS_BACKEND='postgres')
+CANAL = 'sigh_eventos'
+# Limite do payload do NOTIFY no Postgres é 8000 bytes
+TAMANHO_MAXIMO_NOTIFY = 7900
+
+
+def _json(dados):
+    return json.dumps(dados, cls=DjangoJSONEncoder, separators=(',', ':'), ensure_ascii=False)
+
+
+# --- Distribuição dentro do processo -------------------------------------------
+
+class Inscricao:
+    """Uma conexão SSE aberta: fila própria, lida no event loop que a criou."""
+
+    def __init__(self, banco, papel, tamanho_fila):
+        self.banco = banco
+        self.papel = papel
+        self.loop = asyncio.get_running_loop()
+        self.fila = asyncio.Queue(maxsize=tamanho_fila)
+
+    def aceita(self, evento):
+        if evento['banco'] != self.banco:
+            return False
+        if evento['tabela'] == 'notificacao':
+            return evento.get('alvo') in ('todos', self.papel)
+        return True
+
+    def entregar(self, evento):
+        # Roda no event loop da conexão
+        try:
+            self.fila.put_nowait(evento)
+        except asyncio.QueueFull:
+            # Cliente lento: descarta o acumulado e pede para recarregar tudo
+            while not self.fila.empty():
+                self.fila.get_nowait()
+            self.fila.put_nowait({'tabela': 'conexao', 'acao': 'recarregar', 'banco': self.banco})
+
+
+class Transmissor:
+    """
+    Distribui os eventos às conexões SSE abertas neste processo. publicar()
+    pode ser chamado de qualquer thread (signals rodam na thread da request
+    ou do pool de tarefas); a entrega acontece no event loop de cada conexão.
+    """
+
+    def __init__(self):
+        self._inscricoes = set()
+        self._lock = threading.Lock()
+
+    def inscrever(self, banco, papel):
+        inscricao = Inscricao(banco, papel, settings.EVENTOS_TAMANHO_FILA)
+        with self._lock:
+            self._inscricoes.add(inscricao)
+        return inscricao
+
+    def cancelar(self, inscricao):
+        with self._lock:
+            self._inscricoes.discard(inscricao)
+
+    def publicar(self, evento):
+        with self._lock:
+            inscricoes = [i for i in self._inscricoes if i.aceita(evento)]
+        for inscricao in inscricoes:
+            try:
+                inscricao.loop.call_soon_threadsafe(inscricao.entregar, evento)
+            except RuntimeError:
+                # Event loop já encerrado: a conexão caiu sem passar pelo cancelar
+                self.cancelar(inscricao)
+
+    def quantidade(self):
+        with self._lock:
+            return len(self._inscricoes)
+
+
+transmissor = Transmissor()
+
+
+# --- Publicação (chamada pelos signals) ----------------------------------------
+
+def registrar(using, tabela, acao, pk, campos=None, alvo=None):
+    """
+    Publica a alteração de uma linha quando a transação da escrita fizer commit.
+    acao: 'criado', 'alterado' ou 'excluido'; campos: {campo: valor novo}.
+    alvo: papel da notificação, usado no filtro por papel mesmo quando não mudou.
+    """
+    evento = {'tabela': tabela, 'acao': acao, 'id': pk, 'banco': banco_principal(using)}
+    if campos is not None:
+        evento['campos'] = campos
+    if alvo is not None:
+        evento['alvo'] = alvo
+    _enviar(using, evento)
+
+
+def registrar_lote(using, tabela, acao, ids):
+    """Um único evento para linhas gravadas em lote (bulk_create, sem signals)."""
+    if ids:
+        _enviar(using, {'tabela': tabela, 'acao': acao, 'ids': list(ids), 'banco': banco_principal(using)})
+
+
+def _enviar(using, evento):
+    if settings.EVENTOS_BACKEND == 'postgres':
+        # NOTIFY é transacional: só é entregue (a todos os processos) no commit
+        payload = _json(evento)
+        if len(payload.encode('utf-8')) > TAMANHO_MAXIMO_NOTIFY:
+            evento = {c: v for c, v in evento.items() if c not in ('campos', 'ids')}
+            payload = _json(evento)
+        with connections[using].cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [CANAL, payload])
+    else:
+        transaction.on_commit(partial(transmissor.publicar, evento), using=using)
+
+
+def campos_alterados(tabela, anterior, instance):
+    """Campos do evento com o valor atual; só os que mudaram, se há o estado anterior."""
+    atuais = {campo: getattr(instance, campo) for campo in CAMPOS_EVENTO[tabela]}
+    if anterior is None:
+        return atuais
+    return {campo: valor for campo, valor in atuais.items() if anterior.get(campo) != valor}
+
+
+# --- LISTEN/NOTIFY -------------------------------------------------------------
+
+_ouvintes = {}
+_lock_ouvintes = threading.Lock()
+
+
+def iniciar():
+    """
+    Com EVENTOS_BACKEND='postgres', abre (uma vez por processo) uma conexão
+    LISTEN para cada banco principal distinto; o que chega é repassado ao
+    transmissor local. Réplicas ficam de fora: o NOTIFY não é replicado.
+    """
+    if settings.EVENTOS_BACKEND != 'postgres':
+        return
+    with _lock_ouvintes:
+        for alias in connections:
+            if banco_principal(alias) != alias:
+                continue
+            dados = connections[alias].settings_dict
+            # 'default' e 'tests' podem apontar para o mesmo banco: um LISTEN só
+            destino = (dados['HOST'], dados['PORT'], dados['NAME'])
+            if destino in _ouvintes:
+                continue
+            thread = threading.Thread(target=_ouvir, args=(alias,), name=f'eventos-{alias}', daemon=True)
+            _ouvintes[destino] = thread
+            thread.start()
+
+
+def _ouvir(alias):
+    import psycopg
+
+    parametros = connections[alias].get_connection_params()
+    for opcao in ('cursor_factory', 'context'):
+        parametros.pop(opcao, None)
+    while True:
+        try:
+            with psycopg.connect(**parametros, autocommit=True) as conexao:
+                conexao.execute(f"LISTEN {CANAL}")
+                for notificacao in conexao.notifies():
+                    transmissor.publicar(json.loads(notificacao.payload))
+        except Exception:
+            logger.exception("Conexão LISTEN do banco '%s' caiu; reconectando", alias)
+            time.sleep(5)
+
+
+# --- Fluxo SSE -----------------------------------------------------------------
+
+def formatar(evento):
+    """Um evento no formato text/event-stream (nome = tabela)."""
+    dados = {c: v for c, v in evento.items() if c != 'banco'}
+    return f"event: {evento['tabela']}\ndata: {_json(dados)}\n\n".encode('utf-8')
+
+
+class EventStreamRenderer(BaseRenderer):
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Respostas de erro (401, 503) viram um evento 'erro'
+        return formatar({'tabela': 'erro', **(data if isinstance(data, dict) else {'detail': data})})
+
+
+async def fluxo(inscricao):
+    """
+    Gerador da resposta SSE. Envia um comentário a cada EVENTOS_INTERVALO_PING
+    segundos (mantém proxies com a conexão aberta) e encerra depois de
+    EVENTOS_DURACAO segundos: o navegador reconecta e a carga se redistribui
+    entre os workers.
+    """
+    loop = asyncio.get_running_loop()
+    fim = loop.time() + settings.EVENTOS_DURACAO
+    try:
+        yield b"retry: 3000\n\n" + formatar({'tabela': 'conexao', 'acao': 'pronto'})
+        while (restante := fim - loop.time()) > 0:
+            try:
+                evento = await asyncio.wait_for(
+                    inscricao.fila.get(), timeout=min(settings.EVENTOS_INTERVALO_PING, restante),
+                )
+            except asyncio.TimeoutError:
+                yield b": ping\n\n"
+                continue
+            yield formatar(evento)
+    finally:
+        transmissor.cancelar(inscricao)
@@ -0,0 +1,8 @@
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class Conflito(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "O registro foi alterado por outra operação. Atualize a página e tente novamente."
+    default_code = 'conflict'
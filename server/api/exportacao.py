@@ -0,0 +1,155 @@
+import csv
+import zipfile
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+COLUNAS = [
+    ('id', 'ID'),
+    ('empresa__nome', 'Empresa'),
+    ('empresa__cnpj', 'CNPJ'),
+    ('tipo', 'Tipo'),
+    ('status', 'Status'),
+    ('nf', 'NF'),
+    ('descricao', 'Descrição'),
+    ('valor', 'Valor (R$)'),
+    ('data_entrada', 'Data de Entrada'),
+    ('data_saida', 'Data de Baixa'),
+    ('tipo_material', 'Material'),
+    ('destino_entrada', 'Destino'),
+    ('emenda__nome', 'Emenda / Origem'),
+]
+
+# Linhas acumuladas antes de cada envio ao cliente
+LINHAS_POR_ENVIO = 500
+
+
+def linhas(queryset, chunk_size=2000):
+    """Percorre a consulta com cursor no servidor, sem materializar o resultado."""
+    campos = [campo for campo, _ in COLUNAS]
+    return queryset.order_by('data_entrada', 'id').values_list(*campos).iterator(chunk_size=chunk_size)
+
+
+class _Buffer:
+    """Destino de escrita que só guarda o que foi escrito até o próximo envio."""
+
+    def __init__(self):
+        self.partes = []
+
+    def write(self, dados):
+        self.partes.append(dados)
+        return len(dados)
+
+    def flush(self):
+        pass
+
+    def esvaziar(self):
+        dados = b''.join(p if isinstance(p, bytes) else p.encode('utf-8') for p in self.partes)
+        self.partes = []
+        return dados
+
+
+def gerar_csv(registros):
+    buffer = _Buffer()
+    writer = csv.writer(buffer, delimiter=';')
+    # BOM para o Excel reconhecer UTF-8 (acentos)
+    buffer.write('\ufeff')
+    writer.writerow([titulo for _, titulo in COLUNAS])
+    yield buffer.esvaziar()
+
+    for i, registro in enumerate(registros, start=1):
+        writer.writerow([_valor_csv(v) for v in registro])
+        if i % LINHAS_POR_ENVIO == 0:
+            yield buffer.esvaziar()
+    yield buffer.esvaziar()
+
+
+def _valor_csv(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, Decimal):
+        return f"{valor:.2f}".replace('.', ',')
+    return valor
+
+
+# --- XLSX -----------------------------------------------------------------
+# Planilha mínima (SpreadsheetML) escrita direto no zip, linha a linha.
+# O zipfile aceita destino sem seek, então cada pedaço comprimido já pode ser
+# enviado ao cliente enquanto o resto da consulta ainda está sendo lido.
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="Transacoes" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+
+
+def _celula_xlsx(valor):
+    if valor is None:
+        return '<c/>'
+    if isinstance(valor, (int, Decimal)) and not isinstance(valor, bool):
+        return f'<c><v>{valor}</v></c>'
+    texto = valor.isoformat() if hasattr(valor, 'isoformat') else str(valor)
+    return f'<c t="inlineStr"><is><t>{escape(texto)}</t></is></c>'
+
+
+def _linha_xlsx(valores):
+    return ('<row>' + ''.join(_celula_xlsx(v) for v in valores) + '</row>').encode('utf-8')
+
+
+def gerar_xlsx(registros):
+    buffer = _Buffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as pacote:
+        pacote.writestr('[Content_Types].xml', _CONTENT_TYPES)
+        pacote.writestr('_rels/.rels', _RELS)
+        pacote.writestr('xl/workbook.xml', _WORKBOOK)
+        pacote.writestr('xl/_rels/workbook.xml.rels', _WORKBOOK_RELS)
+
+        with pacote.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as planilha:
+            planilha.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            planilha.write(_linha_xlsx([titulo for _, titulo in COLUNAS]))
+            yield buffer.esvaziar()
+
+            for i, registro in enumerate(registros, start=1):
+                planilha.write(_linha_xlsx(registro))
+                if i % LINHAS_POR_ENVIO == 0:
+                    yield buffer.esvaziar()
+            planilha.write(b'</sheetData></worksheet>')
+    yield buffer.esvaziar()
+
+
+FORMATOS = {
+    'csv': (gerar_csv, 'text/csv; charset=utf-8'),
+    'xlsx': (gerar_xlsx, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
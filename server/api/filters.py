@@ -0,0 +1,104 @@
+from datetime import date
+
+from rest_framework import serializers
+
+from .models import Transacao
+
+
+def ler_data(valor, campo):
+    try:
+        return date.fromisoformat(valor)
+    except ValueError:
+        raise serializers.ValidationError({campo: f"Data inválida: '{valor}'. Use o formato AAAA-MM-DD."})
+
+
+def _parse_escolha(valor, campo, choices):
+    validos = {chave for chave, _ in choices}
+    if valor not in validos:
+        raise serializers.ValidationError({campo: f"Valor inválido: '{valor}'. Opções: {', '.join(sorted(validos))}."})
+    return valor
+
+
+def _parse_ids(valor, campo, mensagem):
+    try:
+        return [int(i) for i in valor.split(',') if i.strip()]
+    except ValueError:
+        raise serializers.ValidationError({campo: mensagem})
+
+
+# Parâmetros aceitos por filtrar_transacoes
+FILTROS_TRANSACAO = (
+    'tipo', 'status', 'tipo_material', 'destino_entrada', 'empresa', 'emenda', 'nf',
+    'data_inicio', 'data_fim', 'saida_inicio', 'saida_fim',
+)
+
+
+def filtrar_transacoes(queryset, params):
+    """
+    Aplica na query (SQL) os filtros recebidos via query string:
+    - tipo, status, tipo_material, destino_entrada: valores das choices do modelo
+    - empresa: id (ou lista separada por vírgula)
+    - emenda: id da emenda (origem do recurso)
+    - nf: número exato da nota
+    - data_inicio / data_fim: intervalo (inclusivo) em data_entrada
+    - saida_inicio / saida_fim: intervalo (inclusivo) em data_saida
+    """
+    escolhas = {
+        'tipo': Transacao.TIPO_CHOICES,
+        'status': Transacao.STATUS_CHOICES,
+        'tipo_material': Transacao.MATERIAL_CHOICES,
+        'destino_entrada': Transacao.DESTINO_CHOICES,
+    }
+    for campo, choices in escolhas.items():
+        valor = params.get(campo)
+        if valor:
+            queryset = queryset.filter(**{campo: _parse_escolha(valor, campo, choices)})
+
+    empresa = params.get('empresa')
+    if empresa:
+        queryset = queryset.filter(empresa_id__in=_parse_ids(empresa, 'empresa', "Informe o id numérico da empresa."))
+
+    emenda = params.get('emenda')
+    if emenda:
+        queryset = queryset.filter(emenda_id__in=_parse_ids(emenda, 'emenda', "Informe o id numérico da emenda."))
+
+    nf = params.get('nf')
+    if nf:
+        queryset = queryset.filter(nf=nf)
+
+    intervalos = {
+        'data_inicio': 'data_entrada__gte',
+        'data_fim': 'data_entrada__lte',
+        'saida_inicio': 'data_saida__gte',
+        'saida_fim': 'data_saida__lte',
+    }
+    for campo, lookup in intervalos.items():
+        valor = params.get(campo)
+        if valor:
+            queryset = queryset.filter(**{lookup: ler_data(valor, campo)})
+
+    return queryset
+
+
+def filtrar_empresas(queryset, params):
+    """
+    - ramo: ramo de atividade (lista separada por vírgula: a empresa precisa ter
+      todos). Contenção JSON (tipo @> '[...]'), atendida pelo índice GIN empresa_ramos_idx
+    - emenda: id da emenda vinculada
+    - licitacao: true/false
+    """
+    ramos = [r.strip() for r in params.get('ramo', '').split(',') if r.strip()]
+    if ramos:
+        queryset = queryset.filter(tipo__contains=ramos)
+
+    emenda = params.get('emenda')
+    if emenda:
+        queryset = queryset.filter(emendas__in=_parse_ids(emenda, 'emenda', "Informe o id numérico da emenda.")).distinct()
+
+    licitacao = params.get('licitacao')
+    if licitacao:
+        if licitacao not in ('true', 'false'):
+            raise serializers.ValidationError({'licitacao': "Use true ou false."})
+        queryset = queryset.filter(licitacao=licitacao == 'true')
+
+    return queryset
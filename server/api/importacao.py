@@ -0,0 +1,135 @@
+import codecs
+import csv
+import re
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+
+from . import cache_empresas, emendas, eventos, resumo_mensal, saldos, versoes
+from .models import Empresa, Transacao
+from .serializers import ImportacaoTransacaoSerializer
+
+MAX_ERROS_REPORTADOS = 1000
+SEM_EMPRESA = "Nenhuma empresa cadastrada com este CNPJ."
+
+
+def normalizar_cnpj(cnpj):
+    return re.sub(r'\D', '', cnpj or '')
+
+
+def normalizar_valor(valor):
+    """Aceita valores no formato brasileiro (1.234,56) além do formato com ponto."""
+    if isinstance(valor, str) and ',' in valor:
+        return valor.replace('R$', '').replace('.', '').replace(',', '.').strip()
+    return valor
+
+
+def ler_csv(arquivo):
+    """
+    Lê o CSV enviado linha a linha, sem carregar o arquivo inteiro na memória.
+    Aceita ';' ou ',' como separador (o Excel em pt-BR exporta com ';').
+    """
+    linhas = codecs.iterdecode(arquivo, 'utf-8-sig')
+    cabecalho = next(linhas, '')
+    separador = ';' if cabecalho.count(';') > cabecalho.count(',') else ','
+    campos = [c.strip().lower() for c in next(csv.reader([cabecalho], delimiter=separador), [])]
+    for linha in csv.DictReader(linhas, fieldnames=campos, delimiter=separador):
+        yield {chave: (valor.strip() if isinstance(valor, str) else valor) for chave, valor in linha.items() if chave}
+
+
+def importar_transacoes(linhas, using, tamanho_lote=None):
+    """
+    Valida cada linha com as mesmas regras de data do TransacaoSerializer e grava
+    em lotes com bulk_create. Linhas inválidas são ignoradas e reportadas;
+    um lote que falha no banco é desfeito e reportado pelo intervalo de linhas
+    ('linhas': [primeira, última]), sem perder os já gravados. A memória usada
+    depende do tamanho do lote, não do arquivo.
+    """
+    tamanho_lote = tamanho_lote or settings.IMPORTACAO_TAMANHO_LOTE
+    empresas = cache_empresas.obter(using, 'cnpjs', lambda: {
+        normalizar_cnpj(cnpj): pk
+        for cnpj, pk in Empresa.objects.using(using).values_list('cnpj', 'pk')
+    })
+    relatorio = {'total': 0, 'importadas': 0, 'com_erro': 0, 'erros': []}
+    # (número da linha, nome da emenda, nota) de cada nota do lote; as emendas
+    # são resolvidas em conjunto na gravação
+    lote = []
+
+    def descartar_removidas():
+        # O mapa de CNPJs vem do cache e pode citar uma empresa já excluída: sem
+        # esta checagem o INSERT falharia pela FK no meio da importação
+        ids = {nota.empresa_id for _, _, nota in lote}
+        removidas = ids - set(Empresa.objects.using(using).filter(pk__in=ids).values_list('pk', flat=True))
+        if not removidas:
+            return
+        for cnpj in [cnpj for cnpj, pk in empresas.items() if pk in removidas]:
+            del empresas[cnpj]
+        cache_empresas.invalidar(using)
+        for numero, _, nota in lote:
+            if nota.empresa_id in removidas:
+                erro(numero, {'cnpj': [SEM_EMPRESA]})
+        lote[:] = [item for item in lote if item[2].empresa_id not in removidas]
+
+    def gravar():
+        descartar_removidas()
+        if not lote:
+            return
+        notas = [nota for _, _, nota in lote]
+        try:
+            with transaction.atomic(using=using):
+                por_nome = emendas.obter_ou_criar([nome for _, nome, _ in lote], using)
+                for _, nome, nota in lote:
+                    nota.emenda = por_nome.get(emendas.normalizar_nome(nome))
+                criadas = Transacao.objects.using(using).bulk_create(notas)
+                saldos.aplicar_lote(criadas, using)
+                resumo_mensal.aplicar_lote(criadas, using)
+                eventos.registrar_lote(using, 'transacao', 'criado', [t.pk for t in criadas])
+                versoes.marcar_alteracao(using, 'transacao')
+                cache_empresas.invalidar(using, {t.empresa_id for t in criadas})
+        except DatabaseError as exc:
+            # Só este lote volta (os anteriores já estão gravados): reporta o
+            # intervalo de linhas para o usuário reenviar apenas essa parte
+            relatorio['com_erro'] += len(lote)
+            if len(relatorio['erros']) < MAX_ERROS_REPORTADOS:
+                relatorio['erros'].append({
+                    'linhas': [lote[0][0], lote[-1][0]],
+                    'erros': {'non_field_errors': [f"Lote não gravado: {exc}"]},
+                })
+        else:
+            relatorio['importadas'] += len(lote)
+        lote.clear()
+
+    def erro(numero, detalhe):
+        relatorio['com_erro'] += 1
+        if len(relatorio['erros']) < MAX_ERROS_REPORTADOS:
+            relatorio['erros'].append({'linha': numero, 'erros': detalhe})
+
+    # A linha 1 do CSV é o cabeçalho; os dados começam na 2
+    for numero, linha in enumerate(linhas, start=2):
+        relatorio['total'] += 1
+        if not isinstance(linha, dict):
+            erro(numero, {'non_field_errors': ["Cada item deve ser um objeto."]})
+            continue
+        dados = {k: v for k, v in linha.items() if v not in ('', None)}
+        if 'valor' in dados:
+            dados['valor'] = normalizar_valor(dados['valor'])
+
+        serializer = ImportacaoTransacaoSerializer(data=dados)
+        if not serializer.is_valid():
+            erro(numero, serializer.errors)
+            continue
+
+        dados = serializer.validated_data
+        empresa_id = empresas.get(normalizar_cnpj(dados.pop('cnpj')))
+        if empresa_id is None:
+            erro(numero, {'cnpj': [SEM_EMPRESA]})
+            continue
+
+        nome_emenda = dados.pop('emenda_origem', '')
+        lote.append((numero, nome_emenda, Transacao(empresa_id=empresa_id, **dados)))
+        if len(lote) >= tamanho_lote:
+            gravar()
+
+    if lote:
+        gravar()
+    return relatorio
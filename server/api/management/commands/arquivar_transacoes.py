@@ -0,0 +1,57 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.arquivo import arquivar, corte, restaurar
+from api.db_router import bancos_de_escrita
+
+
+def _data(texto):
+    try:
+        return date.fromisoformat(texto)
+    except ValueError:
+        raise CommandError(f"Data inválida: '{texto}'. Use o formato AAAA-MM-DD.")
+
+
+class Command(BaseCommand):
+    help = (
+        "Move as notas pagas de exercícios anteriores para o arquivo (api_transacaoarquivo), "
+        "em lotes curtos, sem travar a tabela. Saldos e relatórios não mudam; a listagem "
+        "continua alcançando as notas arquivadas quando o período pedido inclui o arquivo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--antes', type=_data,
+            help="Arquiva as notas com data_entrada anterior a esta data (AAAA-MM-DD). "
+                 "Padrão e limite: 1º de janeiro do exercício mais antigo mantido (ARQUIVO_ANOS_ATIVOS).",
+        )
+        parser.add_argument('--lote', type=int, help="Notas por lote. Padrão: ARQUIVO_TAMANHO_LOTE.")
+        parser.add_argument('--pausa', type=float, default=0.1, help="Segundos de espera entre os lotes.")
+        parser.add_argument(
+            '--restaurar', action='store_true',
+            help="Devolve à tabela ativa as notas arquivadas que hoje deveriam estar nela.",
+        )
+        parser.add_argument(
+            '--database', action='append', dest='databases',
+            help="Banco a processar (pode repetir). Padrão: todos os bancos, exceto réplicas.",
+        )
+
+    def handle(self, *args, **options):
+        if options['lote'] is not None and options['lote'] < 1:
+            raise CommandError("--lote deve ser maior que zero.")
+        for alias in options['databases'] or bancos_de_escrita():
+            def progresso(total, alias=alias):
+                self.stdout.write(f"[{alias}] {total} notas movidas...")
+
+            if options['restaurar']:
+                movidas = restaurar(alias, options['lote'], options['pausa'], progresso)
+                self.stdout.write(self.style.SUCCESS(f"[{alias}] Notas devolvidas à tabela ativa: {movidas}"))
+                continue
+            try:
+                movidas = arquivar(alias, options['antes'], options['lote'], options['pausa'], progresso)
+            except ValueError as erro:
+                raise CommandError(str(erro))
+            self.stdout.write(self.style.SUCCESS(
+                f"[{alias}] Notas arquivadas (anteriores a {(options['antes'] or corte()):%d/%m/%Y}): {movidas}"
+            ))
@@ -0,0 +1,203 @@
+import http.client
+import json
+import platform
+import statistics
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from urllib.parse import urlsplit
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from rest_framework_simplejwt.tokens import AccessToken
+
+
+def endpoints_padrao():
+    inicio_mes = (date.today() - timedelta(days=30)).isoformat()
+    return {
+        'empresas': '/api/empresas/',
+        'transacoes_pagina': '/api/transacoes/?page_size=50',
+        'transacoes_pendentes': '/api/transacoes/?tipo=entrada&status=pendente&page_size=50',
+        'resumo': '/api/transacoes/resumo/',
+        'comparativo': '/api/transacoes/comparativo/?agrupamento=trimestre&dimensoes=tipo_material',
+        'busca': '/api/transacoes/busca/?q=distribuidora&page_size=20',
+        'notificacoes_nao_lidas': '/api/notificacoes/nao_lidas/',
+        'exportar_csv_30_dias': f'/api/transacoes/exportar/?formato=csv&data_inicio={inicio_mes}',
+    }
+
+
+class ClienteHTTP:
+    """Uma conexão keep-alive por thread contra um servidor em execução."""
+
+    def __init__(self, url_base, token):
+        partes = urlsplit(url_base)
+        classe = http.client.HTTPSConnection if partes.scheme == 'https' else http.client.HTTPConnection
+        self.conexao = classe(partes.netloc, timeout=60)
+        self.prefixo = partes.path.rstrip('/')
+        self.cabecalhos = {'Authorization': f'Bearer {token}'}
+
+    def get(self, caminho):
+        self.conexao.request('GET', self.prefixo + caminho, headers=self.cabecalhos)
+        resposta = self.conexao.getresponse()
+        resposta.read()
+        return resposta.status
+
+    def fechar(self):
+        self.conexao.close()
+
+
+class ClienteLocal:
+    """Chama a aplicação no próprio processo (django.test.Client), sem servidor HTTP."""
+
+    def __init__(self, token):
+        self.cliente = Client(HTTP_AUTHORIZATION=f'Bearer {token}', raise_request_exception=False)
+
+    def get(self, caminho):
+        resposta = self.cliente.get(caminho)
+        if resposta.streaming:
+            for _ in resposta.streaming_content:
+                pass
+        return resposta.status_code
+
+    def fechar(self):
+        # Cada thread de cliente abriu as próprias conexões com o banco
+        if threading.current_thread() is not threading.main_thread():
+            connections.close_all()
+
+
+def percentil(ordenados, p):
+    if not ordenados:
+        return None
+    if len(ordenados) == 1:
+        return ordenados[0]
+    return statistics.quantiles(ordenados, n=100, method='inclusive')[p - 1]
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede latência (p50/p95/p99) e vazão dos endpoints da API com clientes concorrentes "
+        "e imprime o resultado em JSON, para comparar versões. Sem --url, chama a aplicação "
+        "no próprio processo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help="URL base de um servidor em execução (ex.: http://localhost:8000).")
+        parser.add_argument('--usuario', required=True, help="Username usado nas requests (define papel e banco).")
+        parser.add_argument('--clientes', type=int, default=8, help="Clientes concorrentes.")
+        parser.add_argument('--requisicoes', type=int, default=200, help="Requests medidas por endpoint.")
+        parser.add_argument('--aquecimento', type=int, default=5, help="Requests descartadas por endpoint.")
+        parser.add_argument('--endpoints', help="Nomes separados por vírgula. Padrão: todos.")
+        parser.add_argument('--saida', help="Arquivo JSON de saída. Padrão: stdout.")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['usuario'])
+        except User.DoesNotExist:
+            raise CommandError(f"Usuário '{options['usuario']}' não existe.")
+        token = str(AccessToken.for_user(user))
+
+        todos = endpoints_padrao()
+        nomes = [n.strip() for n in (options['endpoints'] or ','.join(todos)).split(',') if n.strip()]
+        desconhecidos = set(nomes) - set(todos)
+        if desconhecidos:
+            raise CommandError(f"Endpoints desconhecidos: {', '.join(sorted(desconhecidos))}. Disponíveis: {', '.join(todos)}.")
+
+        if options['url']:
+            fabrica = lambda: ClienteHTTP(options['url'], token)
+        else:
+            fabrica = lambda: ClienteLocal(token)
+
+        resultado = {
+            'gerado_em': datetime.now().isoformat(timespec='seconds'),
+            'versao': self.versao(),
+            'python': platform.python_version(),
+            'configuracao': {
+                'alvo': options['url'] or 'processo local',
+                'usuario': user.username,
+                'clientes': options['clientes'],
+                'requisicoes': options['requisicoes'],
+                'aquecimento': options['aquecimento'],
+            },
+            'endpoints': {},
+        }
+        for nome in nomes:
+            self.stderr.write(f"Medindo {nome}...")
+            resultado['endpoints'][nome] = self.medir(
+                fabrica, todos[nome], options['clientes'], options['requisicoes'], options['aquecimento'],
+            )
+
+        texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+        if options['saida']:
+            with open(options['saida'], 'w', encoding='utf-8') as arquivo:
+                arquivo.write(texto + '\n')
+            self.stderr.write(self.style.SUCCESS(f"Resultado salvo em {options['saida']}"))
+        else:
+            self.stdout.write(texto)
+
+    def medir(self, fabrica, caminho, clientes, requisicoes, aquecimento):
+        clientes = max(1, min(clientes, requisicoes))
+        # Divide as requests entre os clientes (o resto vai para os primeiros)
+        cotas = [requisicoes // clientes + (1 if i < requisicoes % clientes else 0) for i in range(clientes)]
+        latencias = []
+        erros = []
+        lock = threading.Lock()
+        # A medição começa quando todos terminaram o aquecimento
+        largada_em = []
+        largada = threading.Barrier(clientes, action=lambda: largada_em.append(time.perf_counter()))
+
+        def cliente(cota):
+            conexao = fabrica()
+            try:
+                for _ in range(-(-aquecimento // clientes)):
+                    conexao.get(caminho)
+                largada.wait()
+                proprias, falhas = [], []
+                for _ in range(cota):
+                    inicio = time.perf_counter()
+                    try:
+                        codigo = conexao.get(caminho)
+                    except Exception as erro:
+                        falhas.append(type(erro).__name__)
+                        continue
+                    proprias.append(time.perf_counter() - inicio)
+                    if codigo >= 400:
+                        falhas.append(str(codigo))
+                with lock:
+                    latencias.extend(proprias)
+                    erros.extend(falhas)
+            finally:
+                conexao.fechar()
+
+        if clientes == 1:
+            cliente(cotas[0])
+        else:
+            with ThreadPoolExecutor(max_workers=clientes) as executor:
+                list(executor.map(cliente, cotas))
+        duracao = time.perf_counter() - largada_em[0] if largada_em else 0
+
+        ordenadas = sorted(latencias)
+        ms = lambda valor: round(valor * 1000, 2) if valor is not None else None
+        return {
+            'caminho': caminho,
+            'requisicoes': len(latencias),
+            'erros': len(erros),
+            'codigos_erro': sorted(set(erros)),
+            'p50_ms': ms(percentil(ordenadas, 50)),
+            'p95_ms': ms(percentil(ordenadas, 95)),
+            'p99_ms': ms(percentil(ordenadas, 99)),
+            'media_ms': ms(statistics.fmean(ordenadas)) if ordenadas else None,
+            'max_ms': ms(ordenadas[-1]) if ordenadas else None,
+            'vazao_rps': round(len(latencias) / duracao, 2) if duracao else None,
+        }
+
+    def versao(self):
+        try:
+            return subprocess.run(
+                ['git', 'describe', '--always', '--dirty'], capture_output=True, text=True, timeout=5,
+            ).stdout.strip() or None
+        except (OSError, subprocess.SubprocessError):
+            return None
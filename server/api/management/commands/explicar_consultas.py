@@ -0,0 +1,77 @@
+import re
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+from django.db.models import Count, Q, Sum
+
+from api.filters import filtrar_transacoes
+from api.models import Transacao
+from api.sintetico import gerar_base
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Executa EXPLAIN ANALYZE nas consultas canônicas de Transacao e mostra plano e tempo. "
+        "Com --seed os dados sintéticos são inseridos e descartados ao final (rollback)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--seed', type=int, default=0, help="Quantidade de transações sintéticas a inserir.")
+        parser.add_argument('--empresas', type=int, default=200)
+        parser.add_argument('--resumido', action='store_true', help="Mostra apenas o nó raiz de cada plano.")
+
+    def consultas(self, using):
+        base = Transacao.objects.using(using).select_related('empresa')
+        empresa_id = base.values_list('empresa_id', flat=True).first() or 0
+        nf = base.exclude(nf=None).values_list('nf', flat=True).first() or ''
+        hoje = date.today()
+        periodo = {'data_inicio': (hoje - timedelta(days=30)).isoformat(), 'data_fim': hoje.isoformat()}
+        keyset = ('-data_entrada', '-id')
+
+        return [
+            ("Pendências de uma empresa (Saída)",
+             filtrar_transacoes(base, {'empresa': str(empresa_id), 'tipo': 'entrada', 'status': 'pendente'})),
+            ("Pendências (página)",
+             filtrar_transacoes(base, {'tipo': 'entrada', 'status': 'pendente'}).order_by(*keyset)[:50]),
+            ("Pagamentos (página)",
+             filtrar_transacoes(base, {'tipo': 'saida'}).order_by(*keyset)[:50]),
+            ("Entradas no período (30 dias)",
+             filtrar_transacoes(base, {'tipo': 'entrada', **periodo}).order_by(*keyset)),
+            ("Baixas no período (30 dias)",
+             filtrar_transacoes(base, {'saida_inicio': periodo['data_inicio'], 'saida_fim': periodo['data_fim']})),
+            ("Busca por NF",
+             filtrar_transacoes(base, {'nf': nf})),
+            ("Totais por tipo (Dashboard)",
+             Transacao.objects.using(using).values('tipo').annotate(
+                 total=Sum('valor'), pendentes=Count('id', filter=Q(status='pendente')))),
+        ]
+
+    def handle(self, *args, **options):
+        using = options['database']
+        try:
+            with transaction.atomic(using=using):
+                if options['seed']:
+                    self.stdout.write(f"Inserindo {options['seed']} transações sintéticas em '{using}'...")
+                    gerar_base(options['empresas'], options['seed'], using=using)
+                    with connections[using].cursor() as cursor:
+                        cursor.execute("ANALYZE api_transacao")
+                self.relatorio(using, options['resumido'])
+                if options['seed']:
+                    raise Rollback
+        except Rollback:
+            self.stdout.write("Dados sintéticos descartados.")
+
+    def relatorio(self, using, resumido):
+        for titulo, queryset in self.consultas(using):
+            plano = queryset.explain(analyze=True, buffers=True)
+            tempo = re.search(r'Execution Time: ([\d.]+) ms', plano)
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"\n== {titulo} ({tempo.group(1) if tempo else '?'} ms)"
+            ))
+            self.stdout.write(plano.splitlines()[0] if resumido else plano)
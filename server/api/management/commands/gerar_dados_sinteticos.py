@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from api.sintetico import gerar_base
+
+
+def _mesmo_banco(alias, outro):
+    a, b = connections[alias].settings_dict, connections[outro].settings_dict
+    return all(a.get(chave) == b.get(chave) for chave in ('NAME', 'HOST', 'PORT'))
+
+
+class Command(BaseCommand):
+    help = (
+        "Popula o banco com empresas, transações e notificações sintéticas em volume de produção "
+        "(volume concentrado em poucas empresas, anos de datas, mix de material e destino)."
+    )
+
+    def add_arguments(self, parser):
+        # Sem padrão: com DATABASE_URL o alias 'tests' é uma cópia do banco de produção
+        parser.add_argument('--database', required=True, help="Banco de destino (ex.: o sandbox 'tests').")
+        parser.add_argument(
+            '--permitir-principal', action='store_true',
+            help="Aceita gravar no mesmo banco do 'default' (recusado por padrão).",
+        )
+        parser.add_argument('--empresas', type=int, default=200)
+        parser.add_argument('--transacoes', type=int, default=100_000, help="Total de entradas e saídas.")
+        parser.add_argument('--notificacoes', type=int, default=500)
+        parser.add_argument('--anos', type=int, default=5, help="Quantos anos para trás as datas alcançam.")
+        parser.add_argument('--semente', type=int, default=42, help="Mesma semente gera a mesma base.")
+        parser.add_argument('--lote', type=int, default=5000, help="Linhas por INSERT.")
+
+    def handle(self, *args, **options):
+        using = options['database']
+        if using not in connections:
+            raise CommandError(f"Banco '{using}' não configurado.")
+        if _mesmo_banco(using, 'default') and not options['permitir_principal']:
+            raise CommandError(
+                f"'{using}' aponta para o mesmo banco do 'default' (NAME/HOST/PORT). "
+                "Use --permitir-principal se for mesmo essa a intenção."
+            )
+        self.stdout.write(
+            f"Gerando {options['empresas']} empresas, {options['transacoes']} transações e "
+            f"{options['notificacoes']} notificações em '{using}'..."
+        )
+        gerar_base(
+            options['empresas'], options['transacoes'], using=using, semente=options['semente'],
+            lote=options['lote'], anos=options['anos'], qtd_notificacoes=options['notificacoes'],
+        )
+        self.stdout.write(self.style.SUCCESS(f"[{using}] Base sintética gerada."))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from api.db_router import bancos_de_escrita
+from api.sincronizacao import limpar_exclusoes
+
+
+class Command(BaseCommand):
+    help = (
+        "Apaga os registros de exclusão (usados na sincronização incremental) com mais de "
+        "SINCRONIZACAO_RETENCAO_DIAS dias. Clientes com token mais antigo recebem a carga completa."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database', action='append', dest='databases',
+            help="Banco a limpar (pode repetir). Padrão: todos os bancos, exceto réplicas.",
+        )
+
+    def handle(self, *args, **options):
+        for alias in options['databases'] or bancos_de_escrita():
+            apagados = limpar_exclusoes(alias)
+            self.stdout.write(self.style.SUCCESS(f"[{alias}] Registros de exclusão apagados: {apagados}"))
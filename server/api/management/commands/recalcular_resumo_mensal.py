@@ -0,0 +1,38 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.db_router import bancos_de_escrita
+from api.resumo_mensal import recalcular
+
+
+def _mes(texto):
+    try:
+        ano, mes = texto.split('-')
+        return date(int(ano), int(mes), 1)
+    except ValueError:
+        raise CommandError(f"Mês inválido: '{texto}'. Use o formato AAAA-MM.")
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstrói o resumo mensal (totais por mês, empresa, tipo, status, material e destino) "
+        "a partir das transações. Serve para a carga inicial e para corrigir divergências."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--inicio', type=_mes, help="Primeiro mês (AAAA-MM). Padrão: o mais antigo.")
+        parser.add_argument('--fim', type=_mes, help="Último mês (AAAA-MM). Padrão: o mais recente.")
+        parser.add_argument(
+            '--database', action='append', dest='databases',
+            help="Banco a recalcular (pode repetir). Padrão: todos os bancos, exceto réplicas.",
+        )
+
+    def handle(self, *args, **options):
+        if options['inicio'] and options['fim'] and options['inicio'] > options['fim']:
+            raise CommandError("--inicio deve ser anterior a --fim.")
+        for alias in options['databases'] or bancos_de_escrita():
+            divergentes = recalcular(using=alias, inicio=options['inicio'], fim=options['fim'])
+            self.stdout.write(self.style.SUCCESS(
+                f"[{alias}] Resumo mensal recalculado. Linhas com divergência corrigida: {divergentes}"
+            ))
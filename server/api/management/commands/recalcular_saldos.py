@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from api.db_router import bancos_de_escrita
+from api.saldos import recalcular_saldos
+
+
+class Command(BaseCommand):
+    help = "Reconstrói a tabela de saldos por empresa a partir das transações."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database', action='append', dest='databases',
+            help="Banco a recalcular (pode repetir). Padrão: todos os bancos, exceto réplicas.",
+        )
+
+    def handle(self, *args, **options):
+        for alias in options['databases'] or bancos_de_escrita():
+            divergentes = recalcular_saldos(using=alias)
+            self.stdout.write(self.style.SUCCESS(
+                f"[{alias}] Saldos recalculados. Empresas com divergência corrigida: {divergentes}"
+            ))
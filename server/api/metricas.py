@@ -0,0 +1,203 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from django.conf import settings
+from rest_framework.renderers import BaseRenderer
+
+logger = logging.getLogger('api.metricas')
+
+# Limites (em segundos) dos buckets do histograma de latência
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Consultas mais lentas guardadas por request para o log de requests lentas
+CONSULTAS_NO_LOG = 3
+
+# Coleta de SQL da request atual. É um ContextVar: o wrapper instalado nas
+# conexões enxerga a request certa também nas threads do sync_to_async.
+_coleta_atual = ContextVar('coleta_metricas', default=None)
+
+
+class ColetaSQL:
+    __slots__ = ('consultas', 'segundos', 'por_banco', 'lentas')
+
+    def __init__(self):
+        self.consultas = 0
+        self.segundos = 0.0
+        self.por_banco = {}
+        self.lentas = []
+
+    def registrar(self, alias, sql, duracao):
+        self.consultas += 1
+        self.segundos += duracao
+        self.por_banco[alias] = self.por_banco.get(alias, 0) + 1
+        # Mantém só as N mais lentas (lista pequena, sem custo relevante)
+        if len(self.lentas) < CONSULTAS_NO_LOG or duracao > self.lentas[-1][0]:
+            self.lentas.append((duracao, sql))
+            self.lentas.sort(key=lambda item: item[0], reverse=True)
+            del self.lentas[CONSULTAS_NO_LOG:]
+
+    @property
+    def banco(self):
+        """Alias que atendeu a request: o que executou mais consultas."""
+        if not self.por_banco:
+            return 'nenhum'
+        return max(self.por_banco, key=self.por_banco.get)
+
+
+def medir_consulta(execute, sql, params, many, context):
+    """execute_wrapper instalado em todas as conexões (ver instalar_coleta)."""
+    coleta = _coleta_atual.get()
+    if coleta is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        coleta.registrar(context['connection'].alias, sql, time.perf_counter() - inicio)
+
+
+def instalar_coleta(sender, connection, **kwargs):
+    """Receiver de connection_created: cada conexão nova passa pelo wrapper."""
+    if medir_consulta not in connection.execute_wrappers:
+        connection.execute_wrappers.append(medir_consulta)
+
+
+def iniciar_coleta():
+    coleta = ColetaSQL()
+    return coleta, _coleta_atual.set(coleta)
+
+
+def encerrar_coleta(token):
+    _coleta_atual.reset(token)
+
+
+class Registro:
+    """Métricas acumuladas no processo, por (rota, método, banco)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.limpar()
+
+    def limpar(self):
+        with self._lock:
+            self.series = {}
+            self.status = {}
+
+    def registrar(self, rota, metodo, status, duracao, coleta, tamanho):
+        chave = (rota, metodo, coleta.banco)
+        with self._lock:
+            serie = self.series.get(chave)
+            if serie is None:
+                serie = self.series[chave] = {
+                    'buckets': [0] * (len(BUCKETS) + 1),
+                    'duracao': 0.0, 'requisicoes': 0,
+                    'consultas': 0, 'sql_segundos': 0.0, 'bytes': 0,
+                }
+            serie['buckets'][bisect_left(BUCKETS, duracao)] += 1
+            serie['duracao'] += duracao
+            serie['requisicoes'] += 1
+            serie['consultas'] += coleta.consultas
+            serie['sql_segundos'] += coleta.segundos
+            serie['bytes'] += tamanho
+            chave_status = (rota, metodo, str(status))
+            self.status[chave_status] = self.status.get(chave_status, 0) + 1
+
+    def copia(self):
+        with self._lock:
+            series = {k: {**v, 'buckets': list(v['buckets'])} for k, v in self.series.items()}
+            return series, dict(self.status)
+
+
+registro = Registro()
+
+
+def registrar_requisicao(request, response, duracao, coleta):
+    match = getattr(request, 'resolver_match', None)
+    rota = match.view_name if match and match.view_name else 'nao_encontrada'
+    if response.streaming:
+        # Exportações: o corpo ainda não foi gerado quando a view retorna
+        tamanho = int(response.get('Content-Length') or 0)
+    else:
+        tamanho = len(response.content)
+    registro.registrar(rota, request.method, response.status_code, duracao, coleta, tamanho)
+
+    limite = settings.METRICAS_LIMITE_LENTA_MS / 1000
+    if limite and duracao >= limite:
+        logger.warning(
+            "Request lenta: %s %s %.0f ms, %d consultas SQL (%.0f ms) no banco %s. Mais lentas: %s",
+            request.method, request.get_full_path(), duracao * 1000, coleta.consultas,
+            coleta.segundos * 1000, coleta.banco,
+            ' | '.join(f"{d * 1000:.1f} ms: {sql[:500]}" for d, sql in coleta.lentas),
+        )
+
+
+# --- Exposição no formato texto do Prometheus ------------------------------
+
+def _rotulos(**rotulos):
+    texto = ','.join(
+        '{}="{}"'.format(nome, str(valor).replace('\\', '\\\\').replace('"', '\\"'))
+        for nome, valor in rotulos.items()
+    )
+    return '{' + texto + '}'
+
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+def formato_prometheus(extras=()):
+    """
+    Texto no formato de exposição do Prometheus. `extras` são métricas simples
+    (nome, tipo, ajuda, [(rótulos, valor)]) de outras partes do sistema.
+    """
+    series, status = registro.copia()
+    linhas = []
+
+    def cabecalho(nome, tipo, ajuda):
+        linhas.append(f"# HELP {nome} {ajuda}")
+        linhas.append(f"# TYPE {nome} {tipo}")
+
+    cabecalho('sigh_http_requisicao_segundos', 'histogram', 'Latência das requests por rota, método e banco.')
+    for (rota, metodo, banco), serie in sorted(series.items()):
+        acumulado = 0
+        for limite, quantidade in zip(BUCKETS + ('+Inf',), serie['buckets']):
+            acumulado += quantidade
+            rotulos = _rotulos(rota=rota, metodo=metodo, banco=banco, le=limite)
+            linhas.append(f"sigh_http_requisicao_segundos_bucket{rotulos} {acumulado}")
+        rotulos = _rotulos(rota=rota, metodo=metodo, banco=banco)
+        linhas.append(f"sigh_http_requisicao_segundos_sum{rotulos} {_numero(serie['duracao'])}")
+        linhas.append(f"sigh_http_requisicao_segundos_count{rotulos} {serie['requisicoes']}")
+
+    contadores = (
+        ('sigh_sql_consultas_total', 'consultas', 'Consultas SQL executadas pelas requests.'),
+        ('sigh_sql_segundos_total', 'sql_segundos', 'Tempo total gasto em SQL pelas requests.'),
+        ('sigh_http_resposta_bytes_total', 'bytes', 'Bytes enviados no corpo das respostas.'),
+    )
+    for nome, campo, ajuda in contadores:
+        cabecalho(nome, 'counter', ajuda)
+        for (rota, metodo, banco), serie in sorted(series.items()):
+            rotulos = _rotulos(rota=rota, metodo=metodo, banco=banco)
+            linhas.append(f"{nome}{rotulos} {_numero(serie[campo])}")
+
+    cabecalho('sigh_http_requisicoes_total', 'counter', 'Requests por rota, método e status.')
+    for (rota, metodo, codigo), quantidade in sorted(status.items()):
+        linhas.append(f"sigh_http_requisicoes_total{_rotulos(rota=rota, metodo=metodo, status=codigo)} {quantidade}")
+
+    for nome, tipo, ajuda, valores in extras:
+        cabecalho(nome, tipo, ajuda)
+        for rotulos, valor in valores:
+            linhas.append(f"{nome}{_rotulos(**rotulos) if rotulos else ''} {_numero(valor)}")
+
+    return '\n'.join(linhas) + '\n'
+
+
+class PrometheusRenderer(BaseRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Respostas de erro (401/403) chegam como dict
+        return data if isinstance(data, str) else '\n'.join(f"# {k}: {v}" for k, v in data.items()) + '\n'
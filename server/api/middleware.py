@@ -1,29 +1,117 @@
-import threading
-from rest_framework_simplejwt.authentication import JWTAuthentication
+import time
+from contextvars import ContextVar
 
-local_storage = threading.local()
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+
+from django.conf import settings
+
+from . import db_router, metricas
+from .authentication import JWTAutenticacaoUnica
+
+# ContextVar em vez de threading.local: sob ASGI várias requests dividem a
+# mesma thread, e cada uma precisa enxergar apenas o próprio usuário.
+usuario_atual = ContextVar('usuario_atual', default=None)
+# Estado da request usado pelo roteador (réplica escolhida, se já houve escrita)
+estado_requisicao = ContextVar('estado_requisicao', default=None)
 
 class CurrentUserMiddleware:
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        self.autenticacao = JWTAutenticacaoUnica()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
-        
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        self.autenticar(request)
+        tokens = self.iniciar_contexto(request)
+        try:
+            return self.marcar_resposta(request, self.get_response(request))
+        finally:
+            self.encerrar_contexto(tokens)
+
+    async def __acall__(self, request):
+        # Em cache de token a autenticação não toca o banco; na falta, o SELECT
+        # em auth_user roda fora do event loop
+        await sync_to_async(self.autenticar)(request)
+        tokens = self.iniciar_contexto(request)
+        try:
+            return self.marcar_resposta(request, await self.get_response(request))
+        finally:
+            self.encerrar_contexto(tokens)
+
+    def autenticar(self, request):
+        # O resultado fica no request e é reaproveitado pelo DRF
+        user_auth = self.autenticacao.autenticar_request(request)
+        if user_auth and not isinstance(user_auth, Exception):
+            request.user = user_auth[0]
+
+    def iniciar_contexto(self, request):
+        # POST/PUT/PATCH/DELETE leem do banco principal desde o início,
+        # antes mesmo da primeira escrita (ex.: get_object antes do save)
+        estado = {} if request.method in ('GET', 'HEAD', 'OPTIONS') else {'leitura': 'default'}
+        # Escreveu há pouco (talvez em outro worker): a réplica pode não ter a escrita ainda
+        user = getattr(request, 'user', None)
+        if db_router.escrita_recente(request.headers.get(db_router.CABECALHO_ESCRITA), user):
+            estado['escrita_recente'] = True
+        return (
+            usuario_atual.set(getattr(request, 'user', None)),
+            estado_requisicao.set(estado),
+        )
+
+    def marcar_resposta(self, request, response):
+        estado = estado_requisicao.get()
+        user = getattr(request, 'user', None)
+        if settings.REPLICAS_LEITURA and estado and estado.get('escreveu') and user and user.is_authenticated:
+            response[db_router.CABECALHO_ESCRITA] = db_router.marcar_escrita(user)
+        return response
+
+    def encerrar_contexto(self, tokens):
+        token_usuario, token_estado = tokens
+        estado_requisicao.reset(token_estado)
+        usuario_atual.reset(token_usuario)
+
+class MetricasMiddleware:
+    """
+    Latência, consultas SQL, tempo de SQL e tamanho da resposta por rota e
+    método (api.metricas, expostos em /api/metrics/). Fica antes do
+    CurrentUserMiddleware para que a autenticação entre na conta.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        inicio = time.perf_counter()
+        coleta, token = metricas.iniciar_coleta()
+        try:
+            response = self.get_response(request)
+        finally:
+            metricas.encerrar_coleta(token)
+        metricas.registrar_requisicao(request, response, time.perf_counter() - inicio, coleta)
+        return response
+
+    async def __acall__(self, request):
+        inicio = time.perf_counter()
+        coleta, token = metricas.iniciar_coleta()
         try:
-            auth = JWTAuthentication()
-            user_auth = auth.authenticate(request)
-            if user_auth is not None:
-                request.user = user_auth[0]
-        except:
-            pass
-
-        setattr(local_storage, 'user', getattr(request, 'user', None))
-        
-        response = self.get_response(request)
-        
-        setattr(local_storage, 'user', None)
-        
+            response = await self.get_response(request)
+        finally:
+            metricas.encerrar_coleta(token)
+        metricas.registrar_requisicao(request, response, time.perf_counter() - inicio, coleta)
         return response
 
 def get_current_user():
-    return getattr(local_storage, 'user', None)
\ No newline at end of file
+    return usuario_atual.get()
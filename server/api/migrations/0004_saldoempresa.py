@@ -0,0 +1,55 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, Q, Sum
+
+
+def popular_saldos(apps, schema_editor):
+    Empresa = apps.get_model('api', 'Empresa')
+    SaldoEmpresa = apps.get_model('api', 'SaldoEmpresa')
+    db = schema_editor.connection.alias
+
+    entrada = Q(transacoes__tipo='entrada')
+    pendente = Q(transacoes__tipo='entrada', transacoes__status='pendente')
+    empresas = Empresa.objects.using(db).annotate(
+        total_entradas=Sum('transacoes__valor', filter=entrada),
+        total_saidas=Sum('transacoes__valor', filter=Q(transacoes__tipo='saida')),
+        qtd_pendentes=Count('transacoes', filter=pendente),
+        valor_pendente=Sum('transacoes__valor', filter=pendente),
+        max_entrada=Max('transacoes__data_entrada'),
+        max_saida=Max('transacoes__data_saida'),
+    )
+    SaldoEmpresa.objects.using(db).bulk_create([
+        SaldoEmpresa(
+            empresa_id=e.pk,
+            total_entradas=e.total_entradas or 0,
+            total_saidas=e.total_saidas or 0,
+            qtd_pendentes=e.qtd_pendentes,
+            valor_pendente=e.valor_pendente or 0,
+            ultima_movimentacao=max([d for d in (e.max_entrada, e.max_saida) if d], default=None),
+        )
+        for e in empresas
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_notificacao'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaldoEmpresa',
+            fields=[
+                ('empresa', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='saldo', serialize=False, to='api.empresa')),
+                ('total_entradas', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('total_saidas', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('qtd_pendentes', models.PositiveIntegerField(default=0)),
+                ('valor_pendente', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('ultima_movimentacao', models.DateField(blank=True, null=True)),
+            ],
+        ),
+        migrations.RunPython(popular_saldos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:29
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY não bloqueia escritas em api_transacao,
+    # mas não pode rodar dentro de uma transação.
+    atomic = False
+
+    dependencies = [
+        ('api', '0004_saldoempresa'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='transacao',
+            index=models.Index(fields=['empresa', 'tipo', 'status'], name='transacao_emp_tipo_status_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='transacao',
+            index=models.Index(fields=['data_entrada', 'id'], name='transacao_data_entrada_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='transacao',
+            index=models.Index(fields=['tipo', 'data_entrada', 'id'], name='transacao_tipo_data_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='transacao',
+            index=models.Index(condition=models.Q(('data_saida__isnull', False)), fields=['data_saida'], name='transacao_data_saida_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='transacao',
+            index=models.Index(condition=models.Q(('nf__isnull', False)), fields=['nf'], name='transacao_nf_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='transacao',
+            index=models.Index(condition=models.Q(('status', 'pendente'), ('tipo', 'entrada')), fields=['empresa', 'data_entrada'], name='transacao_pendentes_idx'),
+        ),
+    ]
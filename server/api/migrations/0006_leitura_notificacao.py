@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_transacao_indices'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeituraNotificacao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('usuario_id', models.IntegerField()),
+                ('lido_em', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='notificacao',
+            index=models.Index(condition=models.Q(('ativo', True)), fields=['alvo', '-criado_em'], name='notificacao_ativas_idx'),
+        ),
+        migrations.AddField(
+            model_name='leituranotificacao',
+            name='notificacao',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leituras', to='api.notificacao'),
+        ),
+        migrations.AddConstraint(
+            model_name='leituranotificacao',
+            constraint=models.UniqueConstraint(fields=('usuario_id', 'notificacao'), name='leitura_unica_por_usuario'),
+        ),
+    ]
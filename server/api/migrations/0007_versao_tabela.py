@@ -0,0 +1,21 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_leitura_notificacao'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersaoTabela',
+            fields=[
+                ('tabela', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('versao', models.BigIntegerField(default=0)),
+                ('alterado_em', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
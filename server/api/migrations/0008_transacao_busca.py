@@ -0,0 +1,56 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:06
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+# Índices de trigrama para ILIKE '%termo%' e similaridade. Ficam fora do estado
+# do Django porque dependem da extensão pg_trgm, que pode não estar instalada
+# no servidor (sem ela a busca usa só o vetor textual; ver api/busca.py).
+INDICES_TRIGRAMA = {
+    'transacao_nf_trgm_idx': ('api_transacao', 'nf'),
+    'empresa_nome_trgm_idx': ('api_empresa', 'nome'),
+    'empresa_cnpj_trgm_idx': ('api_empresa', 'cnpj'),
+}
+
+
+def criar_indices_trigrama(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            return
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for nome, (tabela, coluna) in INDICES_TRIGRAMA.items():
+            cursor.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {nome} "
+                f"ON {tabela} USING gin ({coluna} gin_trgm_ops)"
+            )
+
+
+def remover_indices_trigrama(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        for nome in INDICES_TRIGRAMA:
+            cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {nome}")
+
+
+class Migration(migrations.Migration):
+    # Índices criados com CONCURRENTLY (como na 0005): sem transação
+    atomic = False
+
+    dependencies = [
+        ('api', '0007_versao_tabela'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transacao',
+            name='busca',
+            field=models.GeneratedField(db_persist=True, expression=django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.SearchVector('nf', config='portuguese', weight='A'), '||', django.contrib.postgres.search.SearchVector('descricao', config='portuguese', weight='B'), django.contrib.postgres.search.SearchConfig('portuguese')), output_field=django.contrib.postgres.search.SearchVectorField()),
+        ),
+        AddIndexConcurrently(
+            model_name='transacao',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['busca'], name='transacao_busca_idx'),
+        ),
+        migrations.RunPython(criar_indices_trigrama, remover_indices_trigrama),
+    ]
@@ -0,0 +1,99 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def _nome(valor):
+    return ' '.join(valor.split()) if isinstance(valor, str) else ''
+
+
+def migrar_emendas(apps, schema_editor):
+    """
+    Cria uma Emenda para cada nome encontrado em Empresa.emendas (lista JSON)
+    e em Transacao.emenda_origem (texto), e liga empresas e notas a elas.
+    """
+    db = schema_editor.connection.alias
+    Emenda = apps.get_model('api', 'Emenda')
+    Empresa = apps.get_model('api', 'Empresa')
+    Transacao = apps.get_model('api', 'Transacao')
+
+    por_empresa = {
+        pk: {_nome(n) for n in (lista if isinstance(lista, list) else [])} - {''}
+        for pk, lista in Empresa.objects.using(db).values_list('pk', 'emendas_legado')
+    }
+    nomes = set().union(*por_empresa.values())
+    nomes |= {
+        _nome(n) for n in
+        Transacao.objects.using(db).exclude(emenda_origem__isnull=True)
+        .values_list('emenda_origem', flat=True).distinct()
+    } - {''}
+    # Origem padrão das baixas (api.views.TransacaoViewSet.baixa)
+    nomes.add("Recurso Próprio")
+
+    Emenda.objects.using(db).bulk_create([Emenda(nome=n) for n in sorted(nomes)])
+    ids = dict(Emenda.objects.using(db).values_list('nome', 'pk'))
+
+    Vinculo = Empresa.emendas.through
+    Vinculo.objects.using(db).bulk_create([
+        Vinculo(empresa_id=empresa_id, emenda_id=ids[nome])
+        for empresa_id, lista in por_empresa.items() for nome in lista
+    ], batch_size=1000)
+
+    # Uma única atualização no banco, com o mesmo ajuste de espaços de _nome()
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(r"""
+            UPDATE api_transacao t SET emenda_id = e.id
+            FROM api_emenda e
+            WHERE t.emenda_origem IS NOT NULL
+              AND e.nome = btrim(regexp_replace(t.emenda_origem, '\s+', ' ', 'g'))
+        """)
+
+
+def restaurar_texto(apps, schema_editor):
+    db = schema_editor.connection.alias
+    Empresa = apps.get_model('api', 'Empresa')
+    for empresa in Empresa.objects.using(db).prefetch_related('emendas'):
+        empresa.emendas_legado = sorted(e.nome for e in empresa.emendas.all())
+        empresa.save(update_fields=['emendas_legado'])
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("""
+            UPDATE api_transacao t SET emenda_origem = e.nome
+            FROM api_emenda e WHERE t.emenda_id = e.id
+        """)
+
+
+class Migration(migrations.Migration):
+    # Os campos antigos (texto/JSON) só saem na 0010: no Postgres não dá para
+    # alterar api_transacao na mesma transação que acabou de atualizá-la.
+
+    dependencies = [
+        ('api', '0008_transacao_busca'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Emenda',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome', models.CharField(max_length=255, unique=True)),
+                ('valor_alocado', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='transacao',
+            name='emenda',
+            field=models.ForeignKey(blank=True, help_text='Origem do recurso do pagamento (saídas)', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='transacoes', to='api.emenda'),
+        ),
+        migrations.RenameField(
+            model_name='empresa',
+            old_name='emendas',
+            new_name='emendas_legado',
+        ),
+        migrations.AddField(
+            model_name='empresa',
+            name='emendas',
+            field=models.ManyToManyField(blank=True, related_name='empresas', to='api.emenda'),
+        ),
+        migrations.RunPython(migrar_emendas, restaurar_texto),
+    ]
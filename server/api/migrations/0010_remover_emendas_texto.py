@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:02
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Índice em api_transacao com CONCURRENTLY (como na 0005): sem transação
+    atomic = False
+
+    dependencies = [
+        ('api', '0009_emenda'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='empresa',
+            name='emendas_legado',
+        ),
+        migrations.RemoveField(
+            model_name='transacao',
+            name='emenda_origem',
+        ),
+        migrations.AddIndex(
+            model_name='empresa',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['tipo'], name='empresa_ramos_idx', opclasses=['jsonb_path_ops']),
+        ),
+        AddIndexConcurrently(
+            model_name='transacao',
+            index=models.Index(condition=models.Q(('emenda__isnull', False), ('tipo', 'saida')), fields=['emenda', 'data_saida'], include=('valor',), name='transacao_emenda_gastos_idx'),
+        ),
+    ]
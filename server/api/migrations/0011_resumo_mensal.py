@@ -0,0 +1,43 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Carga inicial direto no banco, em uma única consulta agregada
+# (a mesma regra de api.resumo_mensal.recalcular)
+CARGA_INICIAL = """
+    INSERT INTO api_resumomensal
+        (mes, empresa_id, tipo, status, tipo_material, destino_entrada, valor_total, quantidade)
+    SELECT date_trunc('month', data_entrada)::date, empresa_id, tipo, status,
+           COALESCE(tipo_material, ''), COALESCE(destino_entrada, ''), SUM(valor), COUNT(*)
+    FROM api_transacao
+    GROUP BY 1, 2, 3, 4, 5, 6
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_remover_emendas_texto'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumoMensal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField(help_text='Primeiro dia do mês')),
+                ('tipo', models.CharField(choices=[('entrada', 'Entrada'), ('saida', 'Saída')], max_length=10)),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('pago', 'Pago')], max_length=10)),
+                ('tipo_material', models.CharField(blank=True, default='', max_length=20)),
+                ('destino_entrada', models.CharField(blank=True, default='', max_length=30)),
+                ('valor_total', models.DecimalField(decimal_places=2, default=0, max_digits=17)),
+                ('quantidade', models.IntegerField(default=0)),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumos_mensais', to='api.empresa')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('mes', 'empresa', 'tipo', 'status', 'tipo_material', 'destino_entrada'), name='resumo_mensal_chave')],
+            },
+        ),
+        migrations.RunSQL(CARGA_INICIAL, migrations.RunSQL.noop),
+    ]
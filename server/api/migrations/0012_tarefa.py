@@ -0,0 +1,34 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_resumo_mensal'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tarefa',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('usuario_id', models.IntegerField()),
+                ('tipo', models.CharField(choices=[('exportacao', 'Exportação de transações'), ('comparativo', 'Comparativo entre períodos')], max_length=20)),
+                ('parametros', models.JSONField(blank=True, default=dict)),
+                ('chave', models.CharField(max_length=64)),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('executando', 'Executando'), ('concluida', 'Concluída'), ('erro', 'Erro')], default='pendente', max_length=10)),
+                ('erro', models.TextField(blank=True, default='')),
+                ('resultado', models.BinaryField(null=True)),
+                ('content_type', models.CharField(blank=True, default='', max_length=100)),
+                ('nome_arquivo', models.CharField(blank=True, default='', max_length=100)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('iniciado_em', models.DateTimeField(blank=True, null=True)),
+                ('concluido_em', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['usuario_id', 'chave'], name='tarefa_usuario_chave_idx'), models.Index(condition=models.Q(('status', 'pendente')), fields=['criado_em'], name='tarefa_pendentes_idx')],
+            },
+        ),
+    ]
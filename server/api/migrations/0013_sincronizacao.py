@@ -0,0 +1,49 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:27
+
+from django.db import migrations, models
+
+# As linhas existentes recebem a data desta migração em atualizado_em (ADD COLUMN
+# com valor constante não reescreve a tabela). Índices em 0014, sem travar escritas.
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_tarefa'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Exclusao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tabela', models.CharField(max_length=50)),
+                ('registro_id', models.BigIntegerField()),
+                ('excluido_em', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='empresa',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='notificacao',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='saldoempresa',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='transacao',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='exclusao',
+            index=models.Index(fields=['tabela', 'excluido_em'], name='exclusao_tabela_idx'),
+        ),
+    ]
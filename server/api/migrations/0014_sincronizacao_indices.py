@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:27
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY não pode rodar dentro de uma transação
+    atomic = False
+
+    dependencies = [
+        ('api', '0013_sincronizacao'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='empresa',
+            index=models.Index(fields=['atualizado_em', 'id'], name='empresa_atualizado_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='notificacao',
+            index=models.Index(fields=['atualizado_em', 'id'], name='notificacao_atualizado_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='transacao',
+            index=models.Index(fields=['atualizado_em', 'id'], name='transacao_atualizado_idx'),
+        ),
+    ]
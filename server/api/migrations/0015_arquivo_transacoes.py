@@ -0,0 +1,76 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:32
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+import django.db.models.deletion
+import django.db.models.functions.datetime
+from django.db import migrations, models
+
+COLUNAS = (
+    "id, empresa_id, tipo, status, nf, descricao, valor, data, data_entrada, data_saida, "
+    "tipo_material, destino_entrada, emenda_id, busca, atualizado_em"
+)
+# Notas ativas e arquivadas, lidas juntas pela visão (api.models.TransacaoHistorico)
+CRIAR_VISAO = f"""
+    CREATE VIEW api_transacao_historico AS
+    SELECT {COLUNAS}, false AS arquivada FROM api_transacao
+    UNION ALL
+    SELECT {COLUNAS}, true AS arquivada FROM api_transacaoarquivo
+"""
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_sincronizacao_indices'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransacaoHistorico',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('tipo', models.CharField(choices=[('entrada', 'Entrada'), ('saida', 'Saída')], max_length=10)),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('pago', 'Pago')], max_length=10)),
+                ('nf', models.CharField(blank=True, max_length=50, null=True)),
+                ('descricao', models.TextField(blank=True, null=True)),
+                ('valor', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('data', models.DateField()),
+                ('data_entrada', models.DateField()),
+                ('data_saida', models.DateField(null=True)),
+                ('tipo_material', models.CharField(choices=[('laboratorio', 'Laboratório'), ('medicamentos', 'Medicamentos'), ('insumo', 'Insumo')], max_length=20, null=True)),
+                ('destino_entrada', models.CharField(choices=[('atencao_primaria', 'Atenção Primária'), ('hospital', 'Hospital')], max_length=30, null=True)),
+                ('busca', django.contrib.postgres.search.SearchVectorField()),
+                ('atualizado_em', models.DateTimeField()),
+                ('arquivada', models.BooleanField()),
+            ],
+            options={
+                'db_table': 'api_transacao_historico',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='TransacaoArquivo',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('tipo', models.CharField(choices=[('entrada', 'Entrada'), ('saida', 'Saída')], max_length=10)),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('pago', 'Pago')], max_length=10)),
+                ('nf', models.CharField(blank=True, max_length=50, null=True)),
+                ('descricao', models.TextField(blank=True, null=True)),
+                ('valor', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('data', models.DateField()),
+                ('data_entrada', models.DateField()),
+                ('data_saida', models.DateField(blank=True, null=True)),
+                ('tipo_material', models.CharField(blank=True, choices=[('laboratorio', 'Laboratório'), ('medicamentos', 'Medicamentos'), ('insumo', 'Insumo')], max_length=20, null=True)),
+                ('destino_entrada', models.CharField(blank=True, choices=[('atencao_primaria', 'Atenção Primária'), ('hospital', 'Hospital')], max_length=30, null=True)),
+                ('busca', models.GeneratedField(db_persist=True, expression=django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.SearchVector('nf', config='portuguese', weight='A'), '||', django.contrib.postgres.search.SearchVector('descricao', config='portuguese', weight='B'), django.contrib.postgres.search.SearchConfig('portuguese')), output_field=django.contrib.postgres.search.SearchVectorField())),
+                ('atualizado_em', models.DateTimeField()),
+                ('arquivado_em', models.DateTimeField(db_default=django.db.models.functions.datetime.Now())),
+                ('emenda', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='transacoes_arquivadas', to='api.emenda')),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transacoes_arquivadas', to='api.empresa')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['data_entrada', 'id'], name='transacao_arq_data_idx'), models.Index(fields=['atualizado_em', 'id'], name='transacao_arq_atualizado_idx'), models.Index(condition=models.Q(('emenda__isnull', False), ('tipo', 'saida')), fields=['emenda', 'data_saida'], include=('valor',), name='transacao_arq_emenda_idx'), django.contrib.postgres.indexes.GinIndex(fields=['busca'], name='transacao_arq_busca_idx')],
+            },
+        ),
+        migrations.RunSQL(CRIAR_VISAO, "DROP VIEW api_transacao_historico"),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_arquivo_transacoes'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='tarefa',
+            name='resultado',
+        ),
+        migrations.AddField(
+            model_name='tarefa',
+            name='arquivo',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+    ]
@@ -1,12 +1,36 @@
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.db import models, router, transaction
+from django.db.models.functions import Now
 from datetime import date 
 
+class Emenda(models.Model):
+    """
+    Emenda parlamentar (ou outra origem de recurso, como "Recurso Próprio")
+    da qual saem os pagamentos. valor_alocado é o total destinado à emenda;
+    o gasto é a soma das saídas ligadas a ela (ver api/emendas.py).
+    """
+    nome = models.CharField(max_length=255, unique=True)
+    valor_alocado = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+
+    def __str__(self):
+        return self.nome
+
 class Empresa(models.Model):
     nome = models.CharField(max_length=200)
     cnpj = models.CharField(max_length=20, unique=True)
     tipo = models.JSONField(default=list, blank=True, help_text="Lista de ramos de atividade")    
     licitacao = models.BooleanField(default=False, help_text="Possui licitação vigente?")
-    emendas = models.JSONField(default=list, blank=True)
+    emendas = models.ManyToManyField(Emenda, blank=True, related_name='empresas')
+    # Última alteração do que a API mostra da empresa (sincronização, ver api/sincronizacao.py)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Filtro por ramo com contenção JSON (tipo @> '["Medicamentos"]')
+            GinIndex(fields=['tipo'], name='empresa_ramos_idx', opclasses=['jsonb_path_ops']),
+            models.Index(fields=['atualizado_em', 'id'], name='empresa_atualizado_idx'),
+        ]
 
     def __str__(self):
         return self.nome
@@ -54,11 +78,187 @@ class Transacao(models.Model):
         help_text="Destino inicial (Atenção Primária ou Hospital)"
     )
     
-    emenda_origem = models.CharField(max_length=255, blank=True, null=True)
+    emenda = models.ForeignKey(
+        Emenda, on_delete=models.PROTECT, null=True, blank=True, related_name='transacoes',
+        help_text="Origem do recurso do pagamento (saídas)",
+    )
+
+    # Vetor de busca textual (ver api/busca.py), mantido pelo próprio Postgres
+    busca = models.GeneratedField(
+        expression=(
+            SearchVector('nf', weight='A', config='portuguese')
+            + SearchVector('descricao', weight='B', config='portuguese')
+        ),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
+    # Última alteração da linha, incluindo o nome da empresa e da emenda que o
+    # serializer mostra (ver api/signals.py). Base da sincronização incremental.
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        # Índices alinhados às consultas reais do sistema (conferir com: manage.py explicar_consultas)
+        indexes = [
+            models.Index(fields=['empresa', 'tipo', 'status'], name='transacao_emp_tipo_status_idx'),
+            models.Index(fields=['data_entrada', 'id'], name='transacao_data_entrada_idx'),
+            models.Index(fields=['tipo', 'data_entrada', 'id'], name='transacao_tipo_data_idx'),
+            models.Index(
+                fields=['data_saida'], name='transacao_data_saida_idx',
+                condition=models.Q(data_saida__isnull=False),
+            ),
+            models.Index(
+                fields=['nf'], name='transacao_nf_idx',
+                condition=models.Q(nf__isnull=False),
+            ),
+            models.Index(
+                fields=['empresa', 'data_entrada'], name='transacao_pendentes_idx',
+                condition=models.Q(tipo='entrada', status='pendente'),
+            ),
+            GinIndex(fields=['busca'], name='transacao_busca_idx'),
+            # Gasto por emenda (api/emendas.py) lido só do índice
+            models.Index(
+                fields=['emenda', 'data_saida'], name='transacao_emenda_gastos_idx',
+                include=['valor'], condition=models.Q(tipo='saida', emenda__isnull=False),
+            ),
+            models.Index(fields=['atualizado_em', 'id'], name='transacao_atualizado_idx'),
+            # Índices de trigrama (nf, empresa.nome, empresa.cnpj) ficam fora do
+            # Meta: dependem da extensão pg_trgm (migração 0008)
+        ]
+
+    def __str__(self):
+        return f"{self.tipo.upper()} - {self.valor}"
+
+    def save(self, *args, **kwargs):
+        # Grava a nota e atualiza o saldo da empresa (signals) na mesma transação do banco
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+
+class TransacaoArquivo(models.Model):
+    """
+    Notas pagas de exercícios anteriores, movidas de api_transacao por
+    manage.py arquivar_transacoes (ver api/arquivo.py): mesmos ids e colunas,
+    somente leitura. Continuam no saldo e no resumo mensal; a listagem as
+    alcança pela visão TransacaoHistorico.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, related_name='transacoes_arquivadas')
+    tipo = models.CharField(max_length=10, choices=Transacao.TIPO_CHOICES)
+    status = models.CharField(max_length=10, choices=Transacao.STATUS_CHOICES)
+    nf = models.CharField(max_length=50, blank=True, null=True)
+    descricao = models.TextField(blank=True, null=True)
+    valor = models.DecimalField(max_digits=15, decimal_places=2)
+    data = models.DateField()
+    data_entrada = models.DateField()
+    data_saida = models.DateField(null=True, blank=True)
+    tipo_material = models.CharField(max_length=20, choices=Transacao.MATERIAL_CHOICES, blank=True, null=True)
+    destino_entrada = models.CharField(max_length=30, choices=Transacao.DESTINO_CHOICES, blank=True, null=True)
+    emenda = models.ForeignKey(
+        Emenda, on_delete=models.PROTECT, null=True, blank=True, related_name='transacoes_arquivadas',
+    )
+    busca = models.GeneratedField(
+        expression=(
+            SearchVector('nf', weight='A', config='portuguese')
+            + SearchVector('descricao', weight='B', config='portuguese')
+        ),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+    # Preservado da tabela ativa; só muda com o nome da empresa/emenda (sincronização)
+    atualizado_em = models.DateTimeField()
+    arquivado_em = models.DateTimeField(db_default=Now())
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['data_entrada', 'id'], name='transacao_arq_data_idx'),
+            models.Index(fields=['atualizado_em', 'id'], name='transacao_arq_atualizado_idx'),
+            models.Index(
+                fields=['emenda', 'data_saida'], name='transacao_arq_emenda_idx',
+                include=['valor'], condition=models.Q(tipo='saida', emenda__isnull=False),
+            ),
+            GinIndex(fields=['busca'], name='transacao_arq_busca_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.tipo.upper()} - {self.valor} (arquivada)"
+
+class TransacaoHistorico(models.Model):
+    """
+    Visão api_transacao_historico: notas ativas e arquivadas (UNION ALL), só
+    para leitura. Usada quando a consulta pode alcançar o arquivo (api.arquivo.transacoes).
+    Criada na migração 0015; uma coluna nova em Transacao precisa entrar nela também.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    empresa = models.ForeignKey(Empresa, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    tipo = models.CharField(max_length=10, choices=Transacao.TIPO_CHOICES)
+    status = models.CharField(max_length=10, choices=Transacao.STATUS_CHOICES)
+    nf = models.CharField(max_length=50, blank=True, null=True)
+    descricao = models.TextField(blank=True, null=True)
+    valor = models.DecimalField(max_digits=15, decimal_places=2)
+    data = models.DateField()
+    data_entrada = models.DateField()
+    data_saida = models.DateField(null=True)
+    tipo_material = models.CharField(max_length=20, choices=Transacao.MATERIAL_CHOICES, null=True)
+    destino_entrada = models.CharField(max_length=30, choices=Transacao.DESTINO_CHOICES, null=True)
+    emenda = models.ForeignKey(
+        Emenda, on_delete=models.DO_NOTHING, db_constraint=False, null=True, related_name='+',
+    )
+    busca = SearchVectorField()
+    atualizado_em = models.DateTimeField()
+    arquivada = models.BooleanField()
+
+    class Meta:
+        managed = False
+        db_table = 'api_transacao_historico'
 
     def __str__(self):
         return f"{self.tipo.upper()} - {self.valor}"
 
+class SaldoEmpresa(models.Model):
+    """
+    Saldo consolidado por empresa, mantido incrementalmente pelos signals de Transacao.
+    Pode ser reconstruído com: python manage.py recalcular_saldos
+    """
+    empresa = models.OneToOneField(Empresa, on_delete=models.CASCADE, primary_key=True, related_name='saldo')
+    total_entradas = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    total_saidas = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    qtd_pendentes = models.PositiveIntegerField(default=0)
+    valor_pendente = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    ultima_movimentacao = models.DateField(null=True, blank=True)
+    # Gravado explicitamente em api.saldos (UPDATE via queryset não aplica auto_now)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Saldo - {self.empresa_id}"
+
+class ResumoMensal(models.Model):
+    """
+    Totais pré-agregados das transações por mês (de data_entrada) e pelas
+    dimensões dos relatórios. Mantido incrementalmente pelos signals de Transacao;
+    pode ser reconstruído com: python manage.py recalcular_resumo_mensal
+    Dimensões sem valor (material/destino não informados) ficam como ''.
+    """
+    mes = models.DateField(help_text="Primeiro dia do mês")
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, related_name='resumos_mensais')
+    tipo = models.CharField(max_length=10, choices=Transacao.TIPO_CHOICES)
+    status = models.CharField(max_length=10, choices=Transacao.STATUS_CHOICES)
+    tipo_material = models.CharField(max_length=20, blank=True, default='')
+    destino_entrada = models.CharField(max_length=30, blank=True, default='')
+    valor_total = models.DecimalField(max_digits=17, decimal_places=2, default=0)
+    quantidade = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['mes', 'empresa', 'tipo', 'status', 'tipo_material', 'destino_entrada'],
+                name='resumo_mensal_chave',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.mes:%Y-%m} {self.empresa_id} {self.tipo}/{self.status}"
+
 class Notificacao(models.Model):
     TIPO_CHOICES = [
         ('aviso', '🔴 Aviso Crítico (Bloqueante)'),
@@ -79,6 +279,110 @@ class Notificacao(models.Model):
     alvo = models.CharField(max_length=20, choices=ALVO_CHOICES, default='todos')
     ativo = models.BooleanField(default=True)
     criado_em = models.DateTimeField(auto_now_add=True)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['alvo', '-criado_em'], name='notificacao_ativas_idx',
+                condition=models.Q(ativo=True),
+            ),
+            models.Index(fields=['atualizado_em', 'id'], name='notificacao_atualizado_idx'),
+        ]
+
+    def __str__(self):
+        return f"[{self.tipo.upper()}] {self.titulo}"
+
+class LeituraNotificacao(models.Model):
+    """
+    Confirmação de leitura de uma notificação por um usuário.
+    usuario_id não é FK: os usuários ficam sempre no banco 'default',
+    enquanto as notificações seguem o roteamento por usuário (.dev -> 'tests').
+    """
+    usuario_id = models.IntegerField()
+    notificacao = models.ForeignKey(Notificacao, on_delete=models.CASCADE, related_name='leituras')
+    lido_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['usuario_id', 'notificacao'], name='leitura_unica_por_usuario'),
+        ]
+
+    def __str__(self):
+        return f"{self.usuario_id} leu {self.notificacao_id}"
+
+class Tarefa(models.Model):
+    """
+    Relatório pesado (exportação, comparativo de vários anos) executado fora da
+    request, pelo pool de api.tarefas. Fica no banco do usuário que pediu
+    (segue o roteamento, como as demais tabelas); o resultado pronto fica num
+    arquivo em settings.TAREFAS_DIR até expirar (settings.TAREFAS_VALIDADE).
+    """
+    TIPO_CHOICES = [
+        ('exportacao', 'Exportação de transações'),
+        ('comparativo', 'Comparativo entre períodos'),
+    ]
+    STATUS_CHOICES = [
+        ('pendente', 'Pendente'),
+        ('executando', 'Executando'),
+        ('concluida', 'Concluída'),
+        ('erro', 'Erro'),
+    ]
+
+    usuario_id = models.IntegerField()
+    tipo = models.CharField(max_length=20, choices=TIPO_CHOICES)
+    parametros = models.JSONField(default=dict, blank=True)
+    # Hash de tipo + parâmetros + versões das tabelas lidas: pedidos iguais
+    # sobre os mesmos dados reaproveitam a tarefa
+    chave = models.CharField(max_length=64)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pendente')
+    erro = models.TextField(blank=True, default='')
+    # Caminho do resultado dentro de settings.TAREFAS_DIR (api.tarefas.armazenamento)
+    arquivo = models.CharField(max_length=255, blank=True, default='', editable=False)
+    content_type = models.CharField(max_length=100, blank=True, default='')
+    nome_arquivo = models.CharField(max_length=100, blank=True, default='')
+    criado_em = models.DateTimeField(auto_now_add=True)
+    iniciado_em = models.DateTimeField(null=True, blank=True)
+    concluido_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['usuario_id', 'chave'], name='tarefa_usuario_chave_idx'),
+            models.Index(
+                fields=['criado_em'], name='tarefa_pendentes_idx',
+                condition=models.Q(status='pendente'),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.tipo} #{self.pk} ({self.status})"
+
+class Exclusao(models.Model):
+    """
+    Registro de uma linha excluída (tombstone), para a sincronização incremental
+    avisar os clientes. Mantido por SINCRONIZACAO_RETENCAO_DIAS dias; limpeza com:
+    python manage.py limpar_exclusoes
+    """
+    tabela = models.CharField(max_length=50)
+    registro_id = models.BigIntegerField()
+    excluido_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['tabela', 'excluido_em'], name='exclusao_tabela_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.tabela} #{self.registro_id} excluído"
+
+class VersaoTabela(models.Model):
+    """
+    Marcador de alteração por tabela, usado como validador de cache HTTP (ETag / Last-Modified).
+    Cada banco ('default' e 'tests') tem os seus, pois a tabela segue o mesmo roteamento.
+    """
+    tabela = models.CharField(max_length=50, primary_key=True)
+    versao = models.BigIntegerField(default=0)
+    alterado_em = models.DateTimeField(auto_now=True)
 
     def __str__(self):
-        return f"[{self.tipo.upper()}] {self.titulo}"
\ No newline at end of file
+        return f"{self.tabela} v{self.versao}"
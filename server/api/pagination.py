@@ -0,0 +1,157 @@
+import base64
+from datetime import date
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginação por cursor (keyset) ordenada por (data_entrada, id), da mais recente
+    para a mais antiga. Cada página é buscada com "WHERE (data_entrada, id) < cursor",
+    então o custo depende apenas do tamanho da página, não da posição na lista.
+
+    É opcional: sem ?page_size nem ?cursor a view devolve a lista completa,
+    como o frontend sempre recebeu.
+    """
+
+    page_size = 50
+    max_page_size = 500
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    ordering = ('-data_entrada', '-id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.consulta_da_pagina(queryset, request)
+        if queryset is None:
+            return None
+        return self.definir_pagina(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """Versão para views assíncronas (ORM assíncrono)."""
+        queryset = self.consulta_da_pagina(queryset, request)
+        if queryset is None:
+            return None
+        return self.definir_pagina([obj async for obj in queryset])
+
+    def consulta_da_pagina(self, queryset, request):
+        params = request.query_params
+        if self.page_size_query_param not in params and self.cursor_query_param not in params:
+            return None
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+
+        cursor = params.get(self.cursor_query_param)
+        if cursor:
+            data_ref, id_ref = self.decode_cursor(cursor)
+            queryset = queryset.filter(
+                Q(data_entrada__lt=data_ref) | Q(data_entrada=data_ref, id__lt=id_ref)
+            )
+
+        # Busca um registro a mais só para saber se existe próxima página
+        return queryset[:self.page_size + 1]
+
+    def definir_pagina(self, rows):
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def encode_cursor(self, obj):
+        raw = f"{obj.data_entrada.isoformat()}:{obj.pk}"
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+            data_ref, id_ref = raw.split(':')
+            return date.fromisoformat(data_ref), int(id_ref)
+        except (ValueError, UnicodeDecodeError):
+            raise NotFound("Cursor inválido.")
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.page_size_query_param, self.page_size)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'page_size': self.page_size,
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'page_size': {'type': 'integer'},
+                'results': schema,
+            },
+        }
+
+
+class BuscaPagination(BasePagination):
+    """
+    Paginação da busca textual. A ordem é por relevância, que não serve de
+    cursor, então a página é numerada (?page=N). Como na KeysetPagination não há
+    COUNT: busca-se um registro a mais para saber se existe próxima página, e a
+    profundidade é limitada (max_page) para o OFFSET não crescer sem fim.
+    """
+
+    page_size = 20
+    max_page_size = 100
+    max_page = 50
+    page_size_query_param = 'page_size'
+    page_query_param = 'page'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        try:
+            self.numero = int(request.query_params.get(self.page_query_param, 1))
+        except ValueError:
+            raise NotFound("Página inválida.")
+        if not 1 <= self.numero <= self.max_page:
+            raise NotFound(f"Página inválida (de 1 a {self.max_page}).")
+
+        inicio = (self.numero - 1) * self.page_size
+        rows = list(queryset[inicio:inicio + self.page_size + 1])
+        self.has_next = len(rows) > self.page_size and self.numero < self.max_page
+        self.page = rows[:self.page_size]
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.page_size_query_param, self.page_size)
+        return replace_query_param(url, self.page_query_param, self.numero + 1)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'page_size': self.page_size,
+            'results': data,
+        })
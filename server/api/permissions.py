@@ -1,5 +1,16 @@
+import hmac
+
+from django.conf import settings
 from rest_framework import permissions
 
+PAPEIS = ('dev', 'gestor', 'view')
+
+def papel_do_usuario(user):
+    """Papel derivado do sufixo do username (joao.gestor -> 'gestor')."""
+    username = getattr(user, 'username', '') or ''
+    papel = username.rsplit('.', 1)[-1] if '.' in username else None
+    return papel if papel in PAPEIS else None
+
 class IsGestorOrDevOrReadOnly(permissions.BasePermission):
     """
     - .dev e .gestor: Podem tudo.
@@ -16,4 +27,22 @@ class IsGestorOrDevOrReadOnly(permissions.BasePermission):
         if username.endswith('.view'):
             return False 
         
-        return True 
\ No newline at end of file
+        return True 
+
+
+class PodeLerMetricas(permissions.BasePermission):
+    """
+    Dados operacionais (métricas, conexões): usuários .gestor e .dev, ou o
+    Prometheus com "Authorization: Metricas <token>" quando
+    settings.METRICAS_TOKEN está definido (o token JWT expira rápido demais
+    para ficar na configuração do scrape).
+    """
+    def has_permission(self, request, view):
+        token = settings.METRICAS_TOKEN
+        if token:
+            tipo, _, valor = request.META.get('HTTP_AUTHORIZATION', '').partition(' ')
+            if tipo == 'Metricas' and hmac.compare_digest(valor.encode(), token.encode()):
+                return True
+        if not request.user or not request.user.is_authenticated:
+            return False
+        return papel_do_usuario(request.user) in ('gestor', 'dev')
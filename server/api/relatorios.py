@@ -0,0 +1,162 @@
+import re
+from datetime import date
+from decimal import Decimal
+
+from django.db.models import DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncMonth, TruncQuarter
+from rest_framework import serializers
+
+from .resumo_mensal import Fonte
+
+AGRUPAMENTOS = {
+    'mes': TruncMonth,
+    'trimestre': TruncQuarter,
+}
+DIMENSOES = ('empresa', 'tipo_material', 'destino_entrada')
+METRICAS = ('entradas', 'saidas', 'quantidade')
+ZERO = Decimal('0.00')
+
+
+def _inicio_periodo(agrupamento, texto):
+    """'2024-03' (mês) ou '2024-T1' / '2024-Q1' (trimestre) -> primeiro dia do período."""
+    if agrupamento == 'mes':
+        m = re.fullmatch(r'(\d{4})-(\d{2})', texto)
+        if m and 1 <= int(m.group(2)) <= 12:
+            return date(int(m.group(1)), int(m.group(2)), 1)
+    else:
+        m = re.fullmatch(r'(\d{4})-[TtQq]([1-4])', texto)
+        if m:
+            return date(int(m.group(1)), (int(m.group(2)) - 1) * 3 + 1, 1)
+    formato = 'AAAA-MM' if agrupamento == 'mes' else 'AAAA-T1 a AAAA-T4'
+    raise serializers.ValidationError({'periodos': f"Período inválido: '{texto}'. Use {formato}."})
+
+
+def _proximo_periodo(agrupamento, inicio):
+    meses = 1 if agrupamento == 'mes' else 3
+    mes = inicio.month - 1 + meses
+    return date(inicio.year + mes // 12, mes % 12 + 1, 1)
+
+
+def _periodo_anterior(agrupamento, inicio):
+    meses = 1 if agrupamento == 'mes' else 3
+    mes = inicio.month - 1 - meses
+    return date(inicio.year + mes // 12, mes % 12 + 1, 1)
+
+
+def rotulo_periodo(agrupamento, inicio):
+    if agrupamento == 'mes':
+        return f"{inicio.year}-{inicio.month:02d}"
+    return f"{inicio.year}-T{(inicio.month - 1) // 3 + 1}"
+
+
+def ler_parametros(params):
+    agrupamento = params.get('agrupamento', 'mes')
+    if agrupamento not in AGRUPAMENTOS:
+        raise serializers.ValidationError({'agrupamento': f"Use: {', '.join(AGRUPAMENTOS)}."})
+
+    textos = [p.strip() for p in params.get('periodos', '').split(',') if p.strip()]
+    if textos:
+        periodos = sorted({_inicio_periodo(agrupamento, t) for t in textos})
+    else:
+        # Padrão: período atual comparado com o anterior
+        hoje = date.today()
+        atual = date(hoje.year, hoje.month if agrupamento == 'mes' else (hoje.month - 1) // 3 * 3 + 1, 1)
+        periodos = [_periodo_anterior(agrupamento, atual), atual]
+    if len(periodos) < 2:
+        raise serializers.ValidationError({'periodos': "Informe pelo menos dois períodos para comparar."})
+
+    dimensoes = [d.strip() for d in params.get('dimensoes', '').split(',') if d.strip()]
+    invalidas = set(dimensoes) - set(DIMENSOES)
+    if invalidas:
+        raise serializers.ValidationError({'dimensoes': f"Dimensões disponíveis: {', '.join(DIMENSOES)}."})
+    return agrupamento, periodos, dimensoes
+
+
+def _variacoes(rotulos, valores):
+    variacoes = []
+    for anterior, atual in zip(rotulos, rotulos[1:]):
+        item = {'de': anterior, 'para': atual}
+        for metrica in METRICAS:
+            a, b = valores[anterior][metrica], valores[atual][metrica]
+            item[metrica] = b - a
+            item[f'{metrica}_pct'] = round(float((b - a) / a * 100), 2) if a else None
+        variacoes.append(item)
+    return variacoes
+
+
+def _fonte(queryset):
+    return queryset if isinstance(queryset, Fonte) else Fonte(queryset, 'data_entrada', 'valor')
+
+
+def _consulta_comparativo(fonte, agrupamento, periodos, dimensoes):
+    data = fonte.campo_data
+    intervalos = Q()
+    for inicio in periodos:
+        intervalos |= Q(**{f'{data}__gte': inicio, f'{data}__lt': _proximo_periodo(agrupamento, inicio)})
+
+    zero = Value(ZERO, output_field=DecimalField(max_digits=15, decimal_places=2))
+    campos_grupo = list(dimensoes)
+    queryset = fonte.queryset.filter(intervalos).annotate(periodo=AGRUPAMENTOS[agrupamento](data))
+    if 'empresa' in dimensoes:
+        queryset = queryset.annotate(nome_empresa=F('empresa__nome'))
+        campos_grupo.append('nome_empresa')
+
+    linhas = (
+        queryset.values('periodo', *campos_grupo)
+        .annotate(
+            entradas=Coalesce(Sum(fonte.campo_valor, filter=Q(tipo='entrada')), zero),
+            saidas=Coalesce(Sum(fonte.campo_valor, filter=Q(tipo='saida')), zero),
+            quantidade=fonte.quantidade(),
+        )
+        .order_by()
+    )
+    return linhas, campos_grupo
+
+
+def _consolidar(linhas, campos_grupo, agrupamento, periodos, dimensoes):
+    rotulos = [rotulo_periodo(agrupamento, p) for p in periodos]
+    vazio = lambda: {r: {'entradas': ZERO, 'saidas': ZERO, 'quantidade': 0} for r in rotulos}
+    totais = vazio()
+    grupos = {}
+
+    for linha in linhas:
+        rotulo = rotulo_periodo(agrupamento, linha['periodo'])
+        # O resumo mensal guarda material/destino não informados como ''
+        linha.update({d: None for d in dimensoes if linha[d] == ''})
+        chave = tuple(linha[d] for d in dimensoes)
+        if chave not in grupos:
+            grupos[chave] = {'chave': {d: linha[d] for d in campos_grupo}, 'periodos': vazio()}
+        for metrica in METRICAS:
+            grupos[chave]['periodos'][rotulo][metrica] += linha[metrica]
+            totais[rotulo][metrica] += linha[metrica]
+
+    resultado = {
+        'agrupamento': agrupamento,
+        'periodos': rotulos,
+        'dimensoes': dimensoes,
+        'totais': {'periodos': totais, 'variacoes': _variacoes(rotulos, totais)},
+    }
+    if dimensoes:
+        resultado['grupos'] = [
+            {**g['chave'], 'periodos': g['periodos'], 'variacoes': _variacoes(rotulos, g['periodos'])}
+            for g in grupos.values()
+        ]
+    return resultado
+
+
+def comparar_periodos(queryset, agrupamento, periodos, dimensoes):
+    """
+    Totais de entradas, saídas e quantidade por período (e pelas dimensões pedidas),
+    agrupados no banco com TruncMonth/TruncQuarter sobre data_entrada,
+    mais a variação entre cada período e o anterior.
+    queryset: transações, ou uma Fonte (ver api.resumo_mensal.fonte).
+    """
+    linhas, campos_grupo = _consulta_comparativo(_fonte(queryset), agrupamento, periodos, dimensoes)
+    return _consolidar(linhas, campos_grupo, agrupamento, periodos, dimensoes)
+
+
+async def acomparar_periodos(queryset, agrupamento, periodos, dimensoes):
+    """comparar_periodos com o ORM assíncrono, para views async."""
+    linhas, campos_grupo = _consulta_comparativo(_fonte(queryset), agrupamento, periodos, dimensoes)
+    linhas = [linha async for linha in linhas]
+    return _consolidar(linhas, campos_grupo, agrupamento, periodos, dimensoes)
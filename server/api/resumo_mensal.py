@@ -0,0 +1,157 @@
+from calendar import monthrange
+from datetime import date
+from decimal import Decimal
+from typing import NamedTuple
+
+from django.db import connections, transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce, TruncMonth
+
+from . import versoes
+from .filters import FILTROS_TRANSACAO, filtrar_transacoes, ler_data
+from .models import ResumoMensal, TransacaoHistorico
+
+# Campos da transação que definem a linha do resumo (e o valor somado nela)
+CAMPOS_RESUMO = ('empresa_id', 'tipo', 'status', 'tipo_material', 'destino_entrada', 'data_entrada', 'valor')
+CHAVE = ('mes', 'empresa_id', 'tipo', 'status', 'tipo_material', 'destino_entrada')
+# Filtros da listagem que o resumo atende direto (são colunas dele)
+FILTROS_ATENDIDOS = ('tipo', 'status', 'tipo_material', 'destino_entrada', 'empresa')
+
+
+def _mes(data):
+    return date(data.year, data.month, 1)
+
+
+def _ultimo_dia(data):
+    return date(data.year, data.month, monthrange(data.year, data.month)[1])
+
+
+def contribuir(deltas, dados, sinal=1):
+    """Soma (sinal=1) ou retira (sinal=-1) uma transação dos deltas {chave: [valor, quantidade]}."""
+    chave = (
+        _mes(dados['data_entrada']), dados['empresa_id'], dados['tipo'], dados['status'],
+        dados['tipo_material'] or '', dados['destino_entrada'] or '',
+    )
+    delta = deltas.setdefault(chave, [Decimal('0.00'), 0])
+    delta[0] += sinal * Decimal(dados['valor'] or 0)
+    delta[1] += sinal
+
+
+def aplicar(deltas, using):
+    """
+    Aplica os deltas com um único INSERT ... ON CONFLICT DO UPDATE (soma no que
+    já existe). Chamar na mesma transação da escrita em api_transacao.
+    """
+    deltas = {chave: d for chave, d in deltas.items() if d[0] or d[1]}
+    if not deltas:
+        return
+    tabela = ResumoMensal._meta.db_table
+    colunas = CHAVE + ('valor_total', 'quantidade')
+    conexao = connections[using]
+    q = conexao.ops.quote_name
+    # Ordem fixa das chaves: escritas simultâneas travam as linhas na mesma ordem
+    linhas = sorted(deltas.items())
+    sql = (
+        f"INSERT INTO {q(tabela)} ({', '.join(q(c) for c in colunas)}) "
+        f"VALUES {', '.join(['(' + ', '.join(['%s'] * len(colunas)) + ')'] * len(linhas))} "
+        f"ON CONFLICT ({', '.join(q(c) for c in CHAVE)}) DO UPDATE SET "
+        f"valor_total = {q(tabela)}.valor_total + EXCLUDED.valor_total, "
+        f"quantidade = {q(tabela)}.quantidade + EXCLUDED.quantidade"
+    )
+    parametros = [valor for chave, (total, qtd) in linhas for valor in (*chave, total, qtd)]
+    with conexao.cursor() as cursor:
+        cursor.execute(sql, parametros)
+
+
+def aplicar_lote(transacoes, using):
+    """Soma no resumo um lote de transações novas inseridas com bulk_create (sem signals)."""
+    deltas = {}
+    for t in transacoes:
+        contribuir(deltas, {campo: getattr(t, campo) for campo in CAMPOS_RESUMO})
+    aplicar(deltas, using)
+
+
+def recalcular(using='default', inicio=None, fim=None):
+    """
+    Reconstrói o resumo a partir das transações (ativas e arquivadas), para os
+    meses de `inicio` a `fim` (datas; sem elas, todos). Retorna quantas linhas
+    estavam divergentes.
+    """
+    transacoes = TransacaoHistorico.objects.using(using).order_by()
+    resumos = ResumoMensal.objects.using(using)
+    if inicio:
+        transacoes = transacoes.filter(data_entrada__gte=_mes(inicio))
+        resumos = resumos.filter(mes__gte=_mes(inicio))
+    if fim:
+        transacoes = transacoes.filter(data_entrada__lte=_ultimo_dia(fim))
+        resumos = resumos.filter(mes__lte=_mes(fim))
+
+    with transaction.atomic(using=using):
+        # Escritas simultâneas esperam a reconstrução terminar, em vez de
+        # somar em linhas que estão sendo apagadas. As notas são lidas só
+        # depois da trava: as escritas que a precederam já fizeram commit
+        # (cada comando vê o que foi confirmado até ele, em READ COMMITTED)
+        # e nenhuma outra entra até o fim
+        with connections[using].cursor() as cursor:
+            cursor.execute(f"LOCK TABLE {ResumoMensal._meta.db_table} IN EXCLUSIVE MODE")
+        novos = {
+            (linha['mes'], linha['empresa_id'], linha['tipo'], linha['status'],
+             linha['tipo_material'] or '', linha['destino_entrada'] or ''): (linha['valor_total'], linha['quantidade'])
+            for linha in transacoes.values(
+                'empresa_id', 'tipo', 'status', 'tipo_material', 'destino_entrada', mes=TruncMonth('data_entrada'),
+            ).annotate(valor_total=Sum('valor'), quantidade=Count('id'))
+        }
+        atuais = {
+            tuple(linha[c] for c in CHAVE): (linha['valor_total'], linha['quantidade'])
+            for linha in resumos.values(*CHAVE, 'valor_total', 'quantidade')
+            # Linhas zeradas (todas as notas saíram dela) equivalem a não existir
+            if linha['quantidade'] or linha['valor_total']
+        }
+        divergentes = sum(1 for chave in novos.keys() | atuais.keys() if novos.get(chave) != atuais.get(chave))
+        if divergentes:
+            resumos.delete()
+            ResumoMensal.objects.using(using).bulk_create([
+                ResumoMensal(**dict(zip(CHAVE, chave)), valor_total=total, quantidade=qtd)
+                for chave, (total, qtd) in novos.items()
+            ], batch_size=1000)
+            versoes.marcar_alteracao(using, 'transacao')
+    return divergentes
+
+
+class Fonte(NamedTuple):
+    """De onde um relatório lê: as transações ou o resumo mensal."""
+    queryset: object
+    campo_data: str
+    campo_valor: str
+
+    def quantidade(self, **filtro):
+        if self.queryset.model is ResumoMensal:
+            return Coalesce(Sum('quantidade', **filtro), 0)
+        return Count('id', **filtro)
+
+
+def fonte(queryset, params):
+    """
+    Fonte para os relatórios agregados (resumo do Dashboard, comparativo).
+    O resumo mensal é usado quando os filtros pedidos são colunas dele e o
+    intervalo de data_entrada, se houver, cobre meses inteiros; senão, as
+    próprias transações (queryset, já filtrado).
+    """
+    usados = {f for f in FILTROS_TRANSACAO if params.get(f)}
+    data_inicio = ler_data(params['data_inicio'], 'data_inicio') if 'data_inicio' in usados else None
+    data_fim = ler_data(params['data_fim'], 'data_fim') if 'data_fim' in usados else None
+    atende = (
+        usados <= set(FILTROS_ATENDIDOS) | {'data_inicio', 'data_fim'}
+        and (data_inicio is None or data_inicio.day == 1)
+        and (data_fim is None or data_fim == _ultimo_dia(data_fim))
+    )
+    if not atende:
+        return Fonte(queryset, 'data_entrada', 'valor')
+
+    resumos = ResumoMensal.objects.using(queryset.db)
+    resumos = filtrar_transacoes(resumos, {f: params[f] for f in FILTROS_ATENDIDOS if f in usados})
+    if data_inicio:
+        resumos = resumos.filter(mes__gte=data_inicio)
+    if data_fim:
+        resumos = resumos.filter(mes__lte=_mes(data_fim))
+    return Fonte(resumos, 'mes', 'valor_total')
@@ -0,0 +1,149 @@
+from decimal import Decimal
+
+from django.db import IntegrityError, connections, transaction
+from django.db.models import Count, DecimalField, F, Max, Q, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from . import cache_empresas, versoes
+from .models import Empresa, SaldoEmpresa, TransacaoHistorico
+
+ZERO = Decimal('0.00')
+CAMPOS_SALDO = ('total_entradas', 'total_saidas', 'qtd_pendentes', 'valor_pendente')
+
+
+def contribuicao(tipo, status, valor):
+    """Quanto uma transação soma em cada coluna do saldo da empresa."""
+    valor = Decimal(valor or 0)
+    pendente = tipo == 'entrada' and status == 'pendente'
+    return {
+        'total_entradas': valor if tipo == 'entrada' else ZERO,
+        'total_saidas': valor if tipo == 'saida' else ZERO,
+        'qtd_pendentes': 1 if pendente else 0,
+        'valor_pendente': valor if pendente else ZERO,
+    }
+
+
+def data_movimentacao(data_entrada, data_saida):
+    datas = [d for d in (data_entrada, data_saida) if d]
+    return max(datas) if datas else None
+
+
+def diferenca(nova, anterior):
+    return {campo: nova[campo] - anterior[campo] for campo in CAMPOS_SALDO}
+
+
+def negativo(contrib):
+    return {campo: -contrib[campo] for campo in CAMPOS_SALDO}
+
+
+def aplicar(empresa_id, delta, using, data_nova=None, data_removida=None):
+    """
+    Aplica a diferença no saldo da empresa com UPDATE ... SET col = col + delta,
+    sem reler a tabela de transações. data_removida indica que um movimento nessa
+    data deixou de existir; só se ele era o mais recente a última data é recalculada.
+    """
+    saldos = SaldoEmpresa.objects.using(using).filter(pk=empresa_id)
+
+    agora = timezone.now()
+    updates = {campo: F(campo) + delta[campo] for campo in CAMPOS_SALDO}
+    updates['atualizado_em'] = agora
+    if data_nova:
+        updates['ultima_movimentacao'] = Greatest(F('ultima_movimentacao'), Value(data_nova))
+
+    # Primeira movimentação da empresa: a linha de saldo ainda não existe
+    if not saldos.update(**updates) and data_nova:
+        try:
+            with transaction.atomic(using=using):
+                SaldoEmpresa.objects.using(using).create(
+                    empresa_id=empresa_id, ultima_movimentacao=data_nova, **delta
+                )
+        except IntegrityError:
+            saldos.update(**updates)
+
+    if data_removida and saldos.filter(ultima_movimentacao__lte=data_removida).exists():
+        saldos.update(ultima_movimentacao=ultima_movimentacao(empresa_id, using), atualizado_em=agora)
+
+
+def aplicar_lote(transacoes, using):
+    """
+    Soma no saldo um lote de transações novas inseridas com bulk_create
+    (que não dispara signals): um UPDATE por empresa, não por linha.
+    """
+    por_empresa = {}
+    for t in transacoes:
+        contrib = contribuicao(t.tipo, t.status, t.valor)
+        data = data_movimentacao(t.data_entrada, t.data_saida)
+        if t.empresa_id in por_empresa:
+            soma, data_max = por_empresa[t.empresa_id]
+            contrib = {c: soma[c] + contrib[c] for c in CAMPOS_SALDO}
+            data = data_movimentacao(data_max, data)
+        por_empresa[t.empresa_id] = (contrib, data)
+
+    for empresa_id, (delta, data) in por_empresa.items():
+        aplicar(empresa_id, delta, using, data_nova=data)
+
+
+def ultima_movimentacao(empresa_id, using):
+    # Inclui as notas arquivadas (api.arquivo): continuam no saldo
+    datas = TransacaoHistorico.objects.using(using).filter(empresa_id=empresa_id).aggregate(
+        entrada=Max('data_entrada'), saida=Max('data_saida'),
+    )
+    return data_movimentacao(datas['entrada'], datas['saida'])
+
+
+def recalcular_saldos(using='default'):
+    """
+    Reconstrói toda a tabela de saldos a partir das transações (ativas e
+    arquivadas). Retorna quantas empresas estavam com o saldo divergente.
+    """
+    zero = Value(ZERO, output_field=DecimalField(max_digits=15, decimal_places=2))
+    entrada = Q(tipo='entrada')
+    saida = Q(tipo='saida')
+    pendente = Q(tipo='entrada', status='pendente')
+
+    campos = CAMPOS_SALDO + ('ultima_movimentacao',)
+    vazio = (ZERO, ZERO, 0, ZERO, None)
+    sem_notas = dict(zip(CAMPOS_SALDO, vazio), max_entrada=None, max_saida=None)
+
+    with transaction.atomic(using=using):
+        # Escritas simultâneas (saldos.aplicar) esperam a reconstrução terminar.
+        # As notas são somadas só depois da trava: as que a precederam já fizeram
+        # commit e nenhuma outra muda o saldo até o fim, então nada se perde no
+        # delete + bulk_create (select_for_update só travaria as linhas existentes)
+        with connections[using].cursor() as cursor:
+            cursor.execute(f"LOCK TABLE {SaldoEmpresa._meta.db_table} IN EXCLUSIVE MODE")
+        totais = {
+            linha['empresa_id']: linha
+            for linha in TransacaoHistorico.objects.using(using).order_by().values('empresa_id').annotate(
+                total_entradas=Coalesce(Sum('valor', filter=entrada), zero),
+                total_saidas=Coalesce(Sum('valor', filter=saida), zero),
+                qtd_pendentes=Count('id', filter=pendente),
+                valor_pendente=Coalesce(Sum('valor', filter=pendente), zero),
+                max_entrada=Max('data_entrada'),
+                max_saida=Max('data_saida'),
+            )
+        }
+        atuais = {
+            s.pk: tuple(getattr(s, c) for c in campos)
+            for s in SaldoEmpresa.objects.using(using)
+        }
+        novos = []
+        for pk in Empresa.objects.using(using).values_list('pk', flat=True):
+            t = totais.get(pk, sem_notas)
+            novos.append(SaldoEmpresa(
+                empresa_id=pk,
+                **{campo: t[campo] for campo in CAMPOS_SALDO},
+                ultima_movimentacao=data_movimentacao(t['max_entrada'], t['max_saida']),
+            ))
+        divergentes = sum(
+            1 for s in novos
+            if atuais.get(s.pk, vazio) != tuple(getattr(s, c) for c in campos)
+        )
+        SaldoEmpresa.objects.using(using).all().delete()
+        SaldoEmpresa.objects.using(using).bulk_create(novos, batch_size=1000)
+        if divergentes:
+            versoes.marcar_alteracao(using, 'transacao')
+            cache_empresas.invalidar(using, [s.pk for s in novos])
+
+    return divergentes
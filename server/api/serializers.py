@@ -1,45 +1,187 @@
 from rest_framework import serializers
-from .models import Empresa, Transacao, Notificacao
+from .models import Emenda, Empresa, Transacao, Notificacao, SaldoEmpresa, Tarefa
+from .emendas import normalizar_nome, obter_ou_criar
+from .tarefas import expira_em
 from django.contrib.auth.models import User
+from django.db import router, transaction
 from datetime import date
 
-class EmpresaSerializer(serializers.ModelSerializer):
+def validar_datas(entrada, saida):
+    hoje = date.today()
+
+    if entrada and entrada > hoje:
+        raise serializers.ValidationError({"data_entrada": "A data de entrada não pode ser futura."})
+
+    if saida and saida > hoje:
+        raise serializers.ValidationError({"data_saida": "A data de baixa não pode ser futura."})
+
+    if saida and entrada and saida < entrada:
+         raise serializers.ValidationError({
+             "data_saida": f"Erro Cronológico: A baixa ({saida}) não pode ocorrer antes da entrada da nota ({entrada})."
+         })
+
+class EmendaPorNomeField(serializers.RelatedField):
+    """
+    Emenda lida e gravada pelo nome, como o frontend sempre enviou (texto livre).
+    Um nome ainda não cadastrado vira uma Emenda sem salvar, criada só na
+    gravação (EmendasPorNomeMixin): a validação não escreve no banco.
+    """
+    default_error_messages = {'invalid': "Informe o nome da emenda."}
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('queryset', Emenda.objects.all())
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return value.nome
+
+    def to_internal_value(self, data):
+        nome = normalizar_nome(data)
+        if not nome:
+            if self.allow_null:
+                return None
+            self.fail('invalid')
+        emenda = self.get_queryset().using(router.db_for_write(Emenda)).filter(nome=nome).first()
+        return emenda or Emenda(nome=nome)
+
+class EmendasPorNomeMixin:
+    """
+    Cria as emendas novas dos EmendaPorNomeField na mesma transação do
+    create/update: se a gravação falhar, nenhuma emenda fica para trás.
+    """
+
+    def _gravar_emendas(self, validated_data, using):
+        campos = [
+            campo.source for campo in self.fields.values()
+            if not campo.read_only and isinstance(getattr(campo, 'child_relation', campo), EmendaPorNomeField)
+        ]
+        novas = set()
+        for fonte in campos:
+            valor = validated_data.get(fonte)
+            for emenda in valor if isinstance(valor, list) else [valor]:
+                if emenda is not None and emenda.pk is None:
+                    novas.add(emenda.nome)
+        if not novas:
+            return
+        por_nome = obter_ou_criar(novas, using)
+        for fonte in campos:
+            valor = validated_data.get(fonte)
+            if isinstance(valor, list):
+                validated_data[fonte] = [por_nome.get(e.nome, e) for e in valor]
+            elif valor is not None:
+                validated_data[fonte] = por_nome.get(valor.nome, valor)
+
+    def create(self, validated_data):
+        using = router.db_for_write(self.Meta.model)
+        with transaction.atomic(using=using):
+            self._gravar_emendas(validated_data, using)
+            return super().create(validated_data)
+
+    def update(self, instance, validated_data):
+        using = instance._state.db or router.db_for_write(self.Meta.model)
+        with transaction.atomic(using=using):
+            self._gravar_emendas(validated_data, using)
+            return super().update(instance, validated_data)
+
+class EmendaSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Emenda
+        fields = '__all__'
+
+    def to_internal_value(self, data):
+        # Normaliza antes do UniqueValidator: "Emenda  X" tem que colidir com "Emenda X"
+        # na validação (400), não só na constraint do banco
+        if hasattr(data, 'get') and isinstance(data.get('nome'), str):
+            data = data.copy()
+            data['nome'] = normalizar_nome(data['nome'])
+        return super().to_internal_value(data)
+
+class SaldoEmpresaSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SaldoEmpresa
+        exclude = ['empresa']
+
+class EmpresaSerializer(EmendasPorNomeMixin, serializers.ModelSerializer):
+    saldo = serializers.SerializerMethodField()
+    emendas = EmendaPorNomeField(many=True, required=False)
+
     class Meta:
         model = Empresa
         fields = '__all__'
 
-class TransacaoSerializer(serializers.ModelSerializer):
+    def get_saldo(self, obj):
+        try:
+            return SaldoEmpresaSerializer(obj.saldo).data
+        except SaldoEmpresa.DoesNotExist:
+            return SaldoEmpresaSerializer(SaldoEmpresa()).data
+
+class TransacaoSerializer(EmendasPorNomeMixin, serializers.ModelSerializer):
     nome_empresa = serializers.ReadOnlyField(source='empresa.nome')
+    emenda_origem = EmendaPorNomeField(source='emenda', required=False, allow_null=True)
+    # Notas arquivadas (api.arquivo) vêm nas leituras, mas são somente leitura
+    arquivada = serializers.SerializerMethodField()
     
     class Meta:
         model = Transacao
-        fields = '__all__'
+        # 'busca' é o vetor interno da busca textual
+        exclude = ['busca']
+        # A emenda é gravada pelo nome (emenda_origem); o id fica só para leitura
+        extra_kwargs = {'emenda': {'read_only': True}}
 
     def validate(self, data):
         """
         Validações de segurança para garantir integridade das datas
         """
-        hoje = date.today()
-        
         entrada = data.get('data_entrada')
         saida = data.get('data_saida')
 
         if self.instance and not entrada:
             entrada = self.instance.data_entrada
 
-        if entrada and entrada > hoje:
-            raise serializers.ValidationError({"data_entrada": "A data de entrada não pode ser futura."})
+        validar_datas(entrada, saida)
+        return data
+
+    def get_arquivada(self, obj):
+        return getattr(obj, 'arquivada', False)
 
-        if saida and saida > hoje:
-            raise serializers.ValidationError({"data_saida": "A data de baixa não pode ser futura."})
+class ImportacaoTransacaoSerializer(serializers.ModelSerializer):
+    """
+    Uma linha da importação em lote. A empresa é informada pelo CNPJ e
+    resolvida pela importação (uma única consulta para o arquivo todo).
+    """
+    cnpj = serializers.CharField(max_length=20)
+    tipo = serializers.ChoiceField(choices=Transacao.TIPO_CHOICES, default='entrada')
+    data_entrada = serializers.DateField(input_formats=['iso-8601', '%d/%m/%Y'], required=False)
+    data_saida = serializers.DateField(input_formats=['iso-8601', '%d/%m/%Y'], required=False, allow_null=True)
+    # Resolvida para Emenda pela importação, uma vez por lote
+    emenda_origem = serializers.CharField(max_length=255, required=False, allow_blank=True)
 
-        if saida and entrada and saida < entrada:
-             raise serializers.ValidationError({
-                 "data_saida": f"Erro Cronológico: A baixa ({saida}) não pode ocorrer antes da entrada da nota ({entrada})."
-             })
+    class Meta:
+        model = Transacao
+        fields = [
+            'cnpj', 'tipo', 'status', 'nf', 'descricao', 'valor', 'data_entrada',
+            'data_saida', 'tipo_material', 'destino_entrada', 'emenda_origem',
+        ]
 
+    def validate(self, data):
+        validar_datas(data.get('data_entrada'), data.get('data_saida'))
         return data
 
+class BaixaSerializer(serializers.Serializer):
+    """
+    Dados da baixa (pagamento) de uma nota de entrada.
+    O valor padrão é o valor da própria nota.
+    """
+    data_saida = serializers.DateField()
+    descricao = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    emenda_origem = serializers.CharField(max_length=255, required=False, allow_blank=True, allow_null=True)
+    valor = serializers.DecimalField(max_digits=15, decimal_places=2, required=False, min_value=0)
+
+    def validate_data_saida(self, value):
+        if value > date.today():
+            raise serializers.ValidationError("A data de baixa não pode ser futura.")
+        return value
+
 class NotificacaoSerializer(serializers.ModelSerializer):
 
     criado_em = serializers.DateTimeField(format="%Y-%m-%d %H:%M:%S", read_only=True)
@@ -48,6 +190,35 @@ class NotificacaoSerializer(serializers.ModelSerializer):
         model = Notificacao
         fields = '__all__'
 
+class MarcarLidasSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False, max_length=500)
+    todas = serializers.BooleanField(default=False)
+
+    def validate(self, data):
+        if not data.get('ids') and not data['todas']:
+            raise serializers.ValidationError("Informe 'ids' ou 'todas': true.")
+        return data
+
+class TarefaSerializer(serializers.ModelSerializer):
+    expira_em = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Tarefa
+        fields = [
+            'id', 'tipo', 'parametros', 'status', 'erro', 'nome_arquivo',
+            'criado_em', 'iniciado_em', 'concluido_em', 'expira_em',
+        ]
+        read_only_fields = ['status', 'erro', 'nome_arquivo', 'criado_em', 'iniciado_em', 'concluido_em']
+
+    def get_expira_em(self, obj):
+        return expira_em(obj)
+
+    def validate_parametros(self, value):
+        # Os mesmos parâmetros da query string dos relatórios: texto simples
+        if not isinstance(value, dict) or any(isinstance(v, (dict, list)) for v in value.values()):
+            raise serializers.ValidationError("Informe um objeto com os parâmetros do relatório.")
+        return {chave: str(valor) for chave, valor in value.items() if valor is not None}
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
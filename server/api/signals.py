@@ -0,0 +1,214 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import cache_empresas, eventos, resumo_mensal, saldos, versoes
+from .exceptions import Conflito
+from .models import Emenda, Empresa, Exclusao, LeituraNotificacao, Notificacao, Transacao, TransacaoArquivo
+
+CAMPOS_RASTREADOS = (
+    'empresa_id', 'tipo', 'status', 'valor', 'data_entrada', 'data_saida', 'tipo_material', 'destino_entrada',
+)
+# O estado anterior também serve para enviar nos eventos só os campos alterados
+CAMPOS_ESTADO = tuple(dict.fromkeys(CAMPOS_RASTREADOS + eventos.CAMPOS_EVENTO['transacao']))
+
+
+@receiver(pre_save, sender=Transacao)
+def guardar_estado_anterior(sender, instance, raw, using, **kwargs):
+    """Guarda como a nota estava no banco para calcular só a diferença no post_save."""
+    instance._estado_anterior = None
+    if raw or instance.pk is None:
+        return
+    instance._estado_anterior = (
+        sender.objects.using(using).select_for_update()
+        .filter(pk=instance.pk).values(*CAMPOS_ESTADO).first()
+    )
+    # Arquivada depois de lida: gravar a recriaria na tabela ativa, somando de novo no saldo
+    if (instance._estado_anterior is None and not instance._state.adding
+            and TransacaoArquivo.objects.using(using).filter(pk=instance.pk).exists()):
+        raise Conflito("Esta nota pertence a um exercício arquivado e não pode ser alterada.")
+
+
+@receiver(pre_save, sender=Empresa)
+@receiver(pre_save, sender=Notificacao)
+def guardar_campos_anteriores(sender, instance, raw, using, **kwargs):
+    """Campos publicados nos eventos como estavam no banco, para enviar só os alterados."""
+    instance._estado_anterior = None
+    if raw or instance.pk is None:
+        return
+    instance._estado_anterior = (
+        sender.objects.using(using).filter(pk=instance.pk)
+        .values(*eventos.CAMPOS_EVENTO[sender._meta.model_name]).first()
+    )
+
+
+@receiver(post_save, sender=Transacao)
+def atualizar_saldo_ao_salvar(sender, instance, created, raw, using, **kwargs):
+    if raw:
+        return
+    nova = saldos.contribuicao(instance.tipo, instance.status, instance.valor)
+    data_nova = saldos.data_movimentacao(instance.data_entrada, instance.data_saida)
+
+    anterior = getattr(instance, '_estado_anterior', None)
+    if anterior is None:
+        saldos.aplicar(instance.empresa_id, nova, using, data_nova=data_nova)
+        return
+    if all(anterior[c] == getattr(instance, c) for c in CAMPOS_RASTREADOS):
+        return
+
+    antiga = saldos.contribuicao(anterior['tipo'], anterior['status'], anterior['valor'])
+    data_antiga = saldos.data_movimentacao(anterior['data_entrada'], anterior['data_saida'])
+
+    if anterior['empresa_id'] == instance.empresa_id:
+        removida = data_antiga if data_antiga and (not data_nova or data_antiga > data_nova) else None
+        saldos.aplicar(
+            instance.empresa_id, saldos.diferenca(nova, antiga), using,
+            data_nova=data_nova, data_removida=removida,
+        )
+    else:
+        saldos.aplicar(anterior['empresa_id'], saldos.negativo(antiga), using, data_removida=data_antiga)
+        saldos.aplicar(instance.empresa_id, nova, using, data_nova=data_nova)
+
+
+@receiver(post_save, sender=Transacao)
+def atualizar_resumo_ao_salvar(sender, instance, created, raw, using, **kwargs):
+    if raw:
+        return
+    anterior = getattr(instance, '_estado_anterior', None)
+    deltas = {}
+    if anterior is not None:
+        if all(anterior[c] == getattr(instance, c) for c in CAMPOS_RASTREADOS):
+            return
+        resumo_mensal.contribuir(deltas, anterior, -1)
+    resumo_mensal.contribuir(deltas, {c: getattr(instance, c) for c in resumo_mensal.CAMPOS_RESUMO})
+    resumo_mensal.aplicar(deltas, using)
+
+
+@receiver(post_delete, sender=Transacao)
+def atualizar_saldo_ao_excluir(sender, instance, using, origin=None, **kwargs):
+    # Exclusão em cascata da própria empresa: o saldo dela também está sendo apagado
+    if getattr(origin, 'model', type(origin)) is Empresa:
+        return
+    saldos.aplicar(
+        instance.empresa_id,
+        saldos.negativo(saldos.contribuicao(instance.tipo, instance.status, instance.valor)),
+        using,
+        data_removida=saldos.data_movimentacao(instance.data_entrada, instance.data_saida),
+    )
+
+
+@receiver(post_delete, sender=Transacao)
+def atualizar_resumo_ao_excluir(sender, instance, using, origin=None, **kwargs):
+    # Exclusão em cascata da empresa: as linhas dela no resumo também são apagadas
+    if getattr(origin, 'model', type(origin)) is Empresa:
+        return
+    deltas = {}
+    resumo_mensal.contribuir(deltas, {c: getattr(instance, c) for c in resumo_mensal.CAMPOS_RESUMO}, -1)
+    resumo_mensal.aplicar(deltas, using)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def marcar_tabela_alterada(sender, using, **kwargs):
+    """Avança o marcador usado nos ETags das listagens (api.condicional)."""
+    if sender in (Emenda, Empresa, Transacao, Notificacao, LeituraNotificacao):
+        versoes.marcar_alteracao(using, sender._meta.model_name)
+
+
+@receiver(post_save, sender=Empresa)
+@receiver(post_delete, sender=Empresa)
+def invalidar_cache_empresa(sender, instance, using, **kwargs):
+    cache_empresas.invalidar(using, [instance.pk])
+
+
+@receiver(m2m_changed, sender=Empresa.emendas.through)
+def emendas_da_empresa_alteradas(sender, instance, action, reverse, pk_set, using, **kwargs):
+    # O serializer grava as emendas depois do save() da empresa: avança o
+    # marcador e limpa o cache de novo, agora com os vínculos já gravados
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    ids = (pk_set or ()) if reverse else [instance.pk]
+    versoes.marcar_alteracao(using, 'empresa')
+    cache_empresas.invalidar(using, ids)
+    Empresa.objects.using(using).filter(pk__in=ids).update(atualizado_em=timezone.now())
+
+
+@receiver(pre_save, sender=Emenda)
+def guardar_nome_anterior(sender, instance, raw, using, **kwargs):
+    instance._nome_anterior = None
+    if raw or instance.pk is None:
+        return
+    instance._nome_anterior = sender.objects.using(using).filter(pk=instance.pk).values_list('nome', flat=True).first()
+
+
+@receiver(post_save, sender=Emenda)
+@receiver(pre_delete, sender=Emenda)
+def invalidar_cache_emenda(sender, instance, using, **kwargs):
+    # As empresas mostram as emendas pelo nome
+    if kwargs.get('created'):
+        return
+    empresas = instance.empresas.using(using)
+    cache_empresas.invalidar(using, empresas.values_list('pk', flat=True))
+    # Exclusão (some da lista) ou novo nome: as empresas e as notas mudam para o cliente
+    if 'created' in kwargs and getattr(instance, '_nome_anterior', None) == instance.nome:
+        return
+    agora = timezone.now()
+    Empresa.objects.using(using).filter(emendas=instance).update(atualizado_em=agora)
+    if 'created' in kwargs:
+        for modelo in (Transacao, TransacaoArquivo):
+            modelo.objects.using(using).filter(emenda=instance).update(atualizado_em=agora)
+
+
+@receiver(post_save, sender=Transacao)
+@receiver(post_delete, sender=Transacao)
+def invalidar_cache_saldo(sender, instance, using, **kwargs):
+    # O saldo inline da empresa (e da anterior, se a nota mudou de empresa) ficou diferente
+    anterior = getattr(instance, '_estado_anterior', None) or {}
+    cache_empresas.invalidar(using, {instance.empresa_id, anterior.get('empresa_id')})
+
+
+@receiver(post_save, sender=Empresa)
+def atualizar_transacoes_da_empresa(sender, instance, created, raw, using, **kwargs):
+    # O nome da empresa aparece em cada nota (nome_empresa): elas também mudaram
+    anterior = getattr(instance, '_estado_anterior', None)
+    if raw or created or anterior is None or anterior['nome'] == instance.nome:
+        return
+    agora = timezone.now()
+    for modelo in (Transacao, TransacaoArquivo):
+        modelo.objects.using(using).filter(empresa=instance).update(atualizado_em=agora)
+
+
+@receiver(post_delete)
+def registrar_exclusao(sender, instance, using, **kwargs):
+    """Tombstone para a sincronização incremental (api.sincronizacao)."""
+    if sender is TransacaoArquivo:
+        # Exclusão em cascata da empresa: a nota arquivada também é sincronizada em /transacoes/
+        Exclusao.objects.using(using).create(tabela='transacao', registro_id=instance.pk)
+    elif sender in (Empresa, Transacao, Notificacao):
+        Exclusao.objects.using(using).create(tabela=sender._meta.model_name, registro_id=instance.pk)
+
+
+@receiver(post_save)
+def publicar_alteracao(sender, instance, created, raw, using, **kwargs):
+    """Evento do fluxo SSE (api.eventos), entregue no commit."""
+    if raw or sender not in (Empresa, Transacao, Notificacao):
+        return
+    tabela = sender._meta.model_name
+    anterior = None if created else getattr(instance, '_estado_anterior', None)
+    campos = eventos.campos_alterados(tabela, anterior, instance)
+    if not created and not campos:
+        return
+    eventos.registrar(
+        using, tabela, 'criado' if created else 'alterado', instance.pk, campos,
+        alvo=instance.alvo if sender is Notificacao else None,
+    )
+
+
+@receiver(post_delete)
+def publicar_exclusao(sender, instance, using, **kwargs):
+    if sender not in (Empresa, Transacao, Notificacao):
+        return
+    eventos.registrar(
+        using, sender._meta.model_name, 'excluido', instance.pk,
+        alvo=instance.alvo if sender is Notificacao else None,
+    )
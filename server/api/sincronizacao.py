@@ -0,0 +1,132 @@
+import base64
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from .db_router import banco_principal
+from .models import Exclusao
+
+INICIO = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+LIMITE_PADRAO = 1000
+LIMITE_MAXIMO = 5000
+
+
+# --- Token -----------------------------------------------------------------------
+# "<versão>:<id>:<exclusões>" em base64: o ponto da última linha entregue
+# (atualizado_em em microssegundos e id, como o cursor da KeysetPagination) e
+# desde quando as exclusões ainda não foram enviadas.
+
+def _micros(momento):
+    return int((momento - INICIO) / timedelta(microseconds=1))
+
+
+def codificar(versao, pk, exclusoes):
+    raw = f"{_micros(versao)}:{pk}:{_micros(exclusoes)}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decodificar(token):
+    try:
+        raw = base64.urlsafe_b64decode(token.encode()).decode()
+        versao, pk, exclusoes = (int(parte) for parte in raw.split(':'))
+        return (
+            INICIO + timedelta(microseconds=versao), pk, INICIO + timedelta(microseconds=exclusoes),
+        )
+    except (ValueError, UnicodeDecodeError, OverflowError):
+        raise ValidationError({'since': "Token de sincronização inválido."})
+
+
+# --- Consulta --------------------------------------------------------------------
+
+def sincronizar(queryset, tabela, token=None, limite=LIMITE_PADRAO, versao=F('atualizado_em')):
+    """
+    Linhas de `queryset` alteradas e ids de `tabela` excluídos depois do token.
+    Sem token (ou com um mais antigo que a retenção das exclusões) é a carga
+    completa: completo=True, o cliente descarta o que tinha.
+    As linhas vêm em ordem de (versao, id), `limite` por vez; com mais=True o
+    cliente repete a chamada com o novo token. As exclusões só são enviadas
+    na última página.
+
+    versao: expressão da última alteração de cada linha (padrão: atualizado_em).
+    Retorna {token, completo, mais, alterados, excluidos}.
+    """
+    agora = timezone.now()
+    # Escritas com atualizado_em anterior a este ponto podem ainda não ter feito commit
+    seguro = agora - timedelta(seconds=settings.SINCRONIZACAO_MARGEM)
+    retencao = agora - timedelta(days=settings.SINCRONIZACAO_RETENCAO_DIAS)
+
+    completo = not token
+    if token:
+        desde, desde_pk, exclusoes = decodificar(token)
+        completo = exclusoes < retencao
+    if completo:
+        desde, desde_pk, exclusoes = INICIO, 0, seguro
+
+    linhas = list(
+        queryset.annotate(versao=versao)
+        .filter(Q(versao__gt=desde) | Q(versao=desde, pk__gt=desde_pk))
+        .order_by('versao', 'pk')[:limite + 1]
+    )
+    mais = len(linhas) > limite
+    linhas = linhas[:limite]
+
+    if mais:
+        ultima = linhas[-1]
+        return {
+            'token': codificar(ultima.versao, ultima.pk, exclusoes),
+            'completo': completo, 'mais': True, 'alterados': linhas, 'excluidos': [],
+        }
+
+    excluidos = [] if completo else list(
+        Exclusao.objects.using(queryset.db)
+        .filter(tabela=tabela, excluido_em__gte=exclusoes)
+        .values_list('registro_id', flat=True).distinct()
+    )
+    # Próxima chamada recomeça um pouco antes de agora: o que mudar nesse
+    # intervalo pode vir repetido, nunca faltar
+    return {
+        'token': codificar(seguro, 0, seguro),
+        'completo': completo, 'mais': False, 'alterados': linhas, 'excluidos': excluidos,
+    }
+
+
+def limpar_exclusoes(using):
+    """Apaga os registros de exclusão além da retenção. Retorna quantos apagou."""
+    limite = timezone.now() - timedelta(days=settings.SINCRONIZACAO_RETENCAO_DIAS)
+    apagados, _ = Exclusao.objects.using(using).filter(excluido_em__lt=limite).delete()
+    return apagados
+
+
+class SincronizacaoMixin:
+    """
+    GET <recurso>/sincronizar/?since=<token>&limite=N: só o que mudou desde o
+    token, para o cliente manter a lista em cache local. Lê sem os filtros da
+    listagem e sempre do banco principal: na réplica, uma escrita que ainda
+    não chegou ficaria para trás do token e nunca seria enviada.
+
+    versao_sincronizacao: expressão da última alteração de cada linha.
+    """
+
+    versao_sincronizacao = F('atualizado_em')
+
+    @action(detail=False, methods=['get'])
+    def sincronizar(self, request):
+        try:
+            limite = int(request.query_params.get('limite', LIMITE_PADRAO))
+        except ValueError:
+            raise ValidationError({'limite': "Informe um número inteiro."})
+        limite = max(1, min(limite, LIMITE_MAXIMO))
+
+        queryset = self.get_queryset()
+        queryset = queryset.using(banco_principal(queryset.db))
+        resultado = sincronizar(
+            queryset, self.queryset.model._meta.model_name, request.query_params.get('since'),
+            limite, self.versao_sincronizacao,
+        )
+        resultado['alterados'] = self.get_serializer(resultado['alterados'], many=True).data
+        return Response(resultado)
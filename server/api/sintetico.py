@@ -0,0 +1,133 @@
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from django.db.models import Max
+
+from . import cache_empresas, resumo_mensal, saldos, versoes
+from .emendas import RECURSO_PROPRIO, obter_ou_criar
+from .models import Empresa, Notificacao, Transacao
+
+# Pesos aproximados do que se vê em produção
+PESOS_MATERIAL = {'medicamentos': 6, 'insumo': 3, 'laboratorio': 1}
+PESOS_DESTINO = {'hospital': 7, 'atencao_primaria': 3}
+PESOS_ALVO = {'todos': 6, 'gestor': 2, 'view': 1, 'dev': 1}
+RAMOS = ['Medicamentos', 'Insumos', 'Laboratório', 'Equipamentos', 'Serviços']
+EMENDAS = ['Emenda Parlamentar A', 'Emenda Parlamentar B', 'Emenda de Bancada', RECURSO_PROPRIO]
+NOMES = ['Distribuidora', 'Farmacêutica', 'Comercial', 'Hospitalar', 'Diagnósticos', 'Suprimentos']
+REGIOES = ['Nordeste', 'Central', 'do Vale', 'Brasil', 'Sul', 'Litoral']
+
+
+def _escolher(rnd, pesos):
+    return rnd.choices(list(pesos), weights=list(pesos.values()))[0]
+
+
+def _valor(rnd):
+    # Log-normal: muitas notas pequenas e poucas muito grandes (mediana ~ R$ 2.400)
+    return Decimal(min(max(rnd.lognormvariate(7.8, 1.3), 10), 5_000_000)).quantize(Decimal('0.01'))
+
+
+def gerar_base(qtd_empresas=200, qtd_transacoes=100_000, using='default', semente=42, lote=5000,
+               anos=5, qtd_notificacoes=0):
+    """
+    Insere empresas, transações e notificações fictícias com bulk_create (não passa
+    pelos signals; o saldo, o resumo mensal e os marcadores de versão são
+    recalculados no final).
+
+    - Volume concentrado em poucas empresas (pesos de Zipf, s=1.1).
+    - Datas espalhadas pelos últimos `anos` anos, mais densas nos recentes.
+    - Cada entrada antiga tende a estar paga, com a saída (baixa) correspondente,
+      como no fluxo real; as recentes concentram as pendências.
+
+    qtd_transacoes conta entradas e saídas. Retorna a lista de empresas criadas.
+    """
+    rnd = random.Random(semente)
+    prefixo = f"{semente:04d}"
+    # Rodar de novo com a mesma semente continua a numeração em vez de bater no cnpj único
+    ultimo = (
+        Empresa.objects.using(using).filter(cnpj__startswith=f"99{prefixo}")
+        .aggregate(ultimo=Max('cnpj'))['ultimo']
+    )
+    inicio = int(ultimo[-8:]) + 1 if ultimo else 0
+    empresas = Empresa.objects.using(using).bulk_create([
+        Empresa(
+            nome=f"{rnd.choice(NOMES)} {rnd.choice(REGIOES)} {i}",
+            cnpj=f"99{prefixo}{inicio + i:08d}",
+            tipo=rnd.sample(RAMOS, rnd.randint(1, 2)),
+            licitacao=rnd.random() < 0.4,
+        )
+        for i in range(qtd_empresas)
+    ])
+    por_nome = obter_ou_criar(EMENDAS, using)
+    emendas_da_empresa = {
+        empresa.pk: [por_nome[nome] for nome in rnd.sample(EMENDAS, rnd.randint(0, 2))]
+        for empresa in empresas
+    }
+    Vinculo = Empresa.emendas.through
+    Vinculo.objects.using(using).bulk_create([
+        Vinculo(empresa_id=empresa_id, emenda_id=emenda.pk)
+        for empresa_id, lista in emendas_da_empresa.items() for emenda in lista
+    ], batch_size=lote)
+    pesos_empresas = [1 / (posicao ** 1.1) for posicao in range(1, qtd_empresas + 1)]
+    rnd.shuffle(pesos_empresas)
+    pesos_empresas = list(accumulate(pesos_empresas))
+
+    hoje = date.today()
+    dias = max(1, anos * 365)
+    buffer = []
+    criadas = 0
+
+    def gravar():
+        Transacao.objects.using(using).bulk_create(buffer)
+        buffer.clear()
+
+    while criadas < qtd_transacoes:
+        empresa = rnd.choices(empresas, cum_weights=pesos_empresas)[0]
+        idade = int(rnd.triangular(0, dias, 0))
+        data_entrada = hoje - timedelta(days=idade)
+        chance_pago = 0.95 if idade > 120 else 0.4 + idade / 200
+        pago = criadas + 1 < qtd_transacoes and rnd.random() < chance_pago
+        data_saida = min(hoje, data_entrada + timedelta(days=rnd.randint(5, 90))) if pago else None
+        nf = f"{rnd.randint(1, 999999):06d}"
+        valor = _valor(rnd)
+        material = _escolher(rnd, PESOS_MATERIAL)
+        destino = _escolher(rnd, PESOS_DESTINO)
+
+        buffer.append(Transacao(
+            empresa=empresa, tipo='entrada', status='pago' if pago else 'pendente',
+            nf=nf, descricao="Registro sintético", valor=valor,
+            data_entrada=data_entrada, data_saida=data_saida,
+            tipo_material=material, destino_entrada=destino,
+        ))
+        criadas += 1
+        if pago:
+            buffer.append(Transacao(
+                empresa=empresa, tipo='saida', status='pago',
+                nf=nf, descricao="Baixa sintética", valor=valor,
+                data_entrada=data_saida, data_saida=data_saida,
+                emenda=rnd.choice(emendas_da_empresa[empresa.pk] or [por_nome[RECURSO_PROPRIO]]),
+            ))
+            criadas += 1
+        if len(buffer) >= lote:
+            gravar()
+    if buffer:
+        gravar()
+
+    if qtd_notificacoes:
+        Notificacao.objects.using(using).bulk_create([
+            Notificacao(
+                titulo=f"Aviso sintético {i}",
+                mensagem="Mensagem gerada para testes de carga.",
+                tipo=rnd.choice([t for t, _ in Notificacao.TIPO_CHOICES]),
+                alvo=_escolher(rnd, PESOS_ALVO),
+                ativo=rnd.random() < 0.8,
+            )
+            for i in range(qtd_notificacoes)
+        ], batch_size=lote)
+
+    saldos.recalcular_saldos(using)
+    resumo_mensal.recalcular(using)
+    versoes.marcar_alteracao(using, 'emenda', 'empresa', 'transacao', 'notificacao')
+    cache_empresas.invalidar(using)
+    return empresas
@@ -0,0 +1,248 @@
+import json
+import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import connections, router, transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+
+from . import arquivo, resumo_mensal, versoes
+from .exportacao import FORMATOS, linhas
+from .filters import filtrar_transacoes
+from .middleware import estado_requisicao, usuario_atual
+from .models import Tarefa, Transacao
+from .relatorios import comparar_periodos, ler_parametros
+
+logger = logging.getLogger(__name__)
+
+# Tabelas lidas pelos relatórios: uma escrita nelas muda a chave de cache
+TABELAS = ('transacao', 'empresa', 'emenda')
+
+_executor = None
+_lock = threading.Lock()
+
+
+# --- Tipos de tarefa ---------------------------------------------------------
+# Cada tipo tem uma validação (roda na request, para devolver 400 na hora) e a
+# geração do resultado: (pedaços de bytes, content type, nome do arquivo). Os
+# pedaços vão direto para o arquivo, sem montar o resultado inteiro na memória.
+
+def _validar_exportacao(params):
+    if params.get('formato', 'csv') not in FORMATOS:
+        raise serializers.ValidationError({'formato': f"Formatos disponíveis: {', '.join(FORMATOS)}."})
+    filtrar_transacoes(Transacao.objects.none(), params)
+
+
+def _gerar_exportacao(params):
+    formato = params.get('formato', 'csv')
+    gerar, content_type = FORMATOS[formato]
+    queryset = filtrar_transacoes(arquivo.transacoes(params), params)
+    return gerar(linhas(queryset)), content_type, f"transacoes_{date.today().isoformat()}.{formato}"
+
+
+def _validar_comparativo(params):
+    ler_parametros(params)
+    filtrar_transacoes(Transacao.objects.none(), params)
+
+
+def _gerar_comparativo(params):
+    agrupamento, periodos, dimensoes = ler_parametros(params)
+    queryset = filtrar_transacoes(arquivo.transacoes(params), params)
+    dados = comparar_periodos(resumo_mensal.fonte(queryset, params), agrupamento, periodos, dimensoes)
+    # Mesmo JSON da resposta síncrona de /transacoes/comparativo/
+    return [JSONRenderer().render(dados)], 'application/json', f"comparativo_{date.today().isoformat()}.json"
+
+
+TIPOS = {
+    'exportacao': (_validar_exportacao, _gerar_exportacao),
+    'comparativo': (_validar_comparativo, _gerar_comparativo),
+}
+
+
+# --- Envio ---------------------------------------------------------------------
+
+def submeter(usuario, tipo, parametros):
+    """
+    Registra a tarefa no banco do usuário e a entrega ao pool depois do commit.
+    Um pedido igual (mesmo tipo e parâmetros, dados sem alteração desde então)
+    ainda válido é reaproveitado. Retorna (tarefa, criada).
+    """
+    validar, _ = TIPOS[tipo]
+    validar(parametros)
+
+    banco = router.db_for_write(Tarefa)
+    chave = versoes.validadores(banco, TABELAS, f"{tipo}|{json.dumps(parametros, sort_keys=True)}")[0].strip('"')
+    agora = timezone.now()
+    existente = (
+        Tarefa.objects.using(banco)
+        .filter(usuario_id=usuario.pk, chave=chave)
+        .filter(
+            Q(status__in=('pendente', 'executando'),
+              criado_em__gte=agora - timedelta(seconds=settings.TAREFAS_TEMPO_MAXIMO))
+            | Q(status='concluida', concluido_em__gte=agora - timedelta(seconds=settings.TAREFAS_VALIDADE))
+        )
+        .order_by('-criado_em').first()
+    )
+    if existente is not None:
+        if existente.status == 'pendente':
+            # O worker avisado no primeiro pedido pode ter caído (ou o processo reiniciado)
+            transaction.on_commit(lambda: enfileirar(banco), using=banco)
+        return existente, False
+
+    tarefa = Tarefa.objects.using(banco).create(usuario_id=usuario.pk, tipo=tipo, parametros=parametros, chave=chave)
+    transaction.on_commit(lambda: enfileirar(banco), using=banco)
+    return tarefa, True
+
+
+def enfileirar(banco):
+    """Acorda um worker do pool para esvaziar a fila do banco."""
+    if settings.TAREFAS_WORKERS <= 0:
+        # Sem pool (testes, depuração): executa na hora, na thread atual
+        processar_pendentes(banco)
+        return
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.TAREFAS_WORKERS, thread_name_prefix='tarefas')
+    _executor.submit(_processar_em_thread, banco)
+
+
+def _processar_em_thread(banco):
+    try:
+        processar_pendentes(banco)
+    except Exception:
+        logger.exception("Falha ao processar a fila de tarefas do banco '%s'", banco)
+    finally:
+        # Conexões são por thread; a thread do pool fica parada até a próxima tarefa
+        connections.close_all()
+
+
+# --- Execução ------------------------------------------------------------------
+
+def processar_pendentes(banco):
+    """
+    Remove as tarefas expiradas e executa as pendentes do banco até a fila
+    esvaziar. Qualquer processo pode pegar qualquer tarefa (SKIP LOCKED):
+    o que ficou pendente num worker que caiu sai na próxima chamada.
+    Retorna quantas tarefas executou.
+    """
+    limpar_expiradas(banco)
+    executadas = 0
+    while (tarefa := _reservar(banco)) is not None:
+        executar(tarefa, banco)
+        executadas += 1
+    return executadas
+
+
+def _reservar(banco):
+    with transaction.atomic(using=banco):
+        tarefa = (
+            Tarefa.objects.using(banco)
+            .select_for_update(skip_locked=True)
+            .filter(status='pendente').order_by('criado_em').first()
+        )
+        if tarefa is None:
+            return None
+        tarefa.status = 'executando'
+        tarefa.iniciado_em = timezone.now()
+        tarefa.save(update_fields=['status', 'iniciado_em'])
+    return tarefa
+
+
+@contextmanager
+def contexto_usuario(usuario):
+    """
+    Roda o bloco como se fosse uma request do usuário: o roteador escolhe o
+    banco (sandbox .dev, réplica de leitura...) como faria na request original.
+    """
+    token_usuario = usuario_atual.set(usuario)
+    token_estado = estado_requisicao.set({})
+    try:
+        yield
+    finally:
+        estado_requisicao.reset(token_estado)
+        usuario_atual.reset(token_usuario)
+
+
+def armazenamento():
+    return FileSystemStorage(location=settings.TAREFAS_DIR)
+
+
+def _gravar(tarefa, banco, pedacos, nome_arquivo):
+    """
+    Grava os pedaços num arquivo temporário e o move para o armazenamento,
+    parando assim que passar de TAREFAS_TAMANHO_MAXIMO. Retorna o caminho.
+    """
+    with tempfile.TemporaryFile() as temporario:
+        tamanho = 0
+        for pedaco in pedacos:
+            tamanho += len(pedaco)
+            if tamanho > settings.TAREFAS_TAMANHO_MAXIMO:
+                raise ValueError(
+                    f"O resultado passou de {settings.TAREFAS_TAMANHO_MAXIMO // (1024 * 1024)} MB. "
+                    "Use filtros mais restritos."
+                )
+            temporario.write(pedaco)
+        temporario.seek(0)
+        return armazenamento().save(f"{banco}/{tarefa.pk}/{nome_arquivo}", File(temporario))
+
+
+def executar(tarefa, banco):
+    _, gerar = TIPOS[tarefa.tipo]
+    usuario = User.objects.filter(pk=tarefa.usuario_id).first()
+    try:
+        if usuario is None:
+            raise ValueError("O usuário que pediu a tarefa não existe mais.")
+        with contexto_usuario(usuario):
+            pedacos, content_type, nome_arquivo = gerar(tarefa.parametros)
+            caminho = _gravar(tarefa, banco, pedacos, nome_arquivo)
+    except Exception as erro:
+        logger.exception("Tarefa %s (%s) falhou", tarefa.pk, tarefa.tipo)
+        campos = {'status': 'erro', 'erro': str(erro) or type(erro).__name__}
+    else:
+        campos = {
+            'status': 'concluida', 'arquivo': caminho,
+            'content_type': content_type, 'nome_arquivo': nome_arquivo,
+        }
+    Tarefa.objects.using(banco).filter(pk=tarefa.pk).update(concluido_em=timezone.now(), **campos)
+
+
+def limpar_expiradas(banco):
+    """
+    Apaga as tarefas terminadas há mais de TAREFAS_VALIDADE segundos, com os
+    arquivos delas, e marca como erro as que estão executando há mais de
+    TAREFAS_TEMPO_MAXIMO (o processo que as executava caiu) e as que esperam
+    na fila há mais que isso
+    (nenhum worker foi avisado; um pedido igual cria outra).
+    """
+    agora = timezone.now()
+    maximo = agora - timedelta(seconds=settings.TAREFAS_TEMPO_MAXIMO)
+    tarefas = Tarefa.objects.using(banco)
+    expiradas = tarefas.filter(
+        status__in=('concluida', 'erro'), concluido_em__lt=agora - timedelta(seconds=settings.TAREFAS_VALIDADE),
+    )
+    for caminho in expiradas.exclude(arquivo='').values_list('arquivo', flat=True):
+        armazenamento().delete(caminho)
+    expiradas.delete()
+    tarefas.filter(
+        status='executando', iniciado_em__lt=maximo,
+    ).update(status='erro', erro="Execução interrompida.", concluido_em=agora)
+    tarefas.filter(
+        status='pendente', criado_em__lt=maximo,
+    ).update(status='erro', erro="A tarefa não foi executada a tempo.", concluido_em=agora)
+
+
+def expira_em(tarefa):
+    if tarefa.concluido_em is None:
+        return None
+    return tarefa.concluido_em + timedelta(seconds=settings.TAREFAS_VALIDADE)
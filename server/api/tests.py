@@ -1,3 +1,1537 @@
-from django.test import TestCase
+import asyncio
+import base64
+import io
+import json
+import tempfile
+import threading
+import zipfile
+from datetime import date, timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connections, transaction
+from django.test import AsyncClient, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase, APITransactionTestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import metricas
+from .db_router import UserBasedRouter, bancos_de_escrita
+from .middleware import estado_requisicao, usuario_atual
+from .models import Emenda, Empresa, Notificacao, SaldoEmpresa, Transacao
+
+
+def popular_base(qtd_empresas=50, qtd_transacoes=3000):
+    """Cria empresas e transações em massa (bulk_create, sem passar pelos signals)."""
+    empresas = Empresa.objects.bulk_create([
+        Empresa(nome=f"Empresa {i}", cnpj=f"{i:014d}", tipo=['Medicamentos'])
+        for i in range(qtd_empresas)
+    ])
+    inicio = date(2022, 1, 1)
+    Transacao.objects.bulk_create([
+        Transacao(
+            empresa=empresas[i % qtd_empresas],
+            tipo='entrada' if i % 3 else 'saida',
+            status='pendente' if i % 2 else 'pago',
+            nf=f"NF-{i}",
+            valor=Decimal('100.00') + i,
+            data_entrada=inicio + timedelta(days=i % 900),
+            tipo_material='medicamentos',
+            destino_entrada='hospital',
+        )
+        for i in range(qtd_transacoes)
+    ], batch_size=1000)
+    Notificacao.objects.bulk_create([
+        Notificacao(titulo=f"Aviso {i}", mensagem="Teste", alvo='todos')
+        for i in range(200)
+    ])
+    return empresas
+
+
+class ConsultasPorEndpointTests(APITestCase):
+    """
+    Cada listagem deve executar um número fixo de consultas,
+    independentemente de quantas linhas existem na base:
+    uma para os validadores de cache (ETag) e uma para os dados.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresas = popular_base()
+        cls.user = User.objects.create_user(username='teste.gestor', password='senha-forte-123')
+        User.objects.bulk_create([User(username=f"user{i}.view") for i in range(100)])
+
+    def setUp(self):
+        caches['empresas'].clear()
+        self.client.force_authenticate(self.user)
+
+    def assertConsultas(self, qtd, url):
+        with self.assertNumQueries(qtd):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_listagem_transacoes(self):
+        response = self.assertConsultas(2, '/api/transacoes/')
+        self.assertEqual(len(response.data), 3000)
+        self.assertTrue(response.data[0]['nome_empresa'].startswith('Empresa'))
+
+    def test_listagem_transacoes_filtrada_e_paginada(self):
+        response = self.assertConsultas(2, f'/api/transacoes/?tipo=entrada&empresa={self.empresas[0].pk}&page_size=20')
+        self.assertEqual(len(response.data['results']), 20)
+        self.assertIsNotNone(response.data['next'])
+        self.assertConsultas(2, response.data['next'])
+
+    def test_resumo_transacoes(self):
+        self.assertConsultas(2, '/api/transacoes/resumo/')
+
+    def test_listagem_empresas(self):
+        # Mais uma para as emendas de todas as empresas (prefetch)
+        response = self.assertConsultas(3, '/api/empresas/')
+        self.assertEqual(len(response.data), 50)
+        # Segunda leitura vem do cache: só resta a consulta dos validadores
+        self.assertConsultas(1, '/api/empresas/')
+
+    def test_listagem_notificacoes(self):
+        self.assertConsultas(2, '/api/notificacoes/')
+
+    def test_listagem_usuarios(self):
+        # Sem validadores de cache: só a consulta dos dados
+        self.assertConsultas(1, '/api/users/')
+
+
+class PaginacaoTransacoesTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        popular_base(qtd_empresas=5, qtd_transacoes=120)
+        cls.user = User.objects.create_user(username='teste.view', password='senha-forte-123')
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def test_percorre_todas_as_paginas_sem_repetir(self):
+        vistos = []
+        url = '/api/transacoes/?page_size=25'
+        while url:
+            response = self.client.get(url)
+            vistos += [(t['data_entrada'], t['id']) for t in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(len(vistos), 120)
+        self.assertEqual(len(set(vistos)), 120)
+        self.assertEqual(vistos, sorted(vistos, reverse=True))
+
+    def test_filtro_invalido(self):
+        self.assertEqual(self.client.get('/api/transacoes/?status=xyz').status_code, 400)
+        self.assertEqual(self.client.get('/api/transacoes/?data_inicio=31-12-2024').status_code, 400)
+        self.assertEqual(self.client.get('/api/transacoes/?empresa=abc').status_code, 400)
+
+    def ids(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return sorted(t['id'] for t in response.data)
+
+    def test_filtros_aplicados_no_banco(self):
+        empresas = list(Empresa.objects.order_by('pk')[:2])
+        url = (f'/api/transacoes/?tipo=entrada&status=pendente&empresa={empresas[0].pk},{empresas[1].pk}'
+               '&data_inicio=2022-01-10&data_fim=2022-03-31')
+        esperado = Transacao.objects.filter(
+            tipo='entrada', status='pendente', empresa__in=empresas,
+            data_entrada__gte=date(2022, 1, 10), data_entrada__lte=date(2022, 3, 31),
+        )
+        self.assertTrue(esperado.exists())
+        self.assertEqual(self.ids(url), sorted(esperado.values_list('pk', flat=True)))
+        # Intervalo inclusivo nas duas pontas
+        self.assertEqual(self.ids('/api/transacoes/?data_inicio=2022-01-05&data_fim=2022-01-05'),
+                         sorted(Transacao.objects.filter(data_entrada=date(2022, 1, 5)).values_list('pk', flat=True)))
+        self.assertEqual(self.ids('/api/transacoes/?nf=NF-7'), [Transacao.objects.get(nf='NF-7').pk])
+        self.assertEqual(self.ids('/api/transacoes/?tipo=saida&status=pendente'),
+                         sorted(Transacao.objects.filter(tipo='saida', status='pendente').values_list('pk', flat=True)))
+
+    def test_cursor_com_empate_na_data_de_entrada(self):
+        empresa = Empresa.objects.create(nome="Empate", cnpj="99999999000199")
+        Transacao.objects.bulk_create([
+            Transacao(empresa=empresa, tipo='entrada', valor=Decimal('1.00'), nf=f"E{i}", data_entrada=date(2023, 5, 1))
+            for i in range(7)
+        ])
+        vistos, url, paginas = [], f'/api/transacoes/?empresa={empresa.pk}&page_size=3', 0
+        while url:
+            response = self.client.get(url)
+            vistos += [t['id'] for t in response.data['results']]
+            url, paginas = response.data['next'], paginas + 1
+        # Desempate pelo id: nenhuma nota repetida ou pulada entre as páginas
+        self.assertEqual(paginas, 3)
+        self.assertEqual(vistos, sorted(Transacao.objects.filter(empresa=empresa).values_list('pk', flat=True),
+                                        reverse=True))
+
+    def test_ultima_pagina_e_cursor_invalido(self):
+        response = self.client.get('/api/transacoes/?page_size=500')
+        self.assertEqual(len(response.data['results']), 120)
+        self.assertIsNone(response.data['next'])
+        # page_size fora dos limites é ajustado
+        self.assertEqual(self.client.get('/api/transacoes/?page_size=0').data['page_size'], 1)
+        self.assertEqual(self.client.get('/api/transacoes/?page_size=9999').data['page_size'], 500)
+
+        self.assertEqual(self.client.get('/api/transacoes/?cursor=nao-e-cursor').status_code, 404)
+        sem_id = base64.urlsafe_b64encode(b'2024-01-01:x').decode()
+        self.assertEqual(self.client.get(f'/api/transacoes/?cursor={sem_id}').status_code, 404)
+
+
+class ResumoTransacoesTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nome="Fornecedor", cnpj="00000000000100")
+        cls.outra = Empresa.objects.create(nome="Outra", cnpj="00000000000200")
+        notas = [
+            (cls.empresa, 'entrada', 'pendente', '100.00', date(2024, 1, 10)),
+            (cls.empresa, 'entrada', 'pago', '250.50', date(2024, 1, 20)),
+            (cls.empresa, 'saida', 'pago', '250.50', date(2024, 2, 5)),
+            (cls.outra, 'entrada', 'pendente', '40.00', date(2024, 3, 1)),
+        ]
+        for empresa, tipo, status, valor, dia in notas:
+            Transacao.objects.create(empresa=empresa, tipo=tipo, status=status, valor=Decimal(valor), data_entrada=dia)
+        cls.user = User.objects.create_user(username='teste.view')
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def resumo(self, **params):
+        response = self.client.get('/api/transacoes/resumo/', params)
+        self.assertEqual(response.status_code, 200)
+        return {chave: (Decimal(valor) if 'total' in chave or 'saldo' in chave else valor)
+                for chave, valor in response.data.items()}
+
+    def test_totais_sem_filtro(self):
+        self.assertEqual(self.resumo(), {
+            'total_entradas': Decimal('390.50'), 'total_saidas': Decimal('250.50'),
+            'saldo_devedor': Decimal('140.00'),
+            'qtd_entradas': 3, 'qtd_saidas': 1, 'qtd_pendentes': 2,
+        })
+
+    def test_totais_com_filtros(self):
+        resumo = self.resumo(empresa=self.empresa.pk, data_inicio='2024-01-15')
+        self.assertEqual(
+            (resumo['total_entradas'], resumo['total_saidas'], resumo['saldo_devedor'], resumo['qtd_pendentes']),
+            (Decimal('250.50'), Decimal('250.50'), Decimal('0'), 0),
+        )
+        self.assertEqual(self.resumo(status='pendente', tipo='entrada')['saldo_devedor'], Decimal('140.00'))
+        # Filtro que o resumo mensal não atende (nf): a conta é feita direto nas notas
+        self.assertEqual(self.resumo(nf='inexistente'), {
+            'total_entradas': Decimal('0'), 'total_saidas': Decimal('0'), 'saldo_devedor': Decimal('0'),
+            'qtd_entradas': 0, 'qtd_saidas': 0, 'qtd_pendentes': 0,
+        })
+        self.assertEqual(self.client.get('/api/transacoes/resumo/?tipo=outro').status_code, 400)
+
+
+class SaldoEmpresaTests(APITestCase):
+
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nome="Fornecedor", cnpj="00000000000100")
+
+    def test_saldo_acompanha_criacao_edicao_e_exclusao(self):
+        nota = Transacao.objects.create(empresa=self.empresa, tipo='entrada', valor=Decimal('50.00'))
+        Transacao.objects.create(empresa=self.empresa, tipo='saida', status='pago', valor=Decimal('20.00'))
+        nota.status = 'pago'
+        nota.save()
+
+        saldo = Empresa.objects.get(pk=self.empresa.pk).saldo
+        self.assertEqual(saldo.total_entradas, Decimal('50.00'))
+        self.assertEqual(saldo.total_saidas, Decimal('20.00'))
+        self.assertEqual(saldo.qtd_pendentes, 0)
+
+        nota.delete()
+        saldo.refresh_from_db()
+        self.assertEqual(saldo.total_entradas, Decimal('0.00'))
+
+    def test_nota_movida_para_outra_empresa(self):
+        outra = Empresa.objects.create(nome="Outro Fornecedor", cnpj="00000000000200")
+        nota = Transacao.objects.create(
+            empresa=self.empresa, tipo='entrada', valor=Decimal('30.00'), data_entrada=date(2024, 3, 1),
+        )
+        nota.empresa = outra
+        nota.valor = Decimal('35.00')
+        nota.save()
+
+        antiga = SaldoEmpresa.objects.get(pk=self.empresa.pk)
+        nova = SaldoEmpresa.objects.get(pk=outra.pk)
+        self.assertEqual((antiga.total_entradas, antiga.qtd_pendentes), (Decimal('0.00'), 0))
+        self.assertIsNone(antiga.ultima_movimentacao)
+        self.assertEqual(
+            (nova.total_entradas, nova.qtd_pendentes, nova.valor_pendente, nova.ultima_movimentacao),
+            (Decimal('35.00'), 1, Decimal('35.00'), date(2024, 3, 1)),
+        )
+
+    def test_recalcular_corrige_saldo_divergente(self):
+        from .saldos import recalcular_saldos
+        Transacao.objects.create(empresa=self.empresa, tipo='entrada', valor=Decimal('12.00'))
+        Transacao.objects.create(empresa=self.empresa, tipo='saida', status='pago', valor=Decimal('4.00'))
+        # Incremental e reconstrução concordam
+        self.assertEqual(recalcular_saldos(), 0)
+
+        SaldoEmpresa.objects.filter(pk=self.empresa.pk).update(total_entradas=Decimal('999.00'))
+        self.assertEqual(recalcular_saldos(), 1)
+        saldo = SaldoEmpresa.objects.get(pk=self.empresa.pk)
+        self.assertEqual((saldo.total_entradas, saldo.total_saidas), (Decimal('12.00'), Decimal('4.00')))
+
+
+class BaixaTests(APITestCase):
+
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nome="Fornecedor", cnpj="00000000000100")
+        self.nota = Transacao.objects.create(
+            empresa=self.empresa, tipo='entrada', nf='123', valor=Decimal('80.00'),
+            data_entrada=date.today() - timedelta(days=10),
+        )
+        Emenda.objects.get_or_create(nome='Recurso Próprio')
+        self.client.force_authenticate(User.objects.create_user(username='teste.gestor'))
+
+    def url(self):
+        return f'/api/transacoes/{self.nota.pk}/baixa/'
+
+    def test_baixa_cria_saida_e_quita_nota(self):
+        # Inclui um upsert no resumo mensal por escrita (saída criada, nota quitada);
+        # o marcador dos ETags só avança depois do commit
+        with self.assertNumQueries(15):
+            response = self.client.post(self.url(), {'data_saida': date.today(), 'descricao': '[Hospital] Uso'})
+        self.assertEqual(response.status_code, 201)
+        self.nota.refresh_from_db()
+        self.assertEqual(self.nota.status, 'pago')
+        saida = Transacao.objects.get(tipo='saida')
+        self.assertEqual((saida.valor, saida.nf, saida.emenda.nome), (Decimal('80.00'), '123', 'Recurso Próprio'))
+        self.assertEqual(self.empresa.saldo.qtd_pendentes, 0)
+
+    def test_segunda_baixa_e_rejeitada(self):
+        self.client.post(self.url(), {'data_saida': date.today()})
+        response = self.client.post(self.url(), {'data_saida': date.today()})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Transacao.objects.filter(tipo='saida').count(), 1)
+
+    def test_baixa_antes_da_entrada(self):
+        response = self.client.post(self.url(), {'data_saida': date.today() - timedelta(days=30)})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Transacao.objects.filter(tipo='saida').exists())
+
+    def test_visitante_nao_pode_dar_baixa(self):
+        self.client.force_authenticate(User.objects.create_user(username='teste.view'))
+        self.assertEqual(self.client.post(self.url(), {'data_saida': date.today()}).status_code, 403)
+
+
+class BaixaConcorrenteTests(APITransactionTestCase):
+
+    def test_baixa_com_nota_travada_retorna_409(self):
+        empresa = Empresa.objects.create(nome="Fornecedor", cnpj="00000000000100")
+        nota = Transacao.objects.create(empresa=empresa, tipo='entrada', valor=Decimal('10.00'))
+        travada, liberar = threading.Event(), threading.Event()
+
+        def segurar_lock():
+            try:
+                with transaction.atomic():
+                    Transacao.objects.select_for_update().get(pk=nota.pk)
+                    travada.set()
+                    liberar.wait(5)
+            finally:
+                connections.close_all()
+
+        outra = threading.Thread(target=segurar_lock)
+        outra.start()
+        travada.wait(5)
+        try:
+            self.client.force_authenticate(User.objects.create_user(username='teste.gestor'))
+            response = self.client.post(f'/api/transacoes/{nota.pk}/baixa/', {'data_saida': date.today()})
+        finally:
+            liberar.set()
+            outra.join()
+        self.assertEqual(response.status_code, 409)
+        nota.refresh_from_db()
+        self.assertEqual(nota.status, 'pendente')
+
+
+class ImportacaoTests(APITestCase):
+
+    def setUp(self):
+        caches['empresas'].clear()
+        self.empresa = Empresa.objects.create(nome="Fornecedor", cnpj="12.345.678/0001-90")
+        self.client.force_authenticate(User.objects.create_user(username='teste.gestor'))
+
+    def test_importa_csv_em_lotes_e_reporta_erros(self):
+        linhas = ["cnpj;nf;valor;data_entrada;tipo_material"]
+        linhas += [f"12345678000190;{i};1.000,50;01/02/2024;medicamentos" for i in range(25)]
+        linhas += [
+            "99999999000199;X1;10,00;2024-02-01;",
+            "12345678000190;X2;10,00;2999-01-01;",
+            "12345678000190;X3;abc;2024-02-01;",
+        ]
+        arquivo = SimpleUploadedFile("notas.csv", "\n".join(linhas).encode('utf-8'), content_type='text/csv')
+
+        response = self.client.post('/api/transacoes/importar/?lote=10', {'arquivo': arquivo}, format='multipart')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['total'], response.data['importadas'], response.data['com_erro']), (28, 25, 3))
+        self.assertEqual([e['linha'] for e in response.data['erros']], [27, 28, 29])
+        self.assertIn('cnpj', response.data['erros'][0]['erros'])
+        self.assertIn('data_entrada', response.data['erros'][1]['erros'])
+
+        self.assertEqual(Transacao.objects.filter(tipo='entrada', status='pendente').count(), 25)
+        saldo = Empresa.objects.get(pk=self.empresa.pk).saldo
+        self.assertEqual((saldo.qtd_pendentes, saldo.valor_pendente), (25, Decimal('25012.50')))
+
+    def test_importa_array_json(self):
+        notas = [{'cnpj': '12.345.678/0001-90', 'nf': str(i), 'valor': '5.00'} for i in range(3)]
+        response = self.client.post('/api/transacoes/importar/', notas, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['importadas'], 3)
+
+    def test_empresa_removida_com_mapa_de_cnpjs_em_cache(self):
+        removida = Empresa.objects.create(nome="Removida", cnpj="11.111.111/0001-11")
+        self.client.post('/api/transacoes/importar/', [{'cnpj': '11111111000111', 'nf': '0', 'valor': '1.00'}],
+                         format='json')
+        # Sem executar os on_commit, o mapa de CNPJs em cache continua citando a empresa
+        Transacao.objects.filter(empresa=removida).delete()
+        removida.delete()
+
+        notas = [{'cnpj': cnpj, 'nf': str(i), 'valor': '5.00'}
+                 for i, cnpj in enumerate(['12345678000190', '11111111000111'] * 3)]
+        response = self.client.post('/api/transacoes/importar/?lote=2', notas, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['importadas'], response.data['com_erro']), (3, 3))
+        self.assertEqual([e['linha'] for e in response.data['erros']], [3, 5, 7])
+        self.assertEqual(Transacao.objects.filter(empresa=self.empresa).count(), 3)
+
+    def test_falha_no_meio_reporta_as_linhas_do_lote(self):
+        from unittest import mock
+
+        from django.db import DatabaseError
+
+        from . import resumo_mensal
+
+        notas = [{'cnpj': '12345678000190', 'nf': str(i), 'valor': '5.00'} for i in range(5)]
+        original = resumo_mensal.aplicar_lote
+        falhas = iter([None, DatabaseError("falha simulada"), None])
+
+        def aplicar_lote(criadas, using):
+            falha = next(falhas)
+            if falha:
+                raise falha
+            return original(criadas, using)
+
+        with mock.patch.object(resumo_mensal, 'aplicar_lote', side_effect=aplicar_lote):
+            response = self.client.post('/api/transacoes/importar/?lote=2', notas, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['importadas'], response.data['com_erro']), (3, 2))
+        self.assertEqual(response.data['erros'][0]['linhas'], [4, 5])
+        # O lote que falhou volta inteiro; os outros ficam gravados
+        self.assertEqual(sorted(Transacao.objects.values_list('nf', flat=True)), ['0', '1', '4'])
+        self.assertEqual(Empresa.objects.get(pk=self.empresa.pk).saldo.qtd_pendentes, 3)
+
+    def test_sem_dados(self):
+        response = self.client.post('/api/transacoes/importar/', {'nf': '1'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class ExportacaoTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        popular_base(qtd_empresas=3, qtd_transacoes=1200)
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user(username='teste.view'))
+
+    def test_exporta_csv_em_partes(self):
+        response = self.client.get('/api/transacoes/exportar/?tipo=saida')
+        self.assertTrue(response.streaming)
+        partes = list(response.streaming_content)
+        self.assertGreater(len(partes), 1)
+        linhas = b''.join(partes).decode('utf-8-sig').splitlines()
+        self.assertTrue(linhas[0].startswith('ID;Empresa;CNPJ'))
+        self.assertEqual(len(linhas) - 1, Transacao.objects.filter(tipo='saida').count())
+
+    def test_exporta_xlsx_valido(self):
+        response = self.client.get('/api/transacoes/exportar/?formato=xlsx')
+        conteudo = b''.join(response.streaming_content)
+        with zipfile.ZipFile(io.BytesIO(conteudo)) as pacote:
+            self.assertIsNone(pacote.testzip())
+            planilha = pacote.read('xl/worksheets/sheet1.xml').decode('utf-8')
+        self.assertEqual(planilha.count('<row>'), 1201)
+
+    def test_formato_invalido(self):
+        self.assertEqual(self.client.get('/api/transacoes/exportar/?formato=pdf').status_code, 400)
+
+    async def test_exporta_em_partes_via_asgi(self):
+        user = await User.objects.aget(username='teste.view')
+        auth = {'Authorization': f'Bearer {AccessToken.for_user(user)}'}
+        response = await AsyncClient().get('/api/transacoes/exportar/?tipo=saida', headers=auth)
+        # Iterador assíncrono: o ASGI envia cada parte assim que é gerada
+        self.assertTrue(response.is_async)
+        partes = [parte async for parte in response.streaming_content]
+        self.assertGreater(len(partes), 1)
+        linhas = b''.join(partes).decode('utf-8-sig').splitlines()
+        total = await Transacao.objects.filter(tipo='saida').acount()
+        self.assertEqual(len(linhas) - 1, total)
+
+
+class ComparativoTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nome="Fornecedor", cnpj="00000000000100")
+        for dia, tipo, valor in [
+            (date(2024, 1, 5), 'entrada', '100.00'),
+            (date(2024, 1, 20), 'saida', '40.00'),
+            (date(2024, 2, 3), 'entrada', '150.00'),
+            (date(2024, 4, 1), 'entrada', '10.00'),
+        ]:
+            Transacao.objects.create(empresa=cls.empresa, tipo=tipo, valor=Decimal(valor), data_entrada=dia)
+
+    def setUp(self):
+        self.client.force_authenticate(User.objects.create_user(username='teste.view'))
+
+    def test_compara_meses_em_uma_consulta(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/transacoes/comparativo/?periodos=2024-02,2024-01&dimensoes=empresa')
+        self.assertEqual(response.data['periodos'], ['2024-01', '2024-02'])
+        totais = response.data['totais']
+        self.assertEqual(totais['periodos']['2024-01']['saidas'], Decimal('40.00'))
+        variacao = totais['variacoes'][0]
+        self.assertEqual((variacao['entradas'], variacao['entradas_pct']), (Decimal('50.00'), 50.0))
+        self.assertEqual(response.data['grupos'][0]['nome_empresa'], "Fornecedor")
+
+    def test_compara_trimestres(self):
+        response = self.client.get('/api/transacoes/comparativo/?agrupamento=trimestre&periodos=2024-T1,2024-T2')
+        self.assertEqual(response.data['totais']['periodos']['2024-T1']['quantidade'], 3)
+        self.assertEqual(response.data['totais']['periodos']['2024-T2']['entradas'], Decimal('10.00'))
+
+    def test_parametros_invalidos(self):
+        self.assertEqual(self.client.get('/api/transacoes/comparativo/?periodos=2024-01').status_code, 400)
+        self.assertEqual(self.client.get('/api/transacoes/comparativo/?dimensoes=nf').status_code, 400)
+
+
+class NotificacoesNaoLidasTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Notificacao.objects.bulk_create([
+            Notificacao(titulo="Geral", mensagem="-", alvo='todos'),
+            Notificacao(titulo="Gestores", mensagem="-", alvo='gestor'),
+            Notificacao(titulo="Devs", mensagem="-", alvo='dev'),
+            Notificacao(titulo="Inativa", mensagem="-", alvo='todos', ativo=False),
+        ])
+        cls.gestor = User.objects.create_user(username='ana.gestor')
+        cls.visitante = User.objects.create_user(username='bia.view')
+
+    def titulos(self, user):
+        self.client.force_authenticate(user)
+        return sorted(n['titulo'] for n in self.client.get('/api/notificacoes/nao_lidas/').data)
+
+    def test_filtra_por_papel_e_ativo(self):
+        self.assertEqual(self.titulos(self.gestor), ["Geral", "Gestores"])
+        self.assertEqual(self.titulos(self.visitante), ["Geral"])
+
+    def test_marcar_lidas_vale_so_para_o_usuario(self):
+        self.client.force_authenticate(self.gestor)
+        geral = Notificacao.objects.get(titulo="Geral")
+        response = self.client.post('/api/notificacoes/marcar_lidas/', {'ids': [geral.pk]}, format='json')
+        self.assertEqual(response.data['marcadas'], 1)
+        self.assertEqual(self.titulos(self.gestor), ["Gestores"])
+        self.assertEqual(self.titulos(self.visitante), ["Geral"])
+
+        self.client.force_authenticate(self.gestor)
+        self.client.post('/api/notificacoes/marcar_lidas/', {'todas': True}, format='json')
+        self.assertEqual(self.titulos(self.gestor), [])
+
+    def test_feed_em_uma_consulta(self):
+        self.client.force_authenticate(self.gestor)
+        with self.assertNumQueries(2):
+            self.client.get('/api/notificacoes/nao_lidas/')
+
+
+class GetCondicionalTests(APITestCase):
+
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.empresa = Empresa.objects.create(nome="Fornecedor", cnpj="00000000000100")
+            Transacao.objects.create(empresa=self.empresa, tipo='entrada', valor=Decimal('10.00'))
+        self.client.force_authenticate(User.objects.create_user(username='teste.gestor'))
+
+    def test_304_sem_consultar_dados_enquanto_nada_muda(self):
+        primeira = self.client.get('/api/transacoes/')
+        etag = primeira['ETag']
+        self.assertTrue(etag.startswith('"'))
+        self.assertIn('Last-Modified', primeira)
+
+        with self.assertNumQueries(1):
+            repetida = self.client.get('/api/transacoes/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(repetida.status_code, 304)
+        self.assertEqual(repetida['ETag'], etag)
+
+        # O marcador avança no commit da escrita
+        with self.captureOnCommitCallbacks(execute=True):
+            Transacao.objects.create(empresa=self.empresa, tipo='saida', status='pago', valor=Decimal('5.00'))
+        depois = self.client.get('/api/transacoes/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(depois.status_code, 200)
+        self.assertNotEqual(depois['ETag'], etag)
+
+    def test_etag_depende_dos_filtros_e_das_tabelas(self):
+        todas = self.client.get('/api/transacoes/')['ETag']
+        self.assertNotEqual(self.client.get('/api/transacoes/?tipo=saida')['ETag'], todas)
+
+        empresas = self.client.get('/api/empresas/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Transacao.objects.create(empresa=self.empresa, tipo='entrada', valor=Decimal('1.00'))
+        # O saldo inline da empresa mudou, então a listagem de empresas também muda
+        self.assertNotEqual(self.client.get('/api/empresas/', HTTP_IF_NONE_MATCH=empresas).status_code, 304)
+
+    def test_renomear_emenda_muda_etag_das_notas(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            emenda = Emenda.objects.create(nome="Emenda A")
+            Transacao.objects.filter(empresa=self.empresa).update(emenda=emenda)
+        etag = self.client.get('/api/transacoes/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/emendas/{emenda.pk}/', {'nome': "Emenda B"}, format='json')
+        depois = self.client.get('/api/transacoes/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(depois.status_code, 200)
+        self.assertEqual(depois.data[0]['emenda_origem'], "Emenda B")
+
+    def test_if_modified_since(self):
+        ultima = self.client.get('/api/empresas/')['Last-Modified']
+        self.assertEqual(self.client.get('/api/empresas/', HTTP_IF_MODIFIED_SINCE=ultima).status_code, 304)
+
+
+class CacheEmpresasTests(APITestCase):
+
+    def setUp(self):
+        caches['empresas'].clear()
+        self.empresa = Empresa.objects.create(nome="Fornecedor", cnpj="00000000000100")
+        self.client.force_authenticate(User.objects.create_user(username='teste.gestor'))
+
+    def test_escrita_invalida_listagem_e_detalhe(self):
+        url = f'/api/empresas/{self.empresa.pk}/'
+        self.client.get('/api/empresas/')
+        self.client.get(url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(url, {'nome': "Novo Nome"}, format='json')
+        self.assertEqual(self.client.get(url).data['nome'], "Novo Nome")
+        self.assertEqual(self.client.get('/api/empresas/').data[0]['nome'], "Novo Nome")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Transacao.objects.create(empresa=self.empresa, tipo='entrada', valor=Decimal('9.00'))
+        self.assertEqual(self.client.get(url).data['saldo']['qtd_pendentes'], 1)
+
+    def test_invalida_so_depois_do_commit(self):
+        from . import cache_empresas
+        self.client.get('/api/empresas/')
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.empresa.nome = "Novo Nome"
+            self.empresa.save()
+            # Antes do commit o cache continua com a versão que as outras conexões ainda veem
+            self.assertEqual(cache_empresas.obter('default', 'lista', lambda: None)[0]['nome'], "Fornecedor")
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.client.get('/api/empresas/').data[0]['nome'], "Novo Nome")
+
+    def test_chave_separada_por_banco(self):
+        from . import cache_empresas
+        cache_empresas.obter('tests', 'lista', lambda: ['sandbox'])
+        self.assertNotEqual(self.client.get('/api/empresas/').data, ['sandbox'])
+
+    def test_contadores(self):
+        self.client.get('/api/empresas/')
+        self.client.get('/api/empresas/')
+        estatisticas = self.client.get('/api/empresas/cache/').data
+        self.assertGreaterEqual(estatisticas['hits'], 1)
+        self.assertGreaterEqual(estatisticas['misses'], 1)
+        self.assertEqual(estatisticas['ttl_segundos'], settings.CACHES['empresas']['TIMEOUT'])
+
+
+class AutenticacaoJWTTests(APITestCase):
+
+    def setUp(self):
+        caches['autenticacao'].clear()
+        self.user = User.objects.create_user(username='teste.gestor', password='senha-antiga-123')
+        token = self.client.post('/api/token/', {
+            'username': 'teste.gestor', 'password': 'senha-antiga-123',
+        }, format='json').data['access']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def consultas_auth_user(self, url):
+        with CaptureQueriesContext(connections['default']) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return sum('"auth_user"' in q['sql'] for q in ctx.captured_queries)
+
+    def test_usuario_carregado_uma_vez_e_reaproveitado(self):
+        # Middleware e DRF dividem a mesma autenticação: um SELECT em auth_user
+        self.assertEqual(self.consultas_auth_user('/api/notificacoes/'), 1)
+        # Próximas chamadas com o mesmo token vêm do cache
+        self.assertEqual(self.consultas_auth_user('/api/notificacoes/'), 0)
+
+    def test_troca_de_senha_invalida_cache(self):
+        self.consultas_auth_user('/api/notificacoes/')
+        self.client.patch(f'/api/users/{self.user.pk}/', {'password': 'senha-nova-456'}, format='json')
+        self.assertEqual(self.consultas_auth_user('/api/notificacoes/'), 1)
+
+    def test_sem_geracao_do_usuario_nao_usa_o_cache(self):
+        self.consultas_auth_user('/api/notificacoes/')
+        # Geração descartada pelo cache (LRU/TTL): as entradas dela deixam de valer
+        caches['autenticacao'].delete(f"usuario:{self.user.pk}:geracao")
+        self.assertEqual(self.consultas_auth_user('/api/notificacoes/'), 1)
+        self.assertEqual(self.consultas_auth_user('/api/notificacoes/'), 0)
+
+    def test_exclusao_invalida_cache(self):
+        self.consultas_auth_user('/api/notificacoes/')
+        self.client.delete(f'/api/users/{self.user.pk}/')
+        self.assertEqual(self.client.get('/api/notificacoes/').status_code, 401)
+
+    def test_token_invalido(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer invalido')
+        self.assertEqual(self.client.get('/api/notificacoes/').status_code, 401)
+
+
+class ContextoAssincronoTests(APITestCase):
+
+    def test_usuario_atual_isolado_por_contexto(self):
+        # Sob ASGI várias requests dividem a thread: cada uma enxerga o próprio banco
+        async def rota(username):
+            usuario_atual.set(User(username=username))
+            await asyncio.sleep(0)
+            return UserBasedRouter().db_for_read(Transacao)
+
+        async def simultaneas():
+            return await asyncio.gather(rota('a.dev'), rota('b.gestor'), rota('c.dev'))
+
+        self.assertEqual(asyncio.run(simultaneas()), ['tests', 'default', 'tests'])
+
+    def test_leituras_assincronas(self):
+        from django.urls import resolve
+        for url in ('/api/transacoes/', '/api/transacoes/resumo/',
+                    '/api/transacoes/comparativo/', '/api/notificacoes/nao_lidas/'):
+            self.assertTrue(iscoroutinefunction(resolve(url).func), url)
+        # Escritas continuam síncronas
+        self.assertFalse(iscoroutinefunction(resolve('/api/transacoes/importar/').func))
+
+
+class LeiturasAssincronasTests(TestCase):
+
+    async def test_resumo_via_asgi(self):
+        user = await User.objects.acreate(username='teste.gestor')
+        empresa = await Empresa.objects.acreate(nome="Fornecedor", cnpj="00000000000100")
+        await sync_to_async(Transacao.objects.create)(empresa=empresa, tipo='entrada', valor=Decimal('10.00'))
+        token = str(AccessToken.for_user(user))
+
+        client = AsyncClient()
+        auth = {'Authorization': f'Bearer {token}'}
+        response = await client.get('/api/transacoes/resumo/', headers=auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['qtd_pendentes'], 1)
+
+        etag = response['ETag']
+        response = await client.get('/api/transacoes/resumo/', headers={**auth, 'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+
+        response = await client.get('/api/transacoes/', {'page_size': 10}, headers=auth)
+        self.assertEqual(len(response.json()['results']), 1)
+
+
+class ConexoesTests(APITestCase):
+
+    def test_estatisticas_por_banco(self):
+        self.client.force_authenticate(User.objects.create_user(username='teste.gestor'))
+        dados = self.client.get('/api/conexoes/').data
+        self.assertEqual(set(dados), {'default', 'tests'})
+        for alias in dados.values():
+            self.assertIn(alias['modo'], ('pool', 'persistente'))
+
+    def test_so_gestor_e_dev(self):
+        self.client.force_authenticate(User.objects.create_user(username='teste.view'))
+        self.assertEqual(self.client.get('/api/conexoes/').status_code, 403)
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 403)
+
+
+@override_settings(REPLICAS_LEITURA={'replica1': 3, 'replica2': 1}, REPLICA_JANELA_ESCRITA=10)
+class ReplicasLeituraTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.roteador = UserBasedRouter()
+        self.gestor = User.objects.create_user(username='teste.gestor')
+        self.outro = User.objects.create_user(username='outro.view')
+
+    def na_requisicao(self, user, funcao, metodo='GET'):
+        # Mesmo contexto que o CurrentUserMiddleware monta para cada request
+        estado = {} if metodo == 'GET' else {'leitura': 'default'}
+        token_usuario, token_estado = usuario_atual.set(user), estado_requisicao.set(estado)
+        try:
+            return funcao()
+        finally:
+            estado_requisicao.reset(token_estado)
+            usuario_atual.reset(token_usuario)
+
+    def test_leituras_vao_para_uma_replica_por_requisicao(self):
+        def leituras():
+            return {self.roteador.db_for_read(Transacao) for _ in range(20)}
+        bancos = self.na_requisicao(self.gestor, leituras)
+        self.assertEqual(len(bancos), 1)
+        self.assertIn(bancos.pop(), ('replica1', 'replica2'))
+        # Tabelas do sistema sempre no principal
+        self.assertEqual(self.na_requisicao(self.gestor, lambda: self.roteador.db_for_read(User)), 'default')
+
+    def test_le_do_principal_depois_de_escrever(self):
+        def escreve_e_le():
+            self.roteador.db_for_read(Transacao)
+            self.assertEqual(self.roteador.db_for_write(Transacao), 'default')
+            return self.roteador.db_for_read(Transacao)
+        self.assertEqual(self.na_requisicao(self.gestor, escreve_e_le), 'default')
+
+    def test_janela_de_escrita_vale_em_qualquer_worker(self):
+        from django.http import HttpResponse
+        from django.test import RequestFactory
+        from .middleware import CurrentUserMiddleware
+
+        def requisicao(user, metodo, acao, marca=None):
+            headers = {'Authorization': f'Bearer {AccessToken.for_user(user)}'}
+            if marca:
+                headers['X-Escrita-Recente'] = marca
+            request = getattr(RequestFactory(), metodo)('/api/transacoes/', headers=headers)
+            return CurrentUserMiddleware(lambda r: HttpResponse(acao()))(request)
+
+        response = requisicao(self.gestor, 'post', lambda: self.roteador.db_for_write(Transacao))
+        marca = response['X-Escrita-Recente']
+        # Outro worker: nada em cache local, só o cabeçalho devolvido pelo frontend
+        cache.clear()
+
+        def ler():
+            return self.roteador.db_for_read(Transacao)
+        self.assertEqual(requisicao(self.gestor, 'get', ler, marca).content, b'default')
+        self.assertNotEqual(requisicao(self.gestor, 'get', ler).content, b'default')
+        # A marca é do usuário que escreveu e expira com a janela
+        self.assertNotEqual(requisicao(self.outro, 'get', ler, marca).content, b'default')
+        with override_settings(REPLICA_JANELA_ESCRITA=-1):
+            self.assertNotEqual(requisicao(self.gestor, 'get', ler, marca).content, b'default')
+
+    def test_metodos_de_escrita_leem_do_principal(self):
+        leitura = self.na_requisicao(self.outro, lambda: self.roteador.db_for_read(Transacao), metodo='PATCH')
+        self.assertEqual(leitura, 'default')
+
+    def test_sandbox_dev_ignora_replicas(self):
+        dev = User(username='teste.dev')
+        self.assertEqual(self.na_requisicao(dev, lambda: self.roteador.db_for_read(Transacao)), 'tests')
+        self.assertEqual(self.na_requisicao(dev, lambda: self.roteador.db_for_write(Transacao)), 'tests')
+
+    def test_escrita_no_principal_invalida_cache_das_replicas(self):
+        from . import cache_empresas
+        cache_empresas.obter('replica1', 'lista', lambda: ['da réplica'])
+        # O que veio de uma réplica (talvez atrasada) não é servido a quem lê do principal
+        self.assertEqual(cache_empresas.obter('default', 'lista', lambda: ['do principal']), ['do principal'])
+        with self.captureOnCommitCallbacks(execute=True):
+            cache_empresas.invalidar('default')
+        self.assertEqual(cache_empresas.obter('replica1', 'lista', lambda: ['novo']), ['novo'])
+
+    def test_comandos_de_manutencao_nao_gravam_nas_replicas(self):
+        from django.core.management import call_command
+
+        # Aqui o alias 'tests' faz o papel de réplica configurada em DATABASES
+        with override_settings(REPLICAS_LEITURA={'tests': 1}):
+            self.assertEqual(bancos_de_escrita(), ['default'])
+            saida = io.StringIO()
+            call_command('recalcular_saldos', stdout=saida)
+        self.assertIn('[default]', saida.getvalue())
+        self.assertNotIn('[tests]', saida.getvalue())
+
+
+class MetricasTests(APITestCase):
+
+    def setUp(self):
+        metricas.registro.limpar()
+        caches['empresas'].clear()
+        self.user = User.objects.create_user(username='teste.gestor')
+        self.client.force_authenticate(self.user)
+        empresa = Empresa.objects.create(nome="Fornecedor", cnpj="00000000000100")
+        Transacao.objects.create(empresa=empresa, tipo='entrada', valor=Decimal('10.00'))
+
+    def test_registra_latencia_sql_e_tamanho_por_rota(self):
+        self.client.get('/api/transacoes/')
+        self.client.get('/api/transacoes/')
+        series, status = metricas.registro.copia()
+        serie = series[('transacao-list', 'GET', 'default')]
+        self.assertEqual(serie['requisicoes'], 2)
+        self.assertEqual(serie['consultas'], 4)
+        self.assertGreater(serie['bytes'], 0)
+        self.assertEqual(sum(serie['buckets']), 2)
+        self.assertEqual(status[('transacao-list', 'GET', '200')], 2)
+
+    def test_endpoint_prometheus(self):
+        self.client.get('/api/transacoes/resumo/')
+        response = self.client.get('/api/metrics/', HTTP_ACCEPT='text/plain;version=0.0.4;q=0.3,*/*;q=0.2')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        texto = response.content.decode()
+        self.assertIn('# TYPE sigh_http_requisicao_segundos histogram', texto)
+        self.assertIn(
+            'sigh_http_requisicao_segundos_count{rota="transacao-resumo",metodo="GET",banco="default"} 1',
+            texto,
+        )
+        self.assertIn('sigh_http_requisicao_segundos_bucket{rota="transacao-resumo",metodo="GET",banco="default",le="+Inf"} 1', texto)
+        self.assertIn('sigh_sql_consultas_total{rota="transacao-resumo",metodo="GET",banco="default"} 2', texto)
+
+    @override_settings(METRICAS_TOKEN='segredo')
+    def test_token_do_prometheus(self):
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 401)
+        response = self.client.get('/api/metrics/', HTTP_AUTHORIZATION='Metricas segredo')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(METRICAS_LIMITE_LENTA_MS=1)
+    def test_loga_requests_lentas_com_consultas(self):
+        with self.assertLogs('api.metricas', level='WARNING') as logs:
+            self.client.get('/api/transacoes/', {'page_size': 1})
+        self.assertIn('/api/transacoes/?page_size=1', logs.output[0])
+        self.assertIn('SELECT', logs.output[0])
+
+
+class BaseSinteticaTests(APITestCase):
+
+    def test_gera_volume_com_baixas_e_saldos_consistentes(self):
+        from .saldos import recalcular_saldos
+        from .sintetico import gerar_base
+
+        empresas = gerar_base(20, 2000, semente=3, lote=500, anos=3, qtd_notificacoes=30)
+        self.assertEqual(len(empresas), 20)
+        self.assertEqual(Transacao.objects.count(), 2000)
+        self.assertEqual(Notificacao.objects.count(), 30)
+
+        # Toda saída corresponde a uma entrada paga da mesma nota
+        saidas = Transacao.objects.filter(tipo='saida').count()
+        self.assertEqual(saidas, Transacao.objects.filter(tipo='entrada', status='pago').count())
+        self.assertGreater(Transacao.objects.filter(tipo='entrada', status='pendente').count(), 0)
+
+        # Volume concentrado: a maior empresa tem bem mais notas que a menor
+        por_empresa = sorted(e.transacoes.count() for e in Empresa.objects.all())
+        self.assertGreater(por_empresa[-1], 5 * max(por_empresa[0], 1))
+        self.assertLessEqual(
+            (date.today() - Transacao.objects.earliest('data_entrada').data_entrada).days, 3 * 365,
+        )
+        # Saldos já reconstruídos ao final
+        self.assertEqual(recalcular_saldos(), 0)
+
+    def test_mesma_semente_duas_vezes_nao_repete_cnpj(self):
+        from .sintetico import gerar_base
+
+        gerar_base(3, 20, semente=5, lote=10, anos=1)
+        gerar_base(3, 20, semente=5, lote=10, anos=1)
+        self.assertEqual(Empresa.objects.filter(cnpj__startswith='990005').count(), 6)
+        self.assertEqual(Transacao.objects.count(), 40)
+
+    def test_comando_recusa_o_banco_principal(self):
+        from django.core.management import CommandError, call_command
+
+        # Sem --database não há padrão para cair no banco de produção
+        with self.assertRaises(CommandError):
+            call_command('gerar_dados_sinteticos', stdout=io.StringIO())
+        with self.assertRaisesMessage(CommandError, '--permitir-principal'):
+            call_command('gerar_dados_sinteticos', database='default', empresas=1, transacoes=2,
+                         notificacoes=0, stdout=io.StringIO())
+        self.assertFalse(Empresa.objects.exists())
+
+        call_command('gerar_dados_sinteticos', database='default', permitir_principal=True, empresas=2,
+                     transacoes=4, notificacoes=0, anos=1, stdout=io.StringIO())
+        self.assertEqual(Empresa.objects.count(), 2)
+
+    def test_benchmark_gera_json(self):
+        from django.core.management import call_command
+
+        User.objects.create_user(username='bench.gestor')
+        saida = io.StringIO()
+        call_command(
+            'benchmark_api', usuario='bench.gestor', clientes=1, requisicoes=3, aquecimento=0,
+            endpoints='resumo,notificacoes_nao_lidas', stdout=saida, stderr=io.StringIO(),
+        )
+        resultado = json.loads(saida.getvalue())
+        resumo = resultado['endpoints']['resumo']
+        self.assertEqual(resumo['requisicoes'], 3)
+        self.assertEqual(resumo['erros'], 0)
+        self.assertLessEqual(resumo['p50_ms'], resumo['p99_ms'])
+        self.assertIn('notificacoes_nao_lidas', resultado['endpoints'])
+
+
+class BuscaTransacoesTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.hospitalar = Empresa.objects.create(nome="Hospitalar Nordeste", cnpj="12.345.678/0001-90")
+        cls.outra = Empresa.objects.create(nome="Comercial do Vale", cnpj="98765432000110")
+        Transacao.objects.bulk_create([
+            Transacao(empresa=cls.outra, tipo='entrada', nf='004512', descricao="Seringas descartáveis", valor=10),
+            Transacao(empresa=cls.outra, tipo='entrada', nf='777001', descricao="Luvas de procedimento", valor=20),
+            Transacao(empresa=cls.hospitalar, tipo='entrada', nf='300300', descricao="Gazes", valor=30),
+            Transacao(empresa=cls.hospitalar, tipo='saida', status='pago', nf='300300', descricao="Baixa", valor=30),
+        ])
+        cls.user = User.objects.create_user(username='teste.view', password='senha-forte-123')
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def buscar(self, q, **params):
+        response = self.client.get('/api/transacoes/busca/', {'q': q, **params})
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_busca_por_descricao_com_prefixo(self):
+        response = self.buscar('seri')
+        self.assertEqual([t['nf'] for t in response.data['results']], ['004512'])
+        self.assertNotIn('busca', response.data['results'][0])
+
+    def test_busca_por_nf_e_por_empresa(self):
+        self.assertEqual([t['nf'] for t in self.buscar('777001').data['results']], ['777001'])
+
+        response = self.buscar('hospitalar')
+        self.assertEqual({t['nf'] for t in response.data['results']}, {'300300'})
+        self.assertEqual([e['id'] for e in response.data['empresas']], [self.hospitalar.pk])
+
+    def test_busca_por_cnpj_sem_pontuacao(self):
+        response = self.buscar('12345678', tipo='entrada')
+        self.assertEqual([t['descricao'] for t in response.data['results']], ['Gazes'])
+
+    def test_nf_exata_vem_primeiro_e_paginacao(self):
+        # "Comercial" casa com as duas notas da empresa; a NF exata tem prioridade
+        response = self.buscar('004512')
+        self.assertEqual(response.data['results'][0]['nf'], '004512')
+
+        response = self.buscar('comercial', page_size=1)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIsNotNone(response.data['next'])
+        segunda = self.client.get(response.data['next'])
+        self.assertEqual(len(segunda.data['results']), 1)
+        self.assertIsNone(segunda.data['next'])
+        self.assertNotIn('empresas', segunda.data)
+
+    def test_termo_curto_ou_pagina_invalida(self):
+        self.assertEqual(self.client.get('/api/transacoes/busca/', {'q': 'a'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/transacoes/busca/', {'q': 'gazes', 'page': 0}).status_code, 404)
+
+
+class EmendasTests(APITestCase):
+
+    def setUp(self):
+        self.emenda = Emenda.objects.create(nome="Emenda de Bancada", valor_alocado=Decimal('1000.00'))
+        self.empresa = Empresa.objects.create(nome="Fornecedor", cnpj="00000000000100", tipo=['Medicamentos', 'Insumos'])
+        self.empresa.emendas.add(self.emenda)
+        self.client.force_authenticate(User.objects.create_user(username='teste.gestor'))
+
+    def saida(self, valor, emenda, dias_atras=0):
+        dia = date.today() - timedelta(days=dias_atras)
+        return Transacao.objects.create(
+            empresa=self.empresa, tipo='saida', status='pago', valor=Decimal(valor),
+            data_entrada=dia, data_saida=dia, emenda=emenda,
+        )
+
+    def test_execucao_alocado_e_gasto(self):
+        propria, _ = Emenda.objects.get_or_create(nome="Recurso Próprio")
+        self.saida('300.00', self.emenda)
+        self.saida('150.00', self.emenda, dias_atras=40)
+        self.saida('99.00', propria)
+
+        with self.assertNumQueries(3):
+            dados = {e['nome']: e for e in self.client.get('/api/emendas/execucao/').data}
+        bancada = dados["Emenda de Bancada"]
+        self.assertEqual(
+            (bancada['valor_gasto'], bancada['saldo'], bancada['percentual_executado'], bancada['qtd_pagamentos']),
+            (Decimal('450.00'), Decimal('550.00'), Decimal('45.00'), 2),
+        )
+        self.assertIsNone(dados["Recurso Próprio"]['percentual_executado'])
+
+        inicio = (date.today() - timedelta(days=10)).isoformat()
+        dados = {e['nome']: e for e in self.client.get(f'/api/emendas/execucao/?saida_inicio={inicio}').data}
+        self.assertEqual(dados["Emenda de Bancada"]['valor_gasto'], Decimal('300.00'))
+
+    def test_emendas_pelo_nome_na_api(self):
+        response = self.client.patch(
+            f'/api/empresas/{self.empresa.pk}/', {'emendas': ['Emenda de Bancada', ' Emenda  Nova ']}, format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(response.data['emendas']), ['Emenda Nova', 'Emenda de Bancada'])
+        self.assertTrue(Emenda.objects.filter(nome='Emenda Nova').exists())
+
+        nota = Transacao.objects.create(empresa=self.empresa, tipo='entrada', nf='1', valor=10)
+        response = self.client.patch(f'/api/transacoes/{nota.pk}/', {'emenda_origem': 'Emenda Nova'}, format='json')
+        self.assertEqual(response.data['emenda_origem'], 'Emenda Nova')
+        nota.refresh_from_db()
+        self.assertEqual(nota.emenda.nome, 'Emenda Nova')
+
+        # Nota rejeitada na validação: a emenda nova não chega a ser criada
+        amanha = (date.today() + timedelta(days=1)).isoformat()
+        response = self.client.patch(
+            f'/api/transacoes/{nota.pk}/', {'emenda_origem': 'Emenda Rejeitada', 'data_saida': amanha}, format='json',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Emenda.objects.filter(nome='Emenda Rejeitada').exists())
+
+    def test_nome_normalizado_antes_da_unicidade(self):
+        response = self.client.post('/api/emendas/', {'nome': ' Emenda  de Bancada '}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('nome', response.data)
+
+        response = self.client.post('/api/emendas/', {'nome': ' Emenda   Nova'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['nome'], 'Emenda Nova')
+        response = self.client.patch(f'/api/emendas/{self.emenda.pk}/', {'nome': 'Emenda  Nova'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_filtro_de_empresas_por_ramo(self):
+        Empresa.objects.create(nome="Laboratório", cnpj="00000000000200", tipo=['Laboratório'])
+        self.assertEqual([e['nome'] for e in self.client.get('/api/empresas/?ramo=Insumos').data], ['Fornecedor'])
+        self.assertEqual(len(self.client.get('/api/empresas/?ramo=Insumos,Laboratório').data), 0)
+        self.assertEqual(len(self.client.get(f'/api/empresas/?emenda={self.emenda.pk}').data), 1)
+
+    def test_emenda_com_pagamentos_nao_e_excluida(self):
+        self.saida('10.00', self.emenda)
+        self.assertEqual(self.client.delete(f'/api/emendas/{self.emenda.pk}/').status_code, 409)
+
+
+class ResumoMensalTests(APITestCase):
+
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nome="Fornecedor", cnpj="00000000000100")
+        self.outra = Empresa.objects.create(nome="Outra", cnpj="00000000000200")
+        self.client.force_authenticate(User.objects.create_user(username='teste.view'))
+
+    def nota(self, dia, valor, **campos):
+        return Transacao.objects.create(
+            empresa=campos.pop('empresa', self.empresa), tipo=campos.pop('tipo', 'entrada'),
+            valor=Decimal(valor), data_entrada=dia, **campos,
+        )
+
+    def test_mantido_a_cada_escrita(self):
+        from .models import ResumoMensal
+        from .resumo_mensal import recalcular
+
+        nota = self.nota(date(2024, 1, 10), '100.00', tipo_material='insumo')
+        self.nota(date(2024, 1, 15), '50.00', tipo_material='insumo')
+        linha = ResumoMensal.objects.get()
+        self.assertEqual((linha.mes, linha.valor_total, linha.quantidade), (date(2024, 1, 1), Decimal('150.00'), 2))
+
+        # Muda mês, empresa e material de uma vez: sai de uma linha e entra em outra
+        nota.data_entrada, nota.empresa, nota.tipo_material = date(2024, 2, 1), self.outra, None
+        nota.save()
+        self.assertEqual(ResumoMensal.objects.get(empresa=self.outra).tipo_material, '')
+        Transacao.objects.filter(valor=Decimal('50.00')).get().delete()
+        self.assertEqual(ResumoMensal.objects.get(mes=date(2024, 1, 1)).quantidade, 0)
+        self.assertEqual(recalcular(), 0)
+
+        ResumoMensal.objects.filter(empresa=self.outra).update(valor_total=1)
+        self.assertEqual(recalcular(inicio=date(2024, 2, 1), fim=date(2024, 2, 1)), 1)
+        self.assertEqual(ResumoMensal.objects.get(empresa=self.outra).valor_total, Decimal('100.00'))
+
+    def test_relatorios_leem_do_resumo_quando_possivel(self):
+        self.nota(date(2024, 1, 5), '100.00', status='pendente', destino_entrada='hospital')
+        self.nota(date(2024, 1, 20), '40.00', tipo='saida', status='pago', nf='X1')
+        self.nota(date(2024, 2, 3), '150.00', status='pago', empresa=self.outra)
+
+        def consulta(url):
+            with CaptureQueriesContext(connections['default']) as consultas:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            return response.data, 'api_resumomensal' in consultas[-1]['sql']
+
+        dados, do_resumo = consulta(
+            f'/api/transacoes/resumo/?empresa={self.empresa.pk}&data_inicio=2024-01-01&data_fim=2024-01-31'
+        )
+        self.assertTrue(do_resumo)
+        self.assertEqual(
+            (dados['total_entradas'], dados['total_saidas'], dados['saldo_devedor'], dados['qtd_pendentes']),
+            (Decimal('100.00'), Decimal('40.00'), Decimal('100.00'), 1),
+        )
+
+        url = '/api/transacoes/comparativo/?periodos=2024-01,2024-02&dimensoes=empresa,destino_entrada'
+        dados, do_resumo = consulta(url)
+        self.assertTrue(do_resumo)
+        self.assertEqual(dados['totais']['periodos']['2024-02']['entradas'], Decimal('150.00'))
+        self.assertIn(None, {g['destino_entrada'] for g in dados['grupos']})
+
+        # Filtros que o resumo não tem (NF, dia no meio do mês) leem as transações
+        dados, do_resumo = consulta('/api/transacoes/resumo/?nf=X1')
+        self.assertFalse(do_resumo)
+        self.assertEqual(dados['qtd_saidas'], 1)
+        self.assertFalse(consulta('/api/transacoes/resumo/?data_inicio=2024-01-10')[1])
+
+
+@override_settings(TAREFAS_WORKERS=0)
+class TarefasTests(APITestCase):
+    """Sem pool (TAREFAS_WORKERS=0) a tarefa executa logo após o commit, na própria request."""
+
+    @classmethod
+    def setUpTestData(cls):
+        popular_base(qtd_empresas=3, qtd_transacoes=300)
+
+    def setUp(self):
+        self.usuario = User.objects.create_user(username='teste.view')
+        self.client.force_authenticate(self.usuario)
+        diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(diretorio.cleanup)
+        configuracao = self.settings(TAREFAS_DIR=diretorio.name)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+
+    def baixar(self, tarefa_id):
+        response = self.client.get(f"/api/tarefas/{tarefa_id}/resultado/")
+        # Consumir o streaming_content já fecha o arquivo
+        return response, b''.join(response.streaming_content)
+
+    def submeter(self, tarefa, **parametros):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post('/api/tarefas/', {'tipo': tarefa, 'parametros': parametros}, format='json')
+
+    def test_exportacao_em_segundo_plano_com_resultado_reaproveitado(self):
+        response = self.submeter('exportacao', tipo='saida')
+        self.assertEqual(response.status_code, 202)
+        status = self.client.get(f"/api/tarefas/{response.data['id']}/").data
+        self.assertEqual(status['status'], 'concluida')
+        self.assertIsNotNone(status['expira_em'])
+
+        download, conteudo = self.baixar(response.data['id'])
+        self.assertEqual(download['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('attachment;', download['Content-Disposition'])
+        sincrono = b''.join(self.client.get('/api/transacoes/exportar/?tipo=saida').streaming_content)
+        self.assertEqual(conteudo, sincrono)
+
+        # Mesmo pedido sobre os mesmos dados: a mesma tarefa; depois de uma escrita, outra
+        repetido = self.submeter('exportacao', tipo='saida')
+        self.assertEqual((repetido.status_code, repetido.data['id']), (200, response.data['id']))
+        with self.captureOnCommitCallbacks(execute=True):
+            Transacao.objects.create(empresa=Empresa.objects.first(), tipo='saida', valor=Decimal('1.00'))
+        self.assertNotEqual(self.submeter('exportacao', tipo='saida').data['id'], response.data['id'])
+
+    def test_comparativo_igual_ao_sincrono(self):
+        parametros = {'periodos': '2022-01,2022-02', 'dimensoes': 'empresa'}
+        tarefa = self.submeter('comparativo', **parametros).data
+        _, conteudo = self.baixar(tarefa['id'])
+        sincrono = self.client.get('/api/transacoes/comparativo/', parametros, HTTP_ACCEPT='application/json')
+        self.assertEqual(json.loads(conteudo), json.loads(sincrono.content))
+
+    def test_resultado_acima_do_limite_falha_e_arquivo_expira_junto(self):
+        from . import tarefas
+        from .models import Tarefa
+
+        with self.settings(TAREFAS_TAMANHO_MAXIMO=1024):
+            grande = self.submeter('exportacao').data
+        grande = self.client.get(f"/api/tarefas/{grande['id']}/").data
+        self.assertEqual(grande['status'], 'erro')
+        self.assertIn('MB', grande['erro'])
+
+        pronta = Tarefa.objects.get(pk=self.submeter('exportacao', tipo='saida').data['id'])
+        self.assertTrue(tarefas.armazenamento().exists(pronta.arquivo))
+        Tarefa.objects.filter(pk=pronta.pk).update(concluido_em=timezone.now() - timedelta(days=1))
+        tarefas.limpar_expiradas('default')
+        self.assertFalse(Tarefa.objects.filter(pk=pronta.pk).exists())
+        self.assertFalse(tarefas.armazenamento().exists(pronta.arquivo))
+
+    def test_validacao_status_e_dono(self):
+        self.assertEqual(self.submeter('exportacao', formato='pdf').status_code, 400)
+        self.assertEqual(self.submeter('comparativo', periodos='2024-01').status_code, 400)
+        self.assertEqual(self.submeter('outro').status_code, 400)
+
+        from .models import Tarefa
+        pendente = Tarefa.objects.create(usuario_id=self.usuario.pk, tipo='exportacao', chave='x')
+        self.assertEqual(self.client.get(f'/api/tarefas/{pendente.pk}/').data['status'], 'pendente')
+        self.assertEqual(self.client.get(f'/api/tarefas/{pendente.pk}/resultado/').status_code, 409)
+
+        self.client.force_authenticate(User.objects.create_user(username='outro.view'))
+        self.assertEqual(self.client.get(f'/api/tarefas/{pendente.pk}/').status_code, 404)
+
+    def test_fila_executa_pendentes_e_remove_expiradas(self):
+        from . import tarefas
+        from .models import Tarefa
+        Tarefa.objects.create(usuario_id=self.usuario.pk, tipo='comparativo', chave='a',
+                              parametros={'periodos': '2022-01,2022-02'})
+        Tarefa.objects.create(usuario_id=self.usuario.pk, tipo='exportacao', chave='b', status='concluida',
+                              concluido_em=timezone.now() - timedelta(days=1))
+        antiga = Tarefa.objects.create(usuario_id=self.usuario.pk, tipo='exportacao', chave='c')
+        Tarefa.objects.filter(pk=antiga.pk).update(criado_em=timezone.now() - timedelta(days=1))
+        self.assertEqual(tarefas.processar_pendentes('default'), 1)
+        # A pendente esquecida na fila vira erro em vez de rodar com um dia de atraso
+        self.assertEqual(
+            list(Tarefa.objects.order_by('chave').values_list('chave', 'status')),
+            [('a', 'concluida'), ('c', 'erro')],
+        )
+
+    def test_pedido_repetido_acorda_a_fila(self):
+        # Commit sem os callbacks: como se o worker avisado tivesse caído
+        with self.captureOnCommitCallbacks(execute=False):
+            primeira = self.client.post('/api/tarefas/', {'tipo': 'exportacao', 'parametros': {}}, format='json')
+        self.assertEqual(self.client.get(f"/api/tarefas/{primeira.data['id']}/").data['status'], 'pendente')
+
+        repetido = self.submeter('exportacao')
+        self.assertEqual((repetido.status_code, repetido.data['id']), (200, primeira.data['id']))
+        self.assertEqual(self.client.get(f"/api/tarefas/{primeira.data['id']}/").data['status'], 'concluida')
+
+    def test_executa_no_banco_do_usuario(self):
+        from . import tarefas
+        dev = User(username='teste.dev')
+        with tarefas.contexto_usuario(dev):
+            self.assertEqual(UserBasedRouter().db_for_read(Transacao), 'tests')
+        self.assertIsNone(usuario_atual.get())
+
+
+class EventosTests(TestCase):
+
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nome="Fornecedor", cnpj="00000000000100")
+
+    def test_publica_no_commit_so_os_campos_alterados(self):
+        from unittest import mock
+        from . import eventos
+
+        publicados = []
+        with mock.patch.object(eventos.transmissor, 'publicar', side_effect=publicados.append):
+            with self.captureOnCommitCallbacks(execute=True):
+                nota = Transacao.objects.create(empresa=self.empresa, tipo='entrada', valor=Decimal('10.00'))
+                nota.nf = '123'
+                nota.save()
+                self.assertEqual(publicados, [])
+            with self.captureOnCommitCallbacks(execute=True):
+                nota.save()  # nada mudou: sem evento
+                Notificacao.objects.create(titulo="Aviso", mensagem="Teste", alvo='gestor')
+                nota.delete()
+
+        resumo = [(e['tabela'], e['acao'], e.get('campos')) for e in publicados]
+        self.assertEqual(resumo[0][:2], ('transacao', 'criado'))
+        self.assertEqual(resumo[0][2]['valor'], Decimal('10.00'))
+        self.assertEqual(resumo[1], ('transacao', 'alterado', {'nf': '123'}))
+        self.assertEqual(resumo[2][:2], ('notificacao', 'criado'))
+        self.assertEqual(publicados[2]['alvo'], 'gestor')
+        self.assertEqual(resumo[3], ('transacao', 'excluido', None))
+        self.assertEqual({e['banco'] for e in publicados}, {'default'})
+
+    async def test_filtra_por_banco_e_papel(self):
+        from . import eventos
+
+        view = eventos.transmissor.inscrever('default', 'view')
+        dev = eventos.transmissor.inscrever('tests', 'dev')
+        try:
+            eventos.transmissor.publicar({'tabela': 'transacao', 'acao': 'criado', 'id': 1, 'banco': 'default'})
+            eventos.transmissor.publicar({'tabela': 'notificacao', 'acao': 'criado', 'id': 2, 'banco': 'default', 'alvo': 'gestor'})
+            eventos.transmissor.publicar({'tabela': 'notificacao', 'acao': 'criado', 'id': 3, 'banco': 'tests', 'alvo': 'todos'})
+            await asyncio.sleep(0)
+            self.assertEqual([view.fila.get_nowait()['id'] for _ in range(view.fila.qsize())], [1])
+            self.assertEqual([dev.fila.get_nowait()['id'] for _ in range(dev.fila.qsize())], [3])
+        finally:
+            eventos.transmissor.cancelar(view)
+            eventos.transmissor.cancelar(dev)
+
+    async def test_fluxo_sse_via_asgi(self):
+        from . import eventos
+
+        user = await User.objects.acreate(username='teste.view')
+        auth = {'Authorization': f'Bearer {AccessToken.for_user(user)}'}
+        response = await AsyncClient().get('/api/eventos/', headers={**auth, 'Accept': 'text/event-stream'})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+
+        partes = aiter(response.streaming_content)
+        self.assertIn(b'event: conexao', await anext(partes))
+        eventos.transmissor.publicar(
+            {'tabela': 'empresa', 'acao': 'alterado', 'id': 7, 'campos': {'nome': 'Nova'}, 'banco': 'default'},
+        )
+        self.assertEqual(
+            await anext(partes),
+            b'event: empresa\ndata: {"tabela":"empresa","acao":"alterado","id":7,"campos":{"nome":"Nova"}}\n\n',
+        )
+
+        # Cliente desconectou: o servidor ASGI cancela a espera e a inscrição sai do transmissor
+        espera = asyncio.ensure_future(anext(partes))
+        await asyncio.sleep(0)
+        espera.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await espera
+        self.assertEqual(eventos.transmissor.quantidade(), 0)
+
+    def test_wsgi_recusa_o_fluxo(self):
+        user = User.objects.create_user(username='teste.view')
+        response = self.client.get('/api/eventos/', headers={'Authorization': f'Bearer {AccessToken.for_user(user)}'})
+        self.assertEqual(response.status_code, 503)
+
+
+@override_settings(SINCRONIZACAO_MARGEM=0)
+class SincronizacaoTests(APITestCase):
+    """Sem margem o token é o instante da chamada, então cada delta vem sem repetições."""
+
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nome="Fornecedor", cnpj="00000000000100")
+        self.outra = Empresa.objects.create(nome="Outra", cnpj="00000000000200")
+        self.client.force_authenticate(User.objects.create_user(username='teste.view'))
+
+    def nota(self, valor='10.00', **campos):
+        return Transacao.objects.create(
+            empresa=campos.pop('empresa', self.empresa), tipo='entrada', valor=Decimal(valor), **campos,
+        )
+
+    def sincronizar(self, recurso='transacoes', **params):
+        response = self.client.get(f'/api/{recurso}/sincronizar/', params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def test_carga_completa_e_depois_so_o_delta(self):
+        a, b, c = self.nota(), self.nota(), self.nota()
+        dados = self.sincronizar()
+        self.assertTrue(dados['completo'])
+        self.assertFalse(dados['mais'])
+        self.assertEqual([t['id'] for t in dados['alterados']], [a.pk, b.pk, c.pk])
+
+        a.nf = '123'
+        a.save()
+        excluida = b.pk
+        b.delete()
+        d = self.nota()
+        delta = self.sincronizar(since=dados['token'])
+        self.assertFalse(delta['completo'])
+        self.assertEqual([t['id'] for t in delta['alterados']], [a.pk, d.pk])
+        self.assertEqual(delta['alterados'][0]['nf'], '123')
+        self.assertEqual(delta['excluidos'], [excluida])
+
+        vazio = self.sincronizar(since=delta['token'])
+        self.assertEqual((vazio['alterados'], vazio['excluidos']), ([], []))
+
+    def test_paginas_e_exclusoes_so_no_fim(self):
+        notas = [self.nota() for _ in range(3)]
+        token = self.sincronizar()['token']
+        for nota in notas[:2]:
+            nota.save()
+        excluida = notas[2].pk
+        notas[2].delete()
+
+        primeira = self.sincronizar(since=token, limite=1)
+        self.assertTrue(primeira['mais'])
+        self.assertEqual(([t['id'] for t in primeira['alterados']], primeira['excluidos']), ([notas[0].pk], []))
+        segunda = self.sincronizar(since=primeira['token'], limite=1)
+        self.assertFalse(segunda['mais'])
+        self.assertEqual(([t['id'] for t in segunda['alterados']], segunda['excluidos']), ([notas[1].pk], [excluida]))
+
+    def test_token_invalido_ou_expirado(self):
+        from .sincronizacao import codificar
+
+        response = self.client.get('/api/transacoes/sincronizar/', {'since': 'xyz'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('since', response.data)
+
+        # Exclusões mais antigas que a retenção podem já ter sido apagadas: carga completa
+        nota = self.nota()
+        antigo = timezone.now() - timedelta(days=60)
+        dados = self.sincronizar(since=codificar(antigo, 0, antigo))
+        self.assertTrue(dados['completo'])
+        self.assertEqual([t['id'] for t in dados['alterados']], [nota.pk])
+
+    def test_nomes_e_saldo_exibidos_tambem_contam(self):
+        nota = self.nota(emenda=Emenda.objects.create(nome="Emenda A"))
+        self.nota(empresa=self.outra)
+        token_notas = self.sincronizar()['token']
+        token_empresas = self.sincronizar('empresas')['token']
+
+        # nome_empresa e emenda_origem aparecem em cada nota
+        self.empresa.nome = "Fornecedor Novo"
+        self.empresa.save()
+        delta = self.sincronizar(since=token_notas)
+        self.assertEqual([(t['id'], t['nome_empresa']) for t in delta['alterados']], [(nota.pk, "Fornecedor Novo")])
+        nota.emenda.nome = "Emenda B"
+        nota.emenda.save()
+        delta = self.sincronizar(since=delta['token'])
+        self.assertEqual([t['emenda_origem'] for t in delta['alterados']], ["Emenda B"])
+
+        # Uma nota nova muda o saldo inline da empresa
+        delta = self.sincronizar('empresas', since=token_empresas)
+        token_empresas = delta['token']
+        self.nota('5.00', empresa=self.outra)
+        delta = self.sincronizar('empresas', since=token_empresas)
+        self.assertEqual([e['id'] for e in delta['alterados']], [self.outra.pk])
+        self.assertEqual(delta['alterados'][0]['saldo']['total_entradas'], '15.00')
+
+
+class ArquivoTests(APITestCase):
+
+    def setUp(self):
+        from .arquivo import corte
+
+        self.empresa = Empresa.objects.create(nome="Fornecedor", cnpj="00000000000100")
+        self.client.force_authenticate(User.objects.create_user(username='teste.gestor'))
+        antigo = corte() - timedelta(days=200)
+        self.pagas = [self.nota(antigo, '100.00', status='pago', data_saida=antigo) for _ in range(3)]
+        self.pagas.append(self.nota(antigo, '30.00', tipo='saida', status='pago', data_saida=antigo,
+                                    emenda=Emenda.objects.create(nome="Emenda A")))
+        self.pendente_antiga = self.nota(antigo, '50.00')
+        self.recente = self.nota(corte(), '70.00', status='pago', data_saida=corte())
+
+    def nota(self, dia, valor, **campos):
+        return Transacao.objects.create(
+            empresa=self.empresa, tipo=campos.pop('tipo', 'entrada'), valor=Decimal(valor), data_entrada=dia, **campos,
+        )
+
+    def arquivar(self, **kwargs):
+        from .arquivo import arquivar
+
+        return arquivar(lote=kwargs.pop('lote', 3), **kwargs)
+
+    def test_move_so_pagas_antigas_sem_mudar_saldo_nem_resumo(self):
+        from .models import SaldoEmpresa, TransacaoArquivo
+        from .resumo_mensal import recalcular
+        from .saldos import recalcular_saldos
+
+        saldo = SaldoEmpresa.objects.values().get()
+        self.assertEqual(self.arquivar(), 4)  # dois lotes
+        self.assertEqual(
+            set(TransacaoArquivo.objects.values_list('pk', flat=True)), {t.pk for t in self.pagas},
+        )
+        self.assertEqual(
+            set(Transacao.objects.values_list('pk', flat=True)), {self.pendente_antiga.pk, self.recente.pk},
+        )
+        self.assertEqual(SaldoEmpresa.objects.values().get(), saldo)
+        self.assertEqual((recalcular_saldos(), recalcular()), (0, 0))
+
+        with self.assertRaises(ValueError):
+            self.arquivar(antes=date.today())
+
+    def test_leituras_alcancam_o_arquivo_so_quando_preciso(self):
+        from .arquivo import corte
+
+        self.arquivar()
+
+        def listar(**params):
+            with CaptureQueriesContext(connections['default']) as consultas:
+                response = self.client.get('/api/transacoes/', params)
+            self.assertEqual(response.status_code, 200)
+            return response.data, 'api_transacao_historico' in consultas[-1]['sql']
+
+        dados, com_arquivo = listar()
+        self.assertTrue(com_arquivo)
+        self.assertEqual(len(dados), 6)
+        self.assertEqual(sum(t['arquivada'] for t in dados), 4)
+        # Período recente e pendências: só a tabela ativa
+        dados, com_arquivo = listar(data_inicio=corte().isoformat())
+        self.assertEqual(([t['id'] for t in dados], com_arquivo), ([self.recente.pk], False))
+        self.assertFalse(listar(status='pendente')[1])
+
+        response = self.client.get('/api/emendas/execucao/')
+        self.assertEqual(response.data[0]['valor_gasto'], Decimal('30.00'))
+        arquivada = self.pagas[0]
+        self.assertTrue(self.client.get(f'/api/transacoes/{arquivada.pk}/').data['arquivada'])
+        response = self.client.patch(f'/api/transacoes/{arquivada.pk}/', {'nf': '1'}, format='json')
+        self.assertEqual(response.status_code, 409)
+        # Lida antes do arquivamento e gravada depois: não volta para a tabela ativa
+        from .exceptions import Conflito
+
+        with self.assertRaises(Conflito):
+            arquivada.save()
+        self.assertFalse(Transacao.objects.filter(pk=arquivada.pk).exists())
+
+    def test_restaurar_depois_de_aumentar_os_anos_ativos(self):
+        from .arquivo import restaurar
+        from .models import TransacaoArquivo
+
+        self.arquivar()
+        with override_settings(ARQUIVO_ANOS_ATIVOS=10):
+            self.assertEqual(restaurar(), 4)
+        self.assertFalse(TransacaoArquivo.objects.exists())
+        self.assertEqual(Transacao.objects.count(), 6)
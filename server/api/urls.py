@@ -1,12 +1,17 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import EmpresaViewSet, TransacaoViewSet, UserViewSet, NotificacaoViewSet
+from .views import EmendaViewSet, EmpresaViewSet, TransacaoViewSet, UserViewSet, NotificacaoViewSet, TarefaViewSet, EventosViewSet, ConexoesViewSet, MetricasViewSet
 
 router = DefaultRouter()
 router.register(r'empresas', EmpresaViewSet)
 router.register(r'transacoes', TransacaoViewSet)
+router.register(r'emendas', EmendaViewSet)
+router.register(r'tarefas', TarefaViewSet, basename='tarefas')
+router.register(r'eventos', EventosViewSet, basename='eventos')
 router.register(r'users', UserViewSet)
 router.register(r'notificacoes', NotificacaoViewSet)
+router.register(r'conexoes', ConexoesViewSet, basename='conexoes')
+router.register(r'metrics', MetricasViewSet, basename='metrics')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -0,0 +1,52 @@
+import hashlib
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .db_router import banco_principal
+from .models import VersaoTabela
+
+
+def marcar_alteracao(using, *tabelas):
+    """
+    Avança o marcador das tabelas alteradas depois do commit da escrita (na
+    hora, fora de uma transação), cada um em seu próprio comando curto: dentro
+    da transação, a linha do marcador ficaria travada até o commit e todas as
+    escritas na tabela passariam uma a uma por ela.
+
+    Em troca, entre o commit e o avanço uma leitura pode levar os dados novos
+    com o ETag antigo (a próxima consulta recebe a resposta inteira), e se o
+    processo cair nesse intervalo o marcador só avança na próxima escrita.
+    """
+    transaction.on_commit(lambda: _avancar(using, tabelas), using=using)
+
+
+def _avancar(using, tabelas):
+    agora = timezone.now()
+    for tabela in tabelas:
+        marcadores = VersaoTabela.objects.using(using).filter(pk=tabela)
+        if marcadores.update(versao=F('versao') + 1, alterado_em=agora):
+            continue
+        try:
+            with transaction.atomic(using=using):
+                VersaoTabela.objects.using(using).create(tabela=tabela, versao=1, alterado_em=agora)
+        except IntegrityError:
+            marcadores.update(versao=F('versao') + 1, alterado_em=agora)
+
+
+def validadores(using, tabelas, chave=''):
+    """
+    (etag, last_modified) a partir dos marcadores das tabelas, com uma única consulta.
+    A chave diferencia respostas que dependem de outros dados (query string, usuário...).
+    """
+    versoes = dict(
+        (tabela, (versao, alterado_em))
+        for tabela, versao, alterado_em in VersaoTabela.objects.using(using)
+        .filter(pk__in=tabelas).values_list('tabela', 'versao', 'alterado_em')
+    )
+    # Mesma versão gera o mesmo ETag em qualquer réplica
+    partes = [banco_principal(using), chave] + [f"{t}:{versoes.get(t, (0, None))[0]}" for t in sorted(tabelas)]
+    etag = '"%s"' % hashlib.sha1('|'.join(partes).encode()).hexdigest()
+    datas = [alterado_em for _, alterado_em in versoes.values() if alterado_em]
+    return etag, max(datas) if datas else None
@@ -1,26 +1,422 @@
-from rest_framework import viewsets, status
+from rest_framework import mixins, viewsets, status
+from rest_framework.generics import get_object_or_404
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import JSONRenderer
 from django.contrib.auth.models import User
-from .models import Empresa, Transacao, Notificacao  
-from .serializers import EmpresaSerializer, TransacaoSerializer, UserSerializer, NotificacaoSerializer # <--- Adicionado NotificacaoSerializer
-from .permissions import IsGestorOrDevOrReadOnly
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, Http404, StreamingHttpResponse
+from datetime import date
+from django.db import OperationalError, router, transaction
+from django.db.models import DecimalField, Exists, OuterRef, ProtectedError, Q, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+from .models import Emenda, Empresa, Transacao, TransacaoArquivo, Notificacao, LeituraNotificacao, Tarefa
+from .serializers import (
+    EmendaSerializer, EmpresaSerializer, TransacaoSerializer, UserSerializer, NotificacaoSerializer,
+    BaixaSerializer, MarcarLidasSerializer, TarefaSerializer,
+)
+from .permissions import IsGestorOrDevOrReadOnly, PodeLerMetricas, papel_do_usuario
+from .filters import filtrar_empresas, filtrar_transacoes
+from .pagination import BuscaPagination, KeysetPagination
+from .exceptions import Conflito
+from .importacao import importar_transacoes, ler_csv
+from .exportacao import FORMATOS, linhas as linhas_exportacao
+from .relatorios import acomparar_periodos, ler_parametros
+from .busca import buscar_transacoes
+from .condicional import GetCondicionalMixin
+from .sincronizacao import SincronizacaoMixin
+from .assincrono import ViewSetAssincronoMixin, em_partes
+from .authentication import invalidar_usuario
+from .db_router import banco_principal
+from . import arquivo, cache_empresas, emendas, eventos, metricas, resumo_mensal, tarefas, versoes
+from .conexoes import estatisticas_conexoes
 
-class EmpresaViewSet(viewsets.ModelViewSet):
-    queryset = Empresa.objects.all()
+class EmpresaViewSet(SincronizacaoMixin, GetCondicionalMixin, viewsets.ModelViewSet):
+    queryset = Empresa.objects.select_related('saldo').prefetch_related('emendas')
     serializer_class = EmpresaSerializer
     permission_classes = [IsGestorOrDevOrReadOnly] 
+    # O saldo inline muda a cada transação; as emendas aparecem pelo nome
+    tabelas_condicionais = {'list': ('empresa', 'transacao', 'emenda')}
+    versao_sincronizacao = Greatest('atualizado_em', 'saldo__atualizado_em')
 
-class TransacaoViewSet(viewsets.ModelViewSet):
-    queryset = Transacao.objects.all()
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            queryset = filtrar_empresas(queryset, self.request.query_params)
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params:
+            return super().list(request, *args, **kwargs)
+        dados = cache_empresas.obter(
+            router.db_for_read(Empresa), 'lista',
+            lambda: list(self.get_serializer(self.get_queryset(), many=True).data),
+        )
+        return Response(dados)
+
+    def retrieve(self, request, *args, **kwargs):
+        pk = kwargs[self.lookup_field]
+        dados = cache_empresas.obter(
+            router.db_for_read(Empresa), f"detalhe:{pk}",
+            lambda: self.get_serializer(self.get_object()).data,
+        )
+        return Response(dados)
+
+    @action(detail=False, methods=['get'])
+    def cache(self, request):
+        """Contadores de acerto/erro do cache de empresas, para ajuste de TTL e tamanho."""
+        return Response(cache_empresas.estatisticas())
+
+class TransacaoViewSet(ViewSetAssincronoMixin, SincronizacaoMixin, GetCondicionalMixin, viewsets.ModelViewSet):
+    # select_related evita uma consulta extra por linha ao ler empresa.nome no serializer
+    queryset = Transacao.objects.select_related('empresa', 'emenda')
     serializer_class = TransacaoSerializer
     permission_classes = [IsGestorOrDevOrReadOnly] 
+    pagination_class = KeysetPagination
+    # Cada nota mostra o nome da empresa e o da emenda (emenda_origem)
+    tabelas_condicionais = {
+        acao: ('transacao', 'empresa', 'emenda') for acao in ('list', 'resumo', 'comparativo', 'busca')
+    }
+
+    def get_queryset(self):
+        if self.action in ('list', 'retrieve', 'resumo', 'exportar', 'comparativo', 'busca', 'sincronizar'):
+            # Leituras: só a tabela ativa quando o período é recente, senão com o arquivo
+            queryset = arquivo.transacoes(self.request.query_params).select_related('empresa', 'emenda')
+        else:
+            queryset = super().get_queryset()
+        if self.action in ('list', 'resumo', 'exportar', 'comparativo', 'busca'):
+            queryset = filtrar_transacoes(queryset, self.request.query_params)
+        return queryset
+
+    def get_object(self):
+        try:
+            return super().get_object()
+        except Http404:
+            # Alteração/exclusão de nota arquivada: existe, mas é somente leitura
+            if TransacaoArquivo.objects.filter(pk=self.kwargs[self.lookup_field]).exists():
+                raise Conflito("Esta nota pertence a um exercício arquivado e não pode ser alterada.")
+            raise
+
+    async def list(self, request, *args, **kwargs):
+        # Leitura mais frequente do frontend: assíncrona para não prender uma thread por usuário
+        queryset = self.filter_queryset(self.get_queryset())
+        pagina = await self.paginator.apaginate_queryset(queryset, request, view=self)
+        if pagina is not None:
+            return self.get_paginated_response(self.get_serializer(pagina, many=True).data)
+        transacoes = [t async for t in queryset]
+        return Response(self.get_serializer(transacoes, many=True).data)
+
+    @action(detail=False, methods=['get'])
+    async def resumo(self, request):
+        """
+        KPIs do Dashboard calculados em uma única consulta agregada.
+        Aceita os mesmos filtros da listagem. Lê do resumo mensal quando
+        os filtros permitem (ver api.resumo_mensal.fonte).
+        """
+        fonte = resumo_mensal.fonte(self.get_queryset(), request.query_params)
+        valor = fonte.campo_valor
+        zero = Value(0, output_field=DecimalField(max_digits=15, decimal_places=2))
+        entrada = Q(tipo='entrada')
+        saida = Q(tipo='saida')
+        pendente = Q(tipo='entrada', status='pendente')
+
+        totais = await fonte.queryset.aaggregate(
+            total_entradas=Coalesce(Sum(valor, filter=entrada), zero),
+            total_saidas=Coalesce(Sum(valor, filter=saida), zero),
+            saldo_devedor=Coalesce(Sum(valor, filter=pendente), zero),
+            qtd_entradas=fonte.quantidade(filter=entrada),
+            qtd_saidas=fonte.quantidade(filter=saida),
+            qtd_pendentes=fonte.quantidade(filter=pendente),
+        )
+        return Response(totais)
+
+    @action(detail=False, methods=['get'])
+    async def comparativo(self, request):
+        """
+        Comparação entre períodos: ?agrupamento=mes|trimestre&periodos=2024-01,2025-01
+        &dimensoes=empresa,tipo_material,destino_entrada. Os totais são agrupados
+        no banco (no resumo mensal, quando os filtros permitem); aceita também
+        os filtros da listagem.
+        """
+        agrupamento, periodos, dimensoes = ler_parametros(request.query_params)
+        fonte = resumo_mensal.fonte(self.get_queryset().select_related(None), request.query_params)
+        return Response(await acomparar_periodos(fonte, agrupamento, periodos, dimensoes))
+
+    @action(detail=False, methods=['get'], pagination_class=BuscaPagination)
+    def busca(self, request):
+        """
+        Busca textual: ?q= em NF e descrição (vetor de busca indexado) e no
+        nome/CNPJ da empresa, com os resultados por relevância, paginados
+        (?page, ?page_size). Aceita também os filtros da listagem.
+        A primeira página traz as empresas encontradas em 'empresas'.
+        """
+        texto = request.query_params.get('q', '').strip()
+        if len(texto) < 2:
+            raise ValidationError({'q': "Informe ao menos 2 caracteres."})
+
+        queryset, empresas = buscar_transacoes(self.get_queryset(), texto)
+        pagina = self.paginate_queryset(queryset)
+        response = self.get_paginated_response(self.get_serializer(pagina, many=True).data)
+        if self.paginator.numero == 1:
+            response.data['empresas'] = [
+                {'id': empresa.pk, 'nome': empresa.nome, 'cnpj': empresa.cnpj} for empresa in empresas
+            ]
+        return response
+
+    @action(detail=False, methods=['get'])
+    def exportar(self, request):
+        """
+        Exporta as transações (com nome e CNPJ da empresa) em CSV ou XLSX,
+        aceitando os mesmos filtros da listagem. A resposta é enviada em partes
+        enquanto a consulta é lida, então a memória não cresce com o volume.
+        Para volumes grandes, /tarefas/ (tipo 'exportacao') gera o arquivo fora da request.
+        """
+        formato = request.query_params.get('formato', 'csv')
+        if formato not in FORMATOS:
+            raise ValidationError({'formato': f"Formatos disponíveis: {', '.join(FORMATOS)}."})
+        gerar, content_type = FORMATOS[formato]
+
+        queryset = self.get_queryset()
+        # O gerador roda depois que o middleware limpa o usuário atual:
+        # fixa agora o banco escolhido pelo roteador para este usuário.
+        queryset = queryset.using(queryset.db)
+
+        conteudo = gerar(linhas_exportacao(queryset))
+        if isinstance(request._request, ASGIRequest):
+            # Sob ASGI o iterador síncrono seria lido inteiro antes do envio
+            conteudo = em_partes(conteudo)
+        response = StreamingHttpResponse(conteudo, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="transacoes_{date.today().isoformat()}.{formato}"'
+        return response
+
+    @action(detail=False, methods=['post'])
+    def importar(self, request):
+        """
+        Importação em lote de notas. Aceita um arquivo CSV no campo 'arquivo'
+        (lido em streaming) ou um array JSON no corpo. A empresa é indicada
+        pela coluna 'cnpj'. ?lote=N define quantas linhas vão em cada INSERT.
+        """
+        arquivo = request.FILES.get('arquivo')
+        if arquivo is not None:
+            linhas = ler_csv(arquivo)
+        elif isinstance(request.data, list):
+            linhas = request.data
+        else:
+            return Response(
+                {"detail": "Envie um arquivo CSV no campo 'arquivo' ou um array JSON de notas."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            tamanho_lote = max(1, int(request.query_params['lote'])) if 'lote' in request.query_params else None
+        except ValueError:
+            raise ValidationError({'lote': "Informe um número inteiro."})
+
+        relatorio = importar_transacoes(linhas, router.db_for_write(Transacao), tamanho_lote)
+        codigo = status.HTTP_201_CREATED if relatorio['importadas'] else status.HTTP_400_BAD_REQUEST
+        return Response(relatorio, status=codigo)
+
+    @action(detail=True, methods=['post'])
+    def baixa(self, request, pk=None):
+        """
+        Baixa (pagamento) de uma nota em uma única transação do banco:
+        cria a saída e marca a entrada como paga.
+        A nota é travada com SELECT ... FOR UPDATE NOWAIT; uma segunda baixa
+        simultânea recebe 409 na hora, em vez de esperar pelo lock.
+        """
+        dados = BaixaSerializer(data=request.data)
+        dados.is_valid(raise_exception=True)
+        dados = dados.validated_data
+
+        db = router.db_for_write(Transacao)
+        with transaction.atomic(using=db):
+            try:
+                entrada = get_object_or_404(
+                    Transacao.objects.using(db).select_related('empresa')
+                    .select_for_update(nowait=True, of=('self',)),
+                    pk=pk,
+                )
+            except OperationalError:
+                raise Conflito("Esta nota já está sendo baixada por outro usuário.")
+
+            if entrada.tipo != 'entrada' or entrada.status != 'pendente':
+                raise Conflito("Apenas notas de entrada pendentes podem receber baixa.")
+
+            if dados['data_saida'] < entrada.data_entrada:
+                raise ValidationError({
+                    "data_saida": f"Erro Cronológico: A baixa ({dados['data_saida']}) não pode ocorrer antes da entrada da nota ({entrada.data_entrada})."
+                })
+
+            nome_emenda = emendas.normalizar_nome(dados.get('emenda_origem')) or emendas.RECURSO_PROPRIO
+            saida = Transacao.objects.using(db).create(
+                empresa=entrada.empresa,
+                tipo='saida',
+                status='pago',
+                nf=entrada.nf,
+                descricao=dados.get('descricao'),
+                valor=dados.get('valor', entrada.valor),
+                emenda=emendas.obter_ou_criar([nome_emenda], db)[nome_emenda],
+                data_saida=dados['data_saida'],
+            )
+            entrada.status = 'pago'
+            entrada.data_saida = dados['data_saida']
+            entrada.save(update_fields=['status', 'data_saida', 'atualizado_em'])
+
+        return Response({
+            'entrada': self.get_serializer(entrada).data,
+            'saida': self.get_serializer(saida).data,
+        }, status=status.HTTP_201_CREATED)
 
-class NotificacaoViewSet(viewsets.ModelViewSet):
+class EmendaViewSet(GetCondicionalMixin, viewsets.ModelViewSet):
+    queryset = Emenda.objects.order_by('nome')
+    serializer_class = EmendaSerializer
+    permission_classes = [IsGestorOrDevOrReadOnly]
+    tabelas_condicionais = {'list': ('emenda',), 'execucao': ('emenda', 'transacao')}
+
+    @action(detail=False, methods=['get'])
+    def execucao(self, request):
+        """
+        Valor alocado x gasto (saídas) por emenda, somado no banco. Aceita os
+        filtros da listagem de transações, como saida_inicio/saida_fim e empresa.
+        """
+        saidas = filtrar_transacoes(arquivo.transacoes(request.query_params), request.query_params)
+        return Response(emendas.execucao(self.get_queryset(), saidas))
+
+    def perform_destroy(self, instance):
+        try:
+            super().perform_destroy(instance)
+        except ProtectedError:
+            raise Conflito("Esta emenda já tem pagamentos e não pode ser excluída.")
+
+class NotificacaoViewSet(ViewSetAssincronoMixin, SincronizacaoMixin, GetCondicionalMixin, viewsets.ModelViewSet):
     queryset = Notificacao.objects.all().order_by('-criado_em')
     serializer_class = NotificacaoSerializer
 
     permission_classes = [IsAuthenticated]
+    tabelas_condicionais = {
+        'list': ('notificacao',),
+        'nao_lidas': ('notificacao', 'leituranotificacao'),
+    }
+
+    def chave_condicional(self, request):
+        # O feed de não lidas é diferente para cada usuário
+        return f"{request.get_full_path()}|{request.user.pk}"
+
+    def nao_lidas_queryset(self):
+        """Notificações ativas para o papel do usuário que ele ainda não leu (tudo em SQL)."""
+        user = self.request.user
+        alvos = ['todos']
+        papel = papel_do_usuario(user)
+        if papel:
+            alvos.append(papel)
+        lidas = LeituraNotificacao.objects.filter(usuario_id=user.pk, notificacao=OuterRef('pk'))
+        return (
+            self.get_queryset()
+            .filter(ativo=True, alvo__in=alvos)
+            .exclude(Exists(lidas))
+        )
+
+    @action(detail=False, methods=['get'])
+    async def nao_lidas(self, request):
+        try:
+            limite = max(1, min(int(request.query_params.get('limite', 20)), 100))
+        except ValueError:
+            raise ValidationError({'limite': "Informe um número inteiro."})
+        notificacoes = [n async for n in self.nao_lidas_queryset()[:limite]]
+        return Response(self.get_serializer(notificacoes, many=True).data)
+
+    @action(detail=False, methods=['post'])
+    def marcar_lidas(self, request):
+        """Marca como lidas as notificações em 'ids', ou todas as pendentes com 'todas': true."""
+        dados = MarcarLidasSerializer(data=request.data)
+        dados.is_valid(raise_exception=True)
+
+        pendentes = self.nao_lidas_queryset()
+        if not dados.validated_data['todas']:
+            pendentes = pendentes.filter(pk__in=dados.validated_data['ids'])
+        ids = list(pendentes.values_list('pk', flat=True))
+
+        criadas = LeituraNotificacao.objects.bulk_create(
+            [LeituraNotificacao(usuario_id=request.user.pk, notificacao_id=pk) for pk in ids],
+            ignore_conflicts=True,
+        )
+        if criadas:
+            versoes.marcar_alteracao(router.db_for_write(LeituraNotificacao), 'leituranotificacao')
+        return Response({'marcadas': len(ids)})
+
+class TarefaViewSet(mixins.CreateModelMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Relatórios pesados fora da request (api.tarefas): POST com 'tipo'
+    (exportacao, comparativo) e 'parametros' (os mesmos da query string do
+    endpoint síncrono) responde 202; o status é consultado em /tarefas/{id}/
+    e o arquivo, quando concluída, baixado em /tarefas/{id}/resultado/.
+    """
+    serializer_class = TarefaSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        # Lê do banco principal: a réplica pode ainda não ter a tarefa recém-criada
+        banco = banco_principal(router.db_for_read(Tarefa))
+        return Tarefa.objects.using(banco).filter(usuario_id=self.request.user.pk).order_by('-criado_em')
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        tarefa, criada = tarefas.submeter(
+            request.user, serializer.validated_data['tipo'], serializer.validated_data.get('parametros', {}),
+        )
+        if criada:
+            # Sem pool (TAREFAS_WORKERS=0) ela já terminou
+            tarefa.refresh_from_db(fields=['status', 'erro', 'nome_arquivo', 'iniciado_em', 'concluido_em'])
+        return Response(
+            self.get_serializer(tarefa).data,
+            status=status.HTTP_202_ACCEPTED if criada else status.HTTP_200_OK,
+        )
+
+    @action(detail=True, methods=['get'])
+    def resultado(self, request, pk=None):
+        tarefa = self.get_object()
+        if tarefa.status == 'erro':
+            raise Conflito(f"A tarefa falhou: {tarefa.erro}")
+        if tarefa.status != 'concluida':
+            raise Conflito("A tarefa ainda não terminou. Consulte o status e tente novamente.")
+        try:
+            arquivo = tarefas.armazenamento().open(tarefa.arquivo)
+        except FileNotFoundError:
+            raise Http404("O arquivo da tarefa não está mais disponível. Peça o relatório de novo.")
+        # Enviado em blocos, sem carregar o arquivo na memória
+        return FileResponse(
+            arquivo, as_attachment=True, filename=tarefa.nome_arquivo, content_type=tarefa.content_type,
+        )
+
+class EventosViewSet(ViewSetAssincronoMixin, viewsets.ViewSet):
+    """
+    Fluxo SSE (text/event-stream) com as alterações de transações, empresas e
+    notificações: um evento por linha criada, alterada ou excluída, com o id e
+    os campos que mudaram. Cada usuário recebe só os eventos do próprio banco
+    e as notificações do seu papel. Só é servido via ASGI (core.asgi): sob
+    WSGI a conexão prenderia um worker inteiro.
+    """
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [eventos.EventStreamRenderer, JSONRenderer]
+
+    async def list(self, request):
+        if not isinstance(request._request, ASGIRequest):
+            return Response(
+                {'detail': "O fluxo de eventos exige o servidor ASGI."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+        eventos.iniciar()
+        inscricao = eventos.transmissor.inscrever(
+            banco_principal(router.db_for_read(Transacao)), papel_do_usuario(request.user),
+        )
+        response = StreamingHttpResponse(eventos.fluxo(inscricao), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Sem buffer no nginx: cada evento sai na hora
+        response['X-Accel-Buffering'] = 'no'
+        return response
 
 class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
@@ -50,4 +446,54 @@ class UserViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        return super().create(request, *args, **kwargs)
\ No newline at end of file
+        return super().create(request, *args, **kwargs)
+
+    def perform_update(self, serializer):
+        # Senha ou username (que define o papel e o banco) podem ter mudado:
+        # tokens em cache não podem continuar valendo com os dados antigos
+        super().perform_update(serializer)
+        invalidar_usuario(serializer.instance.pk)
+
+    def perform_destroy(self, instance):
+        user_id = instance.pk
+        super().perform_destroy(instance)
+        invalidar_usuario(user_id)
+
+class ConexoesViewSet(viewsets.ViewSet):
+    """Uso dos pools de conexão (ou da política de conexões persistentes) por banco."""
+    permission_classes = [PodeLerMetricas]
+
+    def list(self, request):
+        return Response(estatisticas_conexoes())
+
+class MetricasViewSet(viewsets.ViewSet):
+    """Métricas de latência/SQL por rota, cache e conexões, no formato do Prometheus."""
+    permission_classes = [PodeLerMetricas]
+    renderer_classes = [metricas.PrometheusRenderer]
+
+    def list(self, request):
+        response = Response(metricas.formato_prometheus(self.metricas_extras()))
+        response.content_type = 'text/plain; version=0.0.4; charset=utf-8'
+        return response
+
+    def metricas_extras(self):
+        cache = cache_empresas.estatisticas()
+        extras = [
+            ('sigh_cache_empresas_hits_total', 'counter', 'Leituras servidas pelo cache de empresas.',
+             [({}, cache['hits'])]),
+            ('sigh_cache_empresas_misses_total', 'counter', 'Leituras do cache de empresas que foram ao banco.',
+             [({}, cache['misses'])]),
+        ]
+        conexoes = estatisticas_conexoes()
+        pools = {alias: dados for alias, dados in conexoes.items() if dados['modo'] == 'pool'}
+        for campo, tipo, ajuda in (
+            ('pool_size', 'gauge', 'Conexões abertas no pool.'),
+            ('pool_available', 'gauge', 'Conexões livres no pool.'),
+            ('requests_waiting', 'gauge', 'Requests esperando uma conexão do pool.'),
+            ('requests_wait_ms', 'counter', 'Tempo total de espera por conexão do pool (ms).'),
+        ):
+            extras.append((
+                f'sigh_db_{campo}', tipo, ajuda,
+                [({'banco': alias}, dados.get(campo, 0)) for alias, dados in pools.items()],
+            ))
+        return extras
@@ -5,6 +5,9 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+O fluxo de eventos (/api/eventos/, SSE) só é servido por aqui, pois cada conexão
+fica aberta esperando alterações. Ex.: gunicorn core.asgi:application -k uvicorn_worker.UvicornWorker
 """
 
 import os
@@ -14,3 +17,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
 application = get_asgi_application()
+
+# Com EVENTOS_BACKEND='postgres', o worker já começa ouvindo o LISTEN
+from api import eventos  # noqa: E402
+
+eventos.iniciar()
@@ -14,6 +14,7 @@ from pathlib import Path
 import os
 from dotenv import load_dotenv
 import dj_database_url
+from corsheaders.defaults import default_headers
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 load_dotenv()
@@ -37,6 +38,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',  
     'corsheaders',      
     'api',
@@ -50,6 +52,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'api.middleware.MetricasMiddleware',
     'api.middleware.CurrentUserMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
@@ -107,13 +110,103 @@ else:
         'PORT': os.getenv('DB_PORT'),
     }
 
+# Conexões: a mesma política para os dois bancos do roteador.
+# DB_POOL=1 usa o pool do psycopg 3 (tamanho mínimo/máximo, verificação da conexão
+# ao retirá-la do pool e tempo de vida máximo); cada alias tem o próprio pool por
+# processo, compartilhado entre as threads do worker. Sem pool, as conexões
+# são persistentes por thread (CONN_MAX_AGE) com verificação antes do reuso.
+DB_POOL = os.getenv('DB_POOL', '0').lower() in ('1', 'true', 'sim')
+
+
+def politica_conexoes(db):
+    db = dict(db)
+    # Com pool, faz o Django passar check=ConnectionPool.check_connection
+    db['CONN_HEALTH_CHECKS'] = True
+    if DB_POOL:
+        db['CONN_MAX_AGE'] = 0  # o pool controla a vida das conexões
+        db['OPTIONS'] = {
+            **db.get('OPTIONS', {}),
+            'pool': {
+                'min_size': int(os.getenv('DB_POOL_MIN', 2)),
+                'max_size': int(os.getenv('DB_POOL_MAX', 10)),
+                'max_lifetime': float(os.getenv('DB_POOL_MAX_LIFETIME', 1800)),
+                'max_idle': float(os.getenv('DB_POOL_MAX_IDLE', 300)),
+                'timeout': float(os.getenv('DB_POOL_TIMEOUT', 10)),
+            },
+        }
+    else:
+        db['CONN_MAX_AGE'] = int(os.getenv('DB_CONN_MAX_AGE', db.get('CONN_MAX_AGE') or 600))
+    return db
+
+
 DATABASES = {
-    'default': default_db,
-    'tests': tests_db,
+    'default': politica_conexoes(default_db),
+    'tests': politica_conexoes(tests_db),
 }
 
+# Réplicas de leitura (opcional): DATABASE_REPLICA_URLS="postgres://...,postgres://..."
+# e DATABASE_REPLICA_PESOS="3,1". Viram os aliases replica1, replica2...; para testar
+# localmente basta apontar uma URL para o próprio banco principal.
+REPLICAS_LEITURA = {}
+_replica_urls = [u.strip() for u in os.getenv('DATABASE_REPLICA_URLS', '').split(',') if u.strip()]
+_replica_pesos = [int(p) for p in os.getenv('DATABASE_REPLICA_PESOS', '').split(',') if p.strip()]
+for _i, _url in enumerate(_replica_urls, start=1):
+    _replica = politica_conexoes(dj_database_url.parse(_url))
+    # Nos testes a réplica é só um espelho do banco de teste principal
+    _replica['TEST'] = {'MIRROR': 'default'}
+    DATABASES[f'replica{_i}'] = _replica
+    REPLICAS_LEITURA[f'replica{_i}'] = _replica_pesos[_i - 1] if _i <= len(_replica_pesos) else 1
+
+# Por quantos segundos, depois de uma escrita, o usuário continua lendo do 'default'
+REPLICA_JANELA_ESCRITA = int(os.getenv('REPLICA_JANELA_ESCRITA', 10))
+
 DATABASE_ROUTERS = ['api.db_router.UserBasedRouter']
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+# Sem CACHE_REDIS_URL cada processo guarda o seu cache em memória (LocMemCache),
+# o que só é consistente com um único processo servindo a API: com vários
+# workers, a invalidação feita por um não chega aos outros, que seguem com a
+# cópia antiga até o TTL (por isso os TTLs padrão são curtos nesse modo).
+# Com vários workers, aponte para um Redis compartilhado.
+CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL')
+
+
+def _cache(nome, ttl, max_itens):
+    if CACHE_REDIS_URL:
+        return {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_REDIS_URL,
+            'KEY_PREFIX': nome,
+            'TIMEOUT': ttl,
+        }
+    return {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': nome,
+        'TIMEOUT': ttl,
+        'OPTIONS': {'MAX_ENTRIES': max_itens, 'CULL_FREQUENCY': 10},
+    }
+
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Leituras de Empresa (api/cache_empresas.py): TTL e limite de itens (LRU)
+    'empresas': _cache(
+        'empresas',
+        int(os.getenv('EMPRESA_CACHE_TTL', 300 if CACHE_REDIS_URL else 30)),
+        int(os.getenv('EMPRESA_CACHE_MAX_ITENS', 1000)),
+    ),
+    # Tokens JWT já verificados (api/authentication.py)
+    'autenticacao': _cache(
+        'autenticacao',
+        int(os.getenv('AUTH_CACHE_TTL', 60)),
+        int(os.getenv('AUTH_CACHE_MAX_ITENS', 5000)),
+    ),
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -158,14 +251,74 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:5173",
 ]
+# Janela de leitura no banco principal após uma escrita (api/db_router.py):
+# o frontend lê o cabeçalho da resposta e o devolve nas próximas requests
+CORS_ALLOW_HEADERS = (*default_headers, 'x-escrita-recente')
+CORS_EXPOSE_HEADERS = ['X-Escrita-Recente']
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.JWTAutenticacaoUnica',
     )
 }
 
 from datetime import timedelta
 
+# Quantidade de linhas gravadas por INSERT na importação em lote de notas
+IMPORTACAO_TAMANHO_LOTE = int(os.getenv('IMPORTACAO_TAMANHO_LOTE', 500))
+
+# Relatórios em segundo plano (api/tarefas.py): threads do pool em cada processo
+# (0 executa na própria request, sem pool), por quantos segundos um resultado
+# pronto fica disponível e depois de quanto tempo uma execução é dada como perdida
+TAREFAS_WORKERS = int(os.getenv('TAREFAS_WORKERS', 2))
+TAREFAS_VALIDADE = int(os.getenv('TAREFAS_VALIDADE', 3600))
+TAREFAS_TEMPO_MAXIMO = int(os.getenv('TAREFAS_TEMPO_MAXIMO', 1800))
+# Onde ficam os arquivos prontos (com mais de um servidor, um volume compartilhado)
+# e o tamanho máximo de um resultado, em bytes: acima disso a tarefa falha
+TAREFAS_DIR = os.getenv('TAREFAS_DIR', os.path.join(BASE_DIR, 'tarefas'))
+TAREFAS_TAMANHO_MAXIMO = int(os.getenv('TAREFAS_TAMANHO_MAXIMO', 200 * 1024 * 1024))
+
+# Fluxo de alterações (SSE, /api/eventos/, só via ASGI). EVENTOS_BACKEND='memoria'
+# distribui os eventos só dentro do processo; 'postgres' usa LISTEN/NOTIFY e
+# alcança as conexões de todos os workers. Cada conexão dura EVENTOS_DURACAO
+# segundos (o navegador reconecta), com um ping a cada EVENTOS_INTERVALO_PING.
+EVENTOS_BACKEND = os.getenv('EVENTOS_BACKEND', 'memoria')
+EVENTOS_DURACAO = int(os.getenv('EVENTOS_DURACAO', 300))
+EVENTOS_INTERVALO_PING = int(os.getenv('EVENTOS_INTERVALO_PING', 20))
+EVENTOS_TAMANHO_FILA = int(os.getenv('EVENTOS_TAMANHO_FILA', 200))
+
+# Sincronização incremental (?since=, api/sincronizacao.py). O token devolvido
+# recua SINCRONIZACAO_MARGEM segundos, para não perder escritas que fizeram
+# commit depois do horário gravado nelas; exclusões ficam registradas por
+# SINCRONIZACAO_RETENCAO_DIAS dias (um token mais antigo recebe a carga completa).
+SINCRONIZACAO_MARGEM = int(os.getenv('SINCRONIZACAO_MARGEM', 10))
+SINCRONIZACAO_RETENCAO_DIAS = int(os.getenv('SINCRONIZACAO_RETENCAO_DIAS', 30))
+
+# Arquivo de notas pagas (api/arquivo.py, manage.py arquivar_transacoes): os
+# últimos ARQUIVO_ANOS_ATIVOS exercícios (contando o atual) ficam sempre na
+# tabela ativa. Ao aumentar o valor, rode arquivar_transacoes --restaurar.
+ARQUIVO_ANOS_ATIVOS = int(os.getenv('ARQUIVO_ANOS_ATIVOS', 2))
+ARQUIVO_TAMANHO_LOTE = int(os.getenv('ARQUIVO_TAMANHO_LOTE', 5000))
+
+# Métricas (/api/metrics/): requests acima do limite vão para o log com as
+# consultas mais lentas (0 desliga). Com METRICAS_TOKEN definido, o endpoint
+# também aceita "Authorization: Metricas <token>" (o Prometheus envia com
+# authorization: {type: Metricas, credentials: <token>} no scrape_config).
+METRICAS_LIMITE_LENTA_MS = int(os.getenv('METRICAS_LIMITE_LENTA_MS', 1000))
+METRICAS_TOKEN = os.getenv('METRICAS_TOKEN', '')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'api.metricas': {'handlers': ['console'], 'level': 'WARNING'},
+        'api.tarefas': {'handlers': ['console'], 'level': 'WARNING'},
+        'api.eventos': {'handlers': ['console'], 'level': 'WARNING'},
+    },
+}
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),